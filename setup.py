@@ -20,10 +20,17 @@ setup(name="tap-ms-graph",
                 "pytest>=7.0.0",
                 "freezegun",
             ],
+            "async": [
+                "aiohttp>=3.9",
+            ],
+            "orjson": [
+                "orjson>=3.8",
+            ],
         },
       entry_points="""
           [console_scripts]
           tap-ms-graph=tap_ms_graph:main
+          tap-ms-graph-merge-state=tap_ms_graph.sharding:merge_state_main
       """,
       packages=find_packages(),
       package_data = {
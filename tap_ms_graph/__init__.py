@@ -1,8 +1,10 @@
+import argparse
 import sys
 import json
 import singer
 from tap_ms_graph.client import Client
 from tap_ms_graph.discover import discover
+from tap_ms_graph.sharding import parse_shard
 from tap_ms_graph.sync import sync
 
 LOGGER = singer.get_logger()
@@ -19,12 +21,50 @@ def do_discover(client):
     LOGGER.info("Finished discover")
 
 
+def parse_args():
+    """
+    Parse the tap's own command line options, then the standard singer ones.
+    Tap options are carried into the config so the sync can read them.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        help="Write a CPU profile and tracemalloc snapshots per stream to DIR")
+    parser.add_argument(
+        "--shard",
+        metavar="i/N",
+        help="Sync only the parents hashing to shard i of N (0 <= i < N)")
+    role = parser.add_mutually_exclusive_group()
+    role.add_argument(
+        "--coordinator",
+        metavar="QUEUE",
+        help="List parents into the SQLite work queue QUEUE for workers to sync")
+    role.add_argument(
+        "--worker",
+        metavar="QUEUE",
+        help="Sync the child streams of parents claimed from the work queue QUEUE")
+    tap_args, remaining = parser.parse_known_args()
+    sys.argv = sys.argv[:1] + remaining
+
+    parsed_args = singer.utils.parse_args(REQUIRED_CONFIG_KEYS)
+    if tap_args.profile:
+        parsed_args.config["profile_dir"] = tap_args.profile
+    if tap_args.shard:
+        parse_shard(tap_args.shard)
+        parsed_args.config["shard"] = tap_args.shard
+    if tap_args.coordinator or tap_args.worker:
+        parsed_args.config["work_queue"] = tap_args.coordinator or tap_args.worker
+        parsed_args.config["work_queue_role"] = "coordinator" if tap_args.coordinator else "worker"
+    return parsed_args
+
+
 @singer.utils.handle_top_exception(LOGGER)
 def main():
     """
     Run the tap
     """
-    parsed_args = singer.utils.parse_args(REQUIRED_CONFIG_KEYS)
+    parsed_args = parse_args()
     state = {}
     if parsed_args.state:
         state = parsed_args.state
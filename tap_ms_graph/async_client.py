@@ -0,0 +1,227 @@
+import asyncio
+import json
+import time
+import urllib.parse
+from datetime import datetime, timedelta
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import backoff
+from singer import get_logger, metrics
+
+from tap_ms_graph.client import ACCESS_URL, BASE_URL, REQUEST_TIMEOUT, raise_for_error
+from tap_ms_graph.codec import get_codec
+from tap_ms_graph.exceptions import MsGraphBackoffError
+from tap_ms_graph.http_metrics import METRICS_INTERVAL, EndpointMetrics, TransferStats, get_response_sizes, get_retry_after
+
+LOGGER = get_logger()
+MAX_CONNECTIONS = 100
+
+
+class AsyncResponse:
+    """Fully read HTTP response exposing the subset of the `requests.Response`
+    interface used by `raise_for_error` and `MsGraphRateLimitError`."""
+
+    def __init__(self, status_code: int, headers: Mapping[str, str], content: bytes) -> None:
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+async def wait_if_retry_after(details):
+    """Async backoff handler that honours the 'retry_after' attribute of the
+    exception without blocking the event loop.
+    """
+    exc = details['exception']
+    if hasattr(exc, 'retry_after') and exc.retry_after is not None:
+        await asyncio.sleep(exc.retry_after)
+
+
+class AsyncClient:
+    """
+    An asyncio counterpart of `tap_ms_graph.client.Client`.
+    ~~~
+    Performs:
+     - Authentication (shared token, refreshed once under a lock)
+     - Response parsing
+     - HTTP Error handling and retry, including Retry-After
+    Requires the optional `aiohttp` dependency (`pip install tap-ms-graph[async]`).
+    """
+
+    def __init__(self, config: Mapping[str, Any]) -> None:
+        self.config = config
+        self._session = None
+        self._token_lock = None
+        self._access_token = None
+        self._expires_at = None
+        self.base_url = config.get("base_url") or BASE_URL
+        self.codec = get_codec(config.get("json_codec"))
+        self.transfer_stats = TransferStats()
+        self.endpoint_metrics = EndpointMetrics(
+            float(config.get("metrics_interval") or METRICS_INTERVAL), self.base_url)
+
+        config_request_timeout = config.get("request_timeout")
+        self.request_timeout = float(config_request_timeout) if config_request_timeout else REQUEST_TIMEOUT
+        config_max_connections = config.get("async_max_connections")
+        self.max_connections = int(config_max_connections) if config_max_connections else MAX_CONNECTIONS
+
+    @classmethod
+    def from_client(cls, client) -> "AsyncClient":
+        """Builds an AsyncClient that reuses the access token of a synchronous
+        `Client`, so entering it does not request a new token, and adds to
+        its endpoint metrics and transfer stats."""
+        async_client = cls(client.config)
+        async_client.base_url = client.base_url
+        async_client.endpoint_metrics = client.endpoint_metrics
+        async_client.transfer_stats = client.transfer_stats
+        async_client._access_token = getattr(client, "_access_token", None)
+        async_client._expires_at = getattr(client, "_expires_at", None)
+        return async_client
+
+    async def __aenter__(self):
+        import aiohttp  # pylint: disable=import-error
+
+        self._token_lock = asyncio.Lock()
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+            connector=aiohttp.TCPConnector(limit=self.max_connections),
+        )
+        if self._access_token is None:
+            await self._get_access_token()
+        return self
+
+    async def __aexit__(self, exception_type, exception_value, traceback):
+        await self._session.close()
+
+    async def _get_access_token(self) -> None:
+        """Fetches a new Microsoft Graph access token using client credentials flow."""
+        LOGGER.info("Requesting new access token from Microsoft Graph")
+
+        token_url = self.config.get("token_url") or ACCESS_URL.format(self.config["tenant_id"])
+
+        resp_json = await self.make_request(
+            method="POST",
+            endpoint=token_url,
+            headers={
+                "Content-Type": "application/x-www-form-urlencoded"
+            },
+            body={
+                "client_id": self.config["client_id"],
+                "client_secret": self.config["client_secret"],
+                "scope": self.config["scope"],
+                "grant_type": "client_credentials"
+            },
+            is_auth_req=False
+        )
+
+        self._access_token = resp_json["access_token"]
+        expires_in_seconds = int(resp_json.get("expires_in", 3600))
+        self._expires_at = datetime.now() + timedelta(seconds=expires_in_seconds)
+
+        LOGGER.info("Received new access token, valid for %s seconds", expires_in_seconds)
+
+    async def make_request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, Any]] = None,
+        body: Optional[Dict[str, Any]] = None,
+        path: Optional[str] = None,
+        is_auth_req: bool = True
+    ) -> Any:
+        """
+        Sends an HTTP request to the specified API endpoint.
+        """
+        params = params or {}
+        headers = headers or {}
+        if headers.get("Content-Type") == "application/x-www-form-urlencoded":
+            body = urllib.parse.urlencode(body)
+        endpoint = endpoint or f"{self.base_url}/{path}"
+        if is_auth_req:
+            headers, params = await self.authenticate(headers, params)
+        return await self.__make_request(method, endpoint, headers=headers, params=params, data=body)
+
+    async def authenticate(self, headers: Dict, params: Dict) -> Tuple[Dict, Dict]:
+        """Authenticates the request with the token, refreshing it if expired.
+        Concurrent callers wait on a single refresh instead of each fetching a token."""
+        if self._expires_at is None or datetime.now() >= self._expires_at:
+            async with self._token_lock:
+                if self._expires_at is None or datetime.now() >= self._expires_at:
+                    LOGGER.info("Access token expired. Refreshing...")
+                    await self._get_access_token()
+        headers["Authorization"] = self._access_token
+        return headers, params
+
+    async def get(self, endpoint: str, params: Dict, headers: Dict, path: str = None, tag: str = None) -> Any:
+        """Calls the make_request method with a prefixed method type `GET`"""
+        endpoint = endpoint or f"{self.base_url}/{path}"
+        headers, params = await self.authenticate(dict(headers), dict(params))
+        return await self.__make_request("GET", endpoint, tag=tag, headers=headers, params=params)
+
+    async def post(self, endpoint: str, params: Dict, headers: Dict, body: Dict, path: str = None) -> Any:
+        """Calls the make_request method with a prefixed method type `POST`"""
+        headers, params = await self.authenticate(dict(headers), dict(params))
+        return await self.__make_request("POST", endpoint, headers=headers, params=params, data=body)
+
+    @backoff.on_exception(
+        wait_gen=backoff.expo,
+        on_backoff=wait_if_retry_after,
+        exception=(
+            ConnectionError,
+            asyncio.TimeoutError,
+            MsGraphBackoffError,  # covers all 5xx and 429 (MsGraphRateLimitError subclass)
+        ),
+        max_tries=6,
+        factor=2,
+        jitter=None,
+    )
+    async def __make_request(self, method: str, endpoint: str, tag: str = None, **kwargs) -> Optional[Mapping[Any, Any]]:
+        """
+        Performs HTTP Operations
+        Args:
+            method (str): HTTP method of the request.
+            endpoint (str): url of the resource that needs to be fetched
+            params (dict): A mapping for url params eg: ?name=Avery&age=3
+            headers (dict): A mapping for the headers that need to be sent
+            data (dict): only applicable to post request, body of the request
+            tag (str): stream the response's bytes are accounted to
+
+        Returns:
+            Dict,List,None: Returns a `Json Parsed` HTTP Response or None if exception
+        """
+        template = self.endpoint_metrics.template(endpoint)
+        with metrics.http_request_timer(template):
+            LOGGER.debug("Ms-Graph Api endpoint: %s, %s", method, endpoint)
+            start = time.monotonic()
+            response = await self._send(method, endpoint, **kwargs)
+            self.endpoint_metrics.observe(
+                template, response.status_code, time.monotonic() - start, get_retry_after(response))
+            raise_for_error(response)
+
+        # aiohttp decompresses the body as it reads it, so the wire size is
+        # the `Content-Length` of the compressed response where there is one.
+        wire_bytes, decoded_bytes = get_response_sizes(response)
+        self.transfer_stats.add(tag, wire_bytes, decoded_bytes)
+        self.endpoint_metrics.add_bytes(template, wire_bytes)
+
+        return self.codec.loads(response.content)
+
+    async def _send(self, method: str, endpoint: str, **kwargs) -> AsyncResponse:
+        """Issues a single request on the aiohttp session and reads the body.
+        aiohttp client errors are re-raised as `ConnectionError` so they are
+        retried like their `requests` equivalents."""
+        import aiohttp  # pylint: disable=import-error
+
+        try:
+            async with self._session.request(method, endpoint, **kwargs) as response:
+                content = await response.read()
+                return AsyncResponse(response.status, response.headers, content)
+        except aiohttp.ClientError as err:
+            raise ConnectionError(str(err)) from err
@@ -0,0 +1,114 @@
+import gzip
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+from singer import get_logger
+
+from tap_ms_graph import output
+
+LOGGER = get_logger()
+MAX_BATCH_BYTES = 100 * 1024 * 1024
+COMPRESS_LEVEL = 6
+BATCH_ENCODING = {"format": "jsonl", "compression": "gzip"}
+
+
+class BatchMessage:
+    """A Singer BATCH message: `manifest` lists the URIs of the batch files
+    holding a stream's records, one JSON record per line."""
+
+    def __init__(self, stream: str, manifest: List[str], encoding: Optional[Dict] = None) -> None:
+        self.stream = stream
+        self.manifest = manifest
+        self.encoding = encoding or BATCH_ENCODING
+
+    def asdict(self) -> Dict:
+        return {"type": "BATCH", "stream": self.stream, "encoding": self.encoding, "manifest": self.manifest}
+
+
+class _BatchFile:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.records = 0
+        self._raw = open(path, "wb")
+        self._file = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=COMPRESS_LEVEL)
+
+    @property
+    def size(self) -> int:
+        """Compressed bytes written so far (lags by the compressor's buffer)."""
+        return self._raw.tell()
+
+    def write(self, line: str) -> None:
+        self._file.write(line.encode("utf-8"))
+        self.records += 1
+
+    def close(self) -> None:
+        self._file.close()
+        self._raw.close()
+
+
+class BatchWriter:
+    """
+    Writes the records of selected streams to gzip-compressed JSONL files and
+    announces each finished file with a BATCH message.
+    ~~~
+    A file is finished once it reaches `max_bytes` compressed. Every open file
+    is also finished before a STATE message is written, so a state never
+    refers to records that were not announced yet.
+    """
+
+    def __init__(self, directory: str, codec, max_bytes: int = MAX_BATCH_BYTES,
+                 streams: Optional[List[str]] = None) -> None:
+        self.directory = directory
+        self.codec = codec
+        self.max_bytes = max_bytes
+        self.streams = set(streams) if streams is not None else None
+        self._run_id = uuid.uuid4().hex[:12]
+        self._sequence = 0
+        self._files = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def handles(self, stream_name: str) -> bool:
+        return self.streams is None or stream_name in self.streams
+
+    def write_record(self, stream_name: str, record: Dict) -> None:
+        self.write_record_json(stream_name, self.codec.dumps(record))
+
+    def write_record_json(self, stream_name: str, record_json: str) -> None:
+        batch_file = self._files.get(stream_name)
+        if batch_file is None:
+            self._sequence += 1
+            path = os.path.join(self.directory, f"{stream_name}-{self._run_id}-{self._sequence:05d}.jsonl.gz")
+            batch_file = self._files[stream_name] = _BatchFile(path)
+        batch_file.write(record_json + "\n")
+        if batch_file.size >= self.max_bytes:
+            self.finish(stream_name)
+
+    def finish(self, stream_name: Optional[str] = None) -> None:
+        """Closes the open file of `stream_name` (of every stream when None)
+        and writes its BATCH message."""
+        names = [stream_name] if stream_name else list(self._files)
+        for name in names:
+            batch_file = self._files.pop(name, None)
+            if batch_file is None:
+                continue
+            batch_file.close()
+            LOGGER.info("Wrote batch of %s '%s' records to %s", batch_file.records, name, batch_file.path)
+            output.write_message(BatchMessage(name, [Path(batch_file.path).resolve().as_uri()]))
+
+    def close(self) -> None:
+        self.finish()
+
+
+def start_batch_writer(config: Mapping[str, Any], codec) -> Optional[BatchWriter]:
+    """Returns a `BatchWriter` when `batch_dir` is configured. `batch_streams`
+    limits batching to the listed streams; all streams are batched otherwise."""
+    if not config.get("batch_dir"):
+        return None
+    return BatchWriter(
+        config["batch_dir"],
+        codec,
+        int(config.get("batch_max_bytes") or MAX_BATCH_BYTES),
+        config.get("batch_streams"),
+    )
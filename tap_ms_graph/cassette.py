@@ -0,0 +1,152 @@
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, Mapping, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from singer import get_logger
+
+from tap_ms_graph.http_metrics import get_response_sizes
+
+LOGGER = get_logger()
+CASSETTE_VERSION = 1
+# Response headers worth keeping; everything else is noise or sensitive.
+RECORDED_HEADERS = ("Content-Type", "Retry-After", "ETag", "Location")
+REDACTED = "REDACTED"
+
+
+class CassetteMissError(Exception):
+    """Raised on replay when the cassette holds no response for a request."""
+
+
+def request_key(method: str, url: str, params: Optional[Mapping] = None) -> str:
+    """Canonical `METHOD url?query` used to match replayed requests."""
+    prepared = requests.Request(method.upper(), url, params=params or {}).prepare()
+    return f"{prepared.method} {prepared.url}"
+
+
+def _redact(body: bytes) -> bytes:
+    """Blanks out access tokens so cassettes can be shared."""
+    if b'"access_token"' not in body:
+        return body
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return body
+    payload["access_token"] = REDACTED
+    return json.dumps(payload).encode()
+
+
+class RecordingSession:
+    """
+    Wraps a `requests` session and appends every request/response pair to a
+    gzip-compressed JSON-lines cassette.
+    ~~~
+    Each line holds the request key, status, a few response headers, the body,
+    the wire size and timing (`offset` since the recording started, `elapsed`
+    for the request itself). Request bodies and auth headers are not recorded.
+    """
+
+    def __init__(self, session: requests.Session, path: str) -> None:
+        self._session = session
+        self.headers = session.headers
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._write({"version": CASSETTE_VERSION})
+        LOGGER.info("Recording HTTP interactions to cassette %s", path)
+
+    def _write(self, entry: Dict) -> None:
+        with self._lock:
+            self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def request(self, method: str, url: str, params: Optional[Mapping] = None, **kwargs) -> requests.Response:
+        offset = time.monotonic() - self._started
+        start = time.monotonic()
+        response = self._session.request(method, url, params=params, **kwargs)
+        body = response.content  # reads a streamed body; replay serves it from memory
+        elapsed = time.monotonic() - start
+        wire_bytes, _ = get_response_sizes(response)
+        self._write({
+            "key": request_key(method, url, params),
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers},
+            "body": _redact(body).decode("utf-8", errors="replace"),
+            "wire_bytes": wire_bytes,
+            "offset": round(offset, 4),
+            "elapsed": round(elapsed, 4),
+        })
+        return response
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+        self._session.close()
+
+
+class ReplaySession:
+    """
+    Serves responses from a cassette instead of the network.
+    ~~~
+    Requests are matched on method and canonical URL; repeated requests (e.g. a
+    throttled page and its retry) are answered in recorded order. Each response
+    is delayed by its recorded latency times `time_scale` (0 replays as fast as
+    possible), and `Retry-After` is scaled the same way.
+    """
+
+    def __init__(self, path: str, time_scale: float = 1.0) -> None:
+        self.headers = CaseInsensitiveDict()
+        self.time_scale = time_scale
+        self._lock = threading.Lock()
+        self._interactions = defaultdict(deque)
+        with gzip.open(path, "rt", encoding="utf-8") as cassette:
+            header = json.loads(cassette.readline())
+            if header.get("version") != CASSETTE_VERSION:
+                raise ValueError(f"Unsupported cassette version {header.get('version')} in {path}")
+            for line in cassette:
+                entry = json.loads(line)
+                self._interactions[entry["key"]].append(entry)
+        LOGGER.info("Replaying HTTP interactions from cassette %s (time scale %s)", path, time_scale)
+
+    def request(self, method: str, url: str, params: Optional[Mapping] = None, **kwargs) -> requests.Response:
+        key = request_key(method, url, params)
+        with self._lock:
+            entries = self._interactions.get(key)
+            if not entries:
+                raise CassetteMissError(f"No recorded response for {key}")
+            entry = entries.popleft()
+        if self.time_scale:
+            time.sleep(entry["elapsed"] * self.time_scale)
+        return self._build_response(entry, key.split(" ", 1)[1])
+
+    def _build_response(self, entry: Dict, url: str) -> requests.Response:
+        body = entry["body"].encode("utf-8")
+        headers = CaseInsensitiveDict(entry["headers"])
+        headers["Content-Length"] = str(entry.get("wire_bytes") or len(body))
+        if "Retry-After" in headers:
+            headers["Retry-After"] = str(int(round(float(headers["Retry-After"]) * self.time_scale)))
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = headers
+        response.url = url
+        response.encoding = "utf-8"
+        response._content = body
+        response._content_consumed = True
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def wrap_session(session: requests.Session, config: Mapping[str, Any]):
+    """Returns the session the client should use: `session` itself, or a
+    recording/replaying wrapper when `cassette_record`/`cassette_replay` is set."""
+    if config.get("cassette_replay"):
+        session.close()
+        return ReplaySession(config["cassette_replay"], float(config.get("cassette_time_scale", 1.0)))
+    if config.get("cassette_record"):
+        return RecordingSession(session, config["cassette_record"])
+    return session
@@ -1,7 +1,7 @@
 from typing import Any, Dict, Mapping, Optional, Tuple
 from datetime import datetime, timedelta
 
-import backoff, time
+import backoff, threading, time
 import requests
 from requests import session
 from requests.exceptions import Timeout, ConnectionError, ChunkedEncodingError
@@ -13,10 +13,23 @@ from tap_ms_graph.exceptions import (
     MsGraphError,
     MsGraphBackoffError,
     MsGraphRateLimitError)
+from tap_ms_graph.cassette import wrap_session
+from tap_ms_graph.codec import get_codec
+from tap_ms_graph.http_metrics import (
+    METRICS_INTERVAL,
+    EndpointMetrics,
+    TransferStats,
+    get_response_sizes,
+    get_retry_after)
+from tap_ms_graph.json_stream import CHUNK_SIZE, StreamingPage
+from tap_ms_graph.pipeline import PipelineStats
+from tap_ms_graph.request_memo import MEMO_SIZE, MEMO_TTL, RequestMemo
+from tap_ms_graph.response_cache import open_response_cache
 
 LOGGER = get_logger()
 REQUEST_TIMEOUT = 300
 ACCESS_URL = "https://login.microsoftonline.com/{}/oauth2/v2.0/token"
+BASE_URL = "https://graph.microsoft.com/v1.0"
 
 def raise_for_error(response: requests.Response) -> None:
     """Raises the associated response exception. Takes in a response object,
@@ -25,13 +38,14 @@ def raise_for_error(response: requests.Response) -> None:
 
     :param resp: requests.Response object
     """
-    try:
-        response_json = response.json()
-    except Exception:
-        response_json = {}
-
     LOGGER.debug(f"Response Status Code: {response.status_code}")
     if response.status_code not in [200, 201, 204]:
+        # Only error bodies are decoded here; successful bodies are decoded
+        # once by the caller's codec.
+        try:
+            response_json = response.json()
+        except Exception:
+            response_json = {}
         if response_json.get("error"):
             message = "HTTP-error-code: {}, Error: {}".format(response.status_code, response_json.get("error"))
         else:
@@ -57,6 +71,11 @@ def wait_if_retry_after(details):
     if hasattr(exc, 'retry_after') and exc.retry_after is not None:
         time.sleep(exc.retry_after)  # Force exact wait
 
+def count_retry(details):
+    """Backoff handler that counts retried attempts on the client, per thread,
+    so callers can tell how many retries their own request needed."""
+    details['args'][0].retry_count += 1
+
 class Client:
     """
     A Wrapper class.
@@ -69,25 +88,46 @@ class Client:
 
     def __init__(self, config: Mapping[str, Any]) -> None:
         self.config = config
-        self._session = session()
-        self.base_url = "https://graph.microsoft.com/v1.0"
-
+        self._session = wrap_session(session(), config)
+        self.base_url = config.get("base_url") or BASE_URL
+        self.codec = get_codec(config.get("json_codec"))
+        self.transfer_stats = TransferStats()
+        self.endpoint_metrics = EndpointMetrics(
+            float(config.get("metrics_interval") or METRICS_INTERVAL), self.base_url)
+        self.pipeline_stats = PipelineStats()
+        self._retries = threading.local()
+        memo_size = config.get("request_memo_size")
+        self.request_memo = RequestMemo(
+            int(MEMO_SIZE if memo_size is None else memo_size),
+            float(config.get("request_memo_ttl") or MEMO_TTL), self.base_url)
+        self.response_cache = open_response_cache(config)
 
         config_request_timeout = config.get("request_timeout")
         self.request_timeout = float(config_request_timeout) if config_request_timeout else REQUEST_TIMEOUT
 
+    @property
+    def retry_count(self) -> int:
+        """Retried attempts of the requests sent by the calling thread."""
+        return getattr(self._retries, "count", 0)
+
+    @retry_count.setter
+    def retry_count(self, value: int) -> None:
+        self._retries.count = value
+
     def __enter__(self):
         self._get_access_token()
         return self
 
     def __exit__(self, exception_type, exception_value, traceback):
+        if self.response_cache:
+            self.response_cache.close()
         self._session.close()
 
     def _get_access_token(self) -> None:
         """Fetches a new Microsoft Graph access token using client credentials flow."""
         LOGGER.info("Requesting new access token from Microsoft Graph")
 
-        token_url = ACCESS_URL.format(self.config["tenant_id"])
+        token_url = self.config.get("token_url") or ACCESS_URL.format(self.config["tenant_id"])
 
         resp_json = self.make_request(
             method="POST",
@@ -140,11 +180,47 @@ class Client:
         headers["Authorization"] = self._access_token
         return headers, params
 
-    def get(self, endpoint: str, params: Dict, headers: Dict, path: str = None) -> Any:
-        """Calls the make_request method with a prefixed method type `GET`"""
+    def get(self, endpoint: str, params: Dict, headers: Dict, path: str = None, tag: str = None) -> Any:
+        """Calls the make_request method with a prefixed method type `GET`.
+        `tag` names the stream the transferred bytes are accounted to.
+        Identical requests in flight are sent once, and with
+        `request_memo_size` the responses of counts and samples are reused for
+        a while (see `RequestMemo`)."""
         endpoint = endpoint or f"{self.base_url}/{path}"
-        headers, params = self.authenticate(headers, params)
-        return self.__make_request("GET", endpoint, headers=headers, params=params, timeout=self.request_timeout)
+
+        def send():
+            auth_headers, auth_params = self.authenticate(dict(headers or {}), dict(params or {}))
+            return self.__make_request(
+                "GET", endpoint, tag=tag, headers=auth_headers, params=auth_params, timeout=self.request_timeout)
+
+        return self.request_memo.fetch(endpoint, params, headers, send)
+
+    def get_conditional(self, endpoint: str, params: Dict, headers: Dict, path: str = None,
+                        tag: str = None) -> Tuple[Any, bool]:
+        """Issues a `GET` through the `response_cache` and returns the decoded
+        response along with whether the page is the same as on the previous
+        run, either `304 Not Modified` for its ETag or an equal body hash."""
+        endpoint = endpoint or f"{self.base_url}/{path}"
+        cache = self.response_cache
+        key = cache.key(endpoint, params)
+        headers, params = self.authenticate(dict(headers or {}), dict(params or {}))
+        entry = cache.get(key)
+        if entry and entry[0] and entry[2] is not None:
+            headers["If-None-Match"] = entry[0]
+        response = self.__send("GET", endpoint, headers=headers, params=params, timeout=self.request_timeout,
+                               allowed_statuses=(304,))
+        wire_bytes, decoded_bytes = get_response_sizes(response)
+        self.transfer_stats.add(tag, wire_bytes, decoded_bytes)
+        self.endpoint_metrics.add_bytes(self.endpoint_metrics.template(endpoint), wire_bytes)
+        if response.status_code == 304:
+            body = cache.not_modified_body(key)
+            if body is not None:
+                return self.codec.loads(body), True
+            # Nothing to answer the 304 with; ask again unconditionally.
+            headers.pop("If-None-Match", None)
+            response = self.__send("GET", endpoint, headers=headers, params=params, timeout=self.request_timeout)
+        unchanged = cache.put(key, response.content, response.headers.get("ETag"))
+        return self.codec.decode_response(response), unchanged
 
     def post(self, endpoint: str, params: Dict, headers: Dict, body: Dict, path: str = None) -> Any:
         """Calls the make_request method with a prefixed method type `POST`"""
@@ -153,9 +229,55 @@ class Client:
         return self.__make_request("POST", endpoint, headers=headers, params=params, data=body, timeout=self.request_timeout)
 
 
+    def get_page_stream(self, endpoint: str, params: Dict, headers: Dict, data_key: str,
+                        path: str = None, tag: str = None) -> StreamingPage:
+        """Issues a `GET` and returns a `StreamingPage` that parses the body
+        incrementally instead of materializing the whole page.
+
+        Only the request itself is retried; an error while reading the body
+        propagates to the caller because records may already have been yielded.
+        """
+        endpoint = endpoint or f"{self.base_url}/{path}"
+        headers, params = self.authenticate(headers, params)
+        response = self.__send("GET", endpoint, headers=headers, params=params, timeout=self.request_timeout, stream=True)
+
+        def chunks():
+            decoded_bytes = 0
+            try:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    decoded_bytes += len(chunk)
+                    yield chunk
+            finally:
+                wire_bytes, decoded_bytes = get_response_sizes(response, decoded_bytes)
+                self.transfer_stats.add(tag, wire_bytes, decoded_bytes)
+                self.endpoint_metrics.add_bytes(self.endpoint_metrics.template(endpoint), wire_bytes)
+                response.close()
+
+        return StreamingPage(chunks(), data_key)
+
+    def __make_request(self, method: str, endpoint: str, tag: str = None, **kwargs) -> Optional[Mapping[Any, Any]]:
+        """
+        Performs HTTP Operations
+        Args:
+            method (str): represents the state file for the tap.
+            endpoint (str): url of the resource that needs to be fetched
+            params (dict): A mapping for url params eg: ?name=Avery&age=3
+            headers (dict): A mapping for the headers that need to be sent
+            body (dict): only applicable to post request, body of the request
+            tag (str): stream the transferred bytes are accounted to
+
+        Returns:
+            Dict,List,None: Returns a `Json Parsed` HTTP Response or None if exception
+        """
+        response = self.__send(method, endpoint, **kwargs)
+        wire_bytes, decoded_bytes = get_response_sizes(response)
+        self.transfer_stats.add(tag, wire_bytes, decoded_bytes)
+        self.endpoint_metrics.add_bytes(self.endpoint_metrics.template(endpoint), wire_bytes)
+        return self.codec.decode_response(response)
+
     @backoff.on_exception(
         wait_gen=backoff.expo,
-        on_backoff=wait_if_retry_after,
+        on_backoff=[wait_if_retry_after, count_retry],
         exception=(
             ConnectionResetError,
             ConnectionError,
@@ -167,22 +289,22 @@ class Client:
         factor=2,
         jitter=None,
     )
-    def __make_request(self, method: str, endpoint: str, **kwargs) -> Optional[Mapping[Any, Any]]:
+    def __send(self, method: str, endpoint: str, **kwargs) -> requests.Response:
         """
-        Performs HTTP Operations
-        Args:
-            method (str): represents the state file for the tap.
-            endpoint (str): url of the resource that needs to be fetched
-            params (dict): A mapping for url params eg: ?name=Avery&age=3
-            headers (dict): A mapping for the headers that need to be sent
-            body (dict): only applicable to post request, body of the request
-
-        Returns:
-            Dict,List,None: Returns a `Json Parsed` HTTP Response or None if exception
+        Sends the request, retrying transient failures, and returns the
+        response once its status code has been checked. Statuses in
+        `allowed_statuses` (e.g. 304 for a conditional request) are returned
+        rather than raised.
         """
-        with metrics.http_request_timer(endpoint) as timer:
+        allowed_statuses = kwargs.pop("allowed_statuses", ())
+        template = self.endpoint_metrics.template(endpoint)
+        with metrics.http_request_timer(template) as timer:
             LOGGER.debug("Ms-Graph Api endpoint: %s, %s", method, endpoint)
+            start = time.monotonic()
             response = self._session.request(method, endpoint, **kwargs)
-            raise_for_error(response)
+            self.endpoint_metrics.observe(
+                template, response.status_code, time.monotonic() - start, get_retry_after(response))
+            if response.status_code not in allowed_statuses:
+                raise_for_error(response)
 
-        return response.json()
+        return response
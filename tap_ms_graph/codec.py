@@ -0,0 +1,96 @@
+from decimal import Decimal
+from typing import Any, Optional, Union
+
+import simplejson as json
+from singer import get_logger
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+LOGGER = get_logger()
+
+
+class JsonCodec:
+    """
+    Default codec. Encodes with the same simplejson settings singer-python
+    uses for its messages, so output is byte-identical to `singer.write_*`,
+    and decodes responses through `requests`.
+    """
+
+    name = "default"
+    separators = (", ", ": ")
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> str:
+        return json.dumps(obj, use_decimal=True, ensure_ascii=True, allow_nan=False)
+
+    def decode_response(self, response) -> Any:
+        return response.json()
+
+    def format_record(self, stream_name: str, record_json: str) -> str:
+        """Encodes a RECORD message around an already encoded record; equal to
+        `dumps` of the whole message."""
+        item, key = self.separators
+        return (
+            f'{{"type"{key}"RECORD"{item}"stream"{key}{self.dumps(stream_name)}'
+            f'{item}"record"{key}{record_json}}}'
+        )
+
+
+class OrjsonCodec(JsonCodec):
+    """
+    Codec backed by orjson. Output is semantically equal to the default codec
+    but compact and UTF-8 encoded rather than ASCII-escaped.
+    """
+    # orjson is a compiled extension, whose members pylint cannot see.
+    # pylint: disable=no-member
+
+    name = "orjson"
+    separators = (",", ":")
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+    def dumps(self, obj: Any) -> str:
+        try:
+            return orjson.dumps(obj, default=_encode_decimal).decode("utf-8")
+        except orjson.JSONEncodeError:
+            # Non-integral `Decimal`s have no exact float; simplejson writes
+            # their digits as they are, in the same compact UTF-8 form.
+            return json.dumps(obj, use_decimal=True, separators=self.separators,
+                              ensure_ascii=False, allow_nan=False)
+
+    def decode_response(self, response) -> Any:
+        return orjson.loads(response.content)
+
+
+def _encode_decimal(value: Any) -> Any:
+    """
+    orjson fallback for the `Decimal` values singer's transformer can emit.
+    Only integral values are encoded here; others raise, so `dumps` encodes
+    the message with simplejson rather than round them through `float`.
+    """
+    if isinstance(value, Decimal) and value.is_finite() and value == value.to_integral_value():
+        return int(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def get_codec(name: Optional[str] = None) -> JsonCodec:
+    """
+    Returns the codec for the `json_codec` config value: `default`, `orjson`,
+    or `auto` (orjson when installed, otherwise the default codec).
+    """
+    name = (name or JsonCodec.name).lower()
+    if name == JsonCodec.name:
+        return JsonCodec()
+    if name not in ("auto", OrjsonCodec.name):
+        raise ValueError(f"Unknown json_codec '{name}'; expected 'default', 'orjson' or 'auto'.")
+    if orjson is not None:
+        return OrjsonCodec()
+    if name == OrjsonCodec.name:
+        LOGGER.warning("json_codec 'orjson' requested but orjson is not installed; using the default codec.")
+    return JsonCodec()
@@ -46,7 +46,8 @@ class MsGraphRateLimitError(MsGraphBackoffError):
 
         # Retry-After header parsing
         retry_after = None
-        if response and hasattr(response, 'headers'):
+        # `requests.Response` is falsy for 4xx statuses, so test for None explicitly.
+        if response is not None and hasattr(response, 'headers'):
             raw_retry = response.headers.get('Retry-After')
             if raw_retry:
                 try:
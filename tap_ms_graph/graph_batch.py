@@ -0,0 +1,56 @@
+import time
+from typing import Dict, Tuple
+
+from singer import get_logger
+
+LOGGER = get_logger()
+# Graph accepts at most 20 requests in one JSON batch.
+MAX_BATCH_REQUESTS = 20
+MAX_ATTEMPTS = 3
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def batch_get(client, requests: Dict[str, str]) -> Dict[str, Tuple[int, Dict]]:
+    """
+    Issues GET requests through Graph JSON batching (`POST /$batch`), 20 per
+    call, and returns `{request id: (status, body)}`.
+    ~~~
+    `requests` maps ids to URLs relative to the API version (e.g.
+    `/users/{id}/mailFolders`). Requests throttled or failed with a 5xx
+    inside a batch are sent again in a later batch, up to `MAX_ATTEMPTS`
+    times, after the longest `Retry-After` they returned.
+    """
+    results = {}
+    pending = list(requests.items())
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        retry, wait = [], 0.0
+        for start in range(0, len(pending), MAX_BATCH_REQUESTS):
+            chunk = pending[start:start + MAX_BATCH_REQUESTS]
+            body = {"requests": [{"id": request_id, "method": "GET", "url": url} for request_id, url in chunk]}
+            response = client.post(
+                f"{client.base_url}/$batch", {}, {"Content-Type": "application/json", "Accept": "application/json"},
+                client.codec.dumps(body),
+            )
+            urls = dict(chunk)
+            for item in response.get("responses", []):
+                status = int(item.get("status", 0))
+                if status in RETRY_STATUSES and attempt < MAX_ATTEMPTS:
+                    retry.append((item["id"], urls[item["id"]]))
+                    wait = max(wait, _retry_after(item))
+                    continue
+                results[item["id"]] = (status, item.get("body") or {})
+        if not retry:
+            break
+        LOGGER.info("Retrying %s batched requests in %.1fs", len(retry), wait)
+        time.sleep(wait)
+        pending = retry
+    return results
+
+
+def _retry_after(item: Dict) -> float:
+    headers = {key.lower(): value for key, value in (item.get("headers") or {}).items()}
+    try:
+        return float(headers.get("retry-after", 1))
+    except ValueError:
+        return 1.0
+
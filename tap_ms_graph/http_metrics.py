@@ -0,0 +1,226 @@
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from singer import get_logger, metrics
+
+LOGGER = get_logger()
+UNTAGGED = "other"
+METRICS_INTERVAL = 60
+PERCENTILES = (50, 95, 99)
+_GUID = re.compile(r"^[0-9a-fA-F]{8}-([0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}$")
+_LITERAL_SEGMENTS = {"v1.0", "v2.0", "beta", "oauth2"}
+
+
+def _is_id(segment: str) -> bool:
+    """Graph collection and property names are plain words; anything with a
+    digit, key delimiter or of token length is treated as a resource id."""
+    if segment in _LITERAL_SEGMENTS or segment.startswith("$"):
+        return False
+    return (
+        bool(_GUID.match(segment))
+        or any(char.isdigit() or char in "=@:()'" for char in segment)
+        or len(segment) >= 32
+    )
+
+
+def endpoint_template(url: str, base_url: Optional[str] = None) -> str:
+    """
+    Reduces a request URL to an aggregatable endpoint template, e.g.
+    `https://graph.microsoft.com/v1.0/users/<id>/messages?$skiptoken=..`
+    becomes `users/{id}/messages`. The query string is dropped, and so is the
+    `base_url` prefix when the URL starts with it.
+    """
+    path = urlsplit(url).path
+    if base_url:
+        base_path = urlsplit(base_url).path.rstrip("/")
+        if base_path and path.startswith(base_path + "/"):
+            path = path[len(base_path) + 1:]
+    segments = [("{id}" if _is_id(segment) else segment) for segment in path.strip("/").split("/") if segment]
+    return "/".join(segments) or "/"
+
+
+def get_retry_after(response) -> float:
+    """Seconds asked for by a response's `Retry-After` header, 0 if absent."""
+    try:
+        return float(response.headers.get("Retry-After") or 0)
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+
+def get_response_sizes(response, decoded_bytes: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Returns the (wire, decoded) byte counts of a `requests` response. The wire
+    count is what urllib3 read from the socket, before gzip/deflate decoding;
+    it falls back to `Content-Length` and then to the decoded size.
+    """
+    if decoded_bytes is None:
+        decoded_bytes = len(getattr(response, "content", b"") or b"")
+    wire_bytes = None
+    raw = getattr(response, "raw", None)
+    if raw is not None:
+        try:
+            wire_bytes = int(raw.tell())
+        except (AttributeError, TypeError, ValueError):
+            wire_bytes = None
+    if not wire_bytes:
+        try:
+            wire_bytes = int(response.headers.get("Content-Length"))
+        except (AttributeError, TypeError, ValueError):
+            wire_bytes = decoded_bytes
+    return wire_bytes, decoded_bytes
+
+
+class TransferStats:
+    """
+    Accumulates, per stream, how many bytes Graph responses took on the wire
+    and how many they decompressed to, and emits them as Singer metrics.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: {"requests": 0, "wire": 0, "decoded": 0})
+
+    def add(self, tag: Optional[str], wire_bytes: int, decoded_bytes: int) -> None:
+        with self._lock:
+            counts = self._counts[tag or UNTAGGED]
+            counts["requests"] += 1
+            counts["wire"] += wire_bytes
+            counts["decoded"] += decoded_bytes
+
+    def get(self, tag: str) -> dict:
+        with self._lock:
+            return dict(self._counts.get(tag) or {"requests": 0, "wire": 0, "decoded": 0})
+
+    def emit(self) -> None:
+        """Logs one METRIC line per stream and counter, then resets the counts."""
+        with self._lock:
+            counts_by_tag, self._counts = self._counts, defaultdict(self._counts.default_factory)
+        for tag, counts in sorted(counts_by_tag.items()):
+            tags = {metrics.Tag.endpoint: tag}
+            metrics.log(LOGGER, metrics.Point("counter", "http_wire_bytes", counts["wire"], tags))
+            metrics.log(LOGGER, metrics.Point("counter", "http_decoded_bytes", counts["decoded"], tags))
+            if counts["decoded"]:
+                LOGGER.info(
+                    "Stream '%s': %s requests, %s bytes on the wire, %s bytes decoded (%.1f%% of decoded size)",
+                    tag, counts["requests"], counts["wire"], counts["decoded"],
+                    100.0 * counts["wire"] / counts["decoded"],
+                )
+
+
+class LatencyHistogram:
+    """
+    Fixed-size latency histogram with logarithmic buckets (~5% wide, 1 ms to
+    about 20 minutes), so percentiles stay cheap over millions of requests.
+    """
+
+    MIN_LATENCY = 0.001
+    GROWTH = 1.05
+
+    def __init__(self) -> None:
+        self.buckets = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _bucket(self, latency: float) -> int:
+        if latency <= self.MIN_LATENCY:
+            return 0
+        return int(math.ceil(math.log(latency / self.MIN_LATENCY, self.GROWTH)))
+
+    def add(self, latency: float) -> None:
+        self.buckets[self._bucket(latency)] += 1
+        self.count += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+
+    def percentile(self, percent: float) -> float:
+        """Upper bound of the bucket holding the given percentile, capped at the
+        largest latency observed."""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * percent / 100.0)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.MIN_LATENCY * self.GROWTH ** bucket, self.max)
+        return self.max
+
+
+class EndpointMetrics:
+    """
+    Aggregates requests per endpoint template and periodically emits them as
+    Singer METRIC lines.
+    ~~~
+    Per endpoint and window: latency percentiles (`http_request_duration_p50`,
+    `_p95`, `_p99`), `http_requests`, `http_pages` (successful responses),
+    `http_bytes` (on the wire), `http_throttled` (429s) and
+    `http_retry_after_seconds`. A window is emitted once `interval` seconds
+    have passed since the previous one, and at the end of every stream.
+    """
+
+    def __init__(self, interval: float = METRICS_INTERVAL, base_url: Optional[str] = None) -> None:
+        self.interval = interval
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self._last_emit = time.monotonic()
+        self._endpoints = {}
+
+    def template(self, url: str) -> str:
+        return endpoint_template(url, self.base_url)
+
+    def _get(self, template: str) -> Dict:
+        endpoint = self._endpoints.get(template)
+        if endpoint is None:
+            endpoint = self._endpoints[template] = {
+                "latency": LatencyHistogram(),
+                "requests": 0,
+                "pages": 0,
+                "bytes": 0,
+                "throttled": 0,
+                "retry_after_seconds": 0.0,
+            }
+        return endpoint
+
+    def observe(self, template: str, status_code: int, latency: float, retry_after: float = 0.0) -> None:
+        """Records one request attempt, then emits the window if it is due."""
+        with self._lock:
+            endpoint = self._get(template)
+            endpoint["latency"].add(latency)
+            endpoint["requests"] += 1
+            if 200 <= status_code < 300:
+                endpoint["pages"] += 1
+            elif status_code == 429:
+                endpoint["throttled"] += 1
+                endpoint["retry_after_seconds"] += retry_after
+        if time.monotonic() - self._last_emit >= self.interval:
+            self.emit()
+
+    def add_bytes(self, template: str, wire_bytes: int) -> None:
+        with self._lock:
+            self._get(template)["bytes"] += wire_bytes
+
+    def get(self, template: str) -> Dict:
+        with self._lock:
+            endpoint = self._endpoints.get(template)
+            return dict(endpoint) if endpoint else {}
+
+    def emit(self) -> None:
+        """Logs the current window's metrics per endpoint, then starts a new window."""
+        with self._lock:
+            endpoints, self._endpoints = self._endpoints, {}
+            self._last_emit = time.monotonic()
+        for template, endpoint in sorted(endpoints.items()):
+            tags = {metrics.Tag.endpoint: template}
+            histogram = endpoint["latency"]
+            if histogram.count:
+                for percent in PERCENTILES:
+                    metrics.log(LOGGER, metrics.Point(
+                        "timer", f"http_request_duration_p{percent}", round(histogram.percentile(percent), 4), tags))
+            for counter in ("requests", "pages", "bytes", "throttled", "retry_after_seconds"):
+                metrics.log(LOGGER, metrics.Point("counter", f"http_{counter}", endpoint[counter], tags))
@@ -0,0 +1,129 @@
+import codecs
+import json
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = " \t\n\r"
+_DECODER = json.JSONDecoder()
+
+
+class StreamingPage:
+    """
+    Incrementally parses one Graph collection page from an iterable of byte
+    chunks.
+    ~~~
+    Records of the `data_key` array are yielded one at a time as soon as they
+    are complete, so only the record being parsed (plus one chunk) is held in
+    memory instead of the whole page. Every other top-level member, such as
+    `@odata.nextLink`, is collected into `properties`; members that follow
+    the array are only available once iteration has finished.
+
+    `iter_raw` also yields each record's JSON text as received, which
+    passthrough streams write out as is.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], data_key: str) -> None:
+        self.data_key = data_key
+        self.properties: Dict[str, Any] = {}
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._consumed = False
+
+    def __iter__(self) -> Iterator[Any]:
+        for value, _ in self._parse():
+            yield value
+
+    def iter_raw(self) -> Iterator[Tuple[Any, str]]:
+        """Yields each record of the array along with its JSON text as
+        received, which can be written out without encoding it again."""
+        return self._parse()
+
+    def _parse(self) -> Iterator[Tuple[Any, str]]:
+        if self._consumed:
+            raise RuntimeError("A streaming page can only be iterated once.")
+        self._consumed = True
+
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key, _ = self._decode_value()
+            self._expect(":")
+            if key == self.data_key and self._peek() == "[":
+                self._pos += 1
+                yield from self._parse_array()
+            else:
+                self.properties[key], _ = self._decode_value()
+            if self._expect(",", "}") == "}":
+                return
+
+    def _parse_array(self) -> Iterator[Tuple[Any, str]]:
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._decode_value()
+            # Drop everything already parsed so the buffer stays bounded.
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+            if self._expect(",", "]") == "]":
+                return
+
+    def _decode_value(self) -> Tuple[Any, str]:
+        """Decodes the JSON value starting at the next non-whitespace
+        character, reading more input until it is complete."""
+        self._peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                self._read_more()
+                continue
+            # A value ending exactly at the end of the buffer may be a
+            # truncated number; only trust it once more input is seen.
+            if end < len(self._buffer) or self._eof:
+                raw = self._buffer[self._pos:end]
+                self._pos = end
+                return value, raw
+            self._read_more()
+
+    def _peek(self) -> str:
+        """Skips whitespace and returns the next character without consuming it."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if self._eof:
+                raise ValueError("Unexpected end of JSON page.")
+            self._read_more()
+
+    def _expect(self, *tokens: str) -> str:
+        char = self._peek()
+        if char not in tokens:
+            raise ValueError(
+                "Malformed JSON page: expected {} at offset {}, found {!r}.".format(
+                    " or ".join(tokens), self._pos, char))
+        self._pos += 1
+        return char
+
+    def _read_more(self) -> None:
+        """Appends at least as many characters as are currently unparsed, so a
+        large record is re-scanned a logarithmic number of times."""
+        wanted = max(len(self._buffer) - self._pos, 1)
+        read = 0
+        while read < wanted:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._buffer += self._decoder.decode(b"", final=True)
+                self._eof = True
+                return
+            text = self._decoder.decode(chunk)
+            self._buffer += text
+            read += len(text)
@@ -0,0 +1,75 @@
+import random
+import sqlite3
+import time
+from typing import Any, Mapping, Optional
+
+from singer import get_logger
+
+LOGGER = get_logger()
+TTL = 7 * 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS unavailable (
+    stream TEXT NOT NULL,
+    parent_id TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (stream, parent_id)
+);
+"""
+
+
+class NegativeCache:
+    """
+    A persistent record of the parents whose child endpoint returned 404 or
+    403 (e.g. users without a mailbox or OneDrive), so later runs skip them.
+    ~~~
+    Entries expire after a TTL, drawn between half and all of `ttl` so the
+    parents cached by one run are re-probed over several later runs rather
+    than all at once; a parent that got a license in the meantime is then
+    synced again.
+    """
+
+    def __init__(self, path: str, ttl: float = TTL) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.skipped = 0
+        self.added = 0
+        self._connection = sqlite3.connect(path, timeout=60)
+        self._connection.executescript(_SCHEMA)
+
+    def contains(self, stream_name: str, parent_id: str) -> bool:
+        row = self._connection.execute(
+            "SELECT 1 FROM unavailable WHERE stream = ? AND parent_id = ? AND expires_at > ?",
+            (stream_name, str(parent_id), time.time()),
+        ).fetchone()
+        return row is not None
+
+    def add(self, stream_name: str, parent_id: str, status: int) -> None:
+        expires_at = time.time() + self.ttl * random.uniform(0.5, 1.0)
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO unavailable (stream, parent_id, status, expires_at) VALUES (?, ?, ?, ?)",
+                (stream_name, str(parent_id), status, expires_at),
+            )
+        self.added += 1
+
+    def skip(self, stream_name: str, parent_id: Optional[str]) -> bool:
+        """Whether to skip `stream_name` for this parent; counts the skips."""
+        if parent_id is None or not self.contains(stream_name, parent_id):
+            return False
+        self.skipped += 1
+        return True
+
+    def close(self) -> None:
+        LOGGER.info("Negative cache: skipped %s child requests, added %s parents", self.skipped, self.added)
+        with self._connection:
+            self._connection.execute("DELETE FROM unavailable WHERE expires_at <= ?", (time.time(),))
+        self._connection.close()
+
+
+def open_negative_cache(config: Mapping[str, Any]) -> Optional[NegativeCache]:
+    """Opens the `negative_cache` database, or returns None when it is not set."""
+    if not config.get("negative_cache"):
+        return None
+    return NegativeCache(config["negative_cache"], float(config.get("negative_cache_ttl") or TTL))
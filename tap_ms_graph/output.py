@@ -0,0 +1,156 @@
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from singer.messages import RecordMessage, SchemaMessage, StateMessage
+
+from tap_ms_graph.codec import JsonCodec
+
+_codec = JsonCodec()
+BUFFER_SIZE = 1024 * 1024
+FLUSH_INTERVAL = 1.0
+# When set, serialized messages are handed to this writer instead of being
+# written and flushed to stdout one at a time.
+_writer = None
+# When set, records of the streams it handles go to batch files instead.
+_batch_writer = None
+# When set, records transformed in worker processes and not yet written are
+# drained from it before a STATE message is written.
+_transform_pool = None
+
+
+def set_codec(codec: JsonCodec) -> None:
+    """
+    Sets the codec used to serialize every message written by the tap.
+    """
+    global _codec
+    _codec = codec
+
+
+def set_writer(writer) -> None:
+    """
+    Sets the writer messages are handed to, or None to write them to stdout.
+    A writer has `write(line, flush=False)`, `flush()` and `close()` methods;
+    `flush` is set for STATE messages.
+    """
+    global _writer
+    _writer = writer
+
+
+def set_batch_writer(batch_writer) -> None:
+    """
+    Sets the `BatchWriter` that takes over the records of the streams it
+    handles, or None to write every record as a RECORD message.
+    """
+    global _batch_writer
+    _batch_writer = batch_writer
+
+
+def set_transform_pool(pool) -> None:
+    """
+    Sets the `TransformPool` whose pending records must be written before
+    any STATE message, or None.
+    """
+    global _transform_pool
+    _transform_pool = pool
+
+
+def get_transform_pool():
+    """Returns the active `TransformPool`, or None."""
+    return _transform_pool
+
+
+def format_message(message) -> str:
+    return _codec.dumps(message.asdict())
+
+
+def write_message(message) -> None:
+    if _writer is not None:
+        _writer.write(format_message(message) + '\n', flush=isinstance(message, StateMessage))
+        return
+    sys.stdout.write(format_message(message) + '\n')
+    sys.stdout.flush()
+
+
+class BufferedWriter:
+    """
+    Batches serialized messages into large stdout writes.
+    ~~~
+    Lines are buffered until `buffer_size` characters are pending or
+    `flush_interval` seconds have passed since the last flush, then written
+    with a single write and flush. A STATE message flushes the buffer, itself
+    included, so a state is never emitted before the records preceding it
+    and never withheld after them.
+    """
+
+    def __init__(self, buffer_size: int = BUFFER_SIZE, flush_interval: float = FLUSH_INTERVAL) -> None:
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._lines = []
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, line: str, flush: bool = False) -> None:
+        self._lines.append(line)
+        self._pending += len(line)
+        if flush or self._pending >= self.buffer_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._lines:
+            sys.stdout.write("".join(self._lines))
+            self._lines = []
+            self._pending = 0
+        sys.stdout.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+
+
+def write_record(stream_name: str, record: Dict, stream_alias: Optional[str] = None, time_extracted=None) -> None:
+    """Write a single record for the given stream."""
+    if _batch_writer is not None and _batch_writer.handles(stream_name):
+        _batch_writer.write_record(stream_alias or stream_name, record)
+        return
+    write_message(RecordMessage(stream=(stream_alias or stream_name),
+                                record=record,
+                                time_extracted=time_extracted))
+
+
+def write_record_json(stream_name: str, record_json: str) -> None:
+    """Write a record that is already encoded with the active codec."""
+    if _batch_writer is not None and _batch_writer.handles(stream_name):
+        _batch_writer.write_record_json(stream_name, record_json)
+        return
+    line = _codec.format_record(stream_name, record_json) + '\n'
+    if _writer is not None:
+        _writer.write(line)
+        return
+    sys.stdout.write(line)
+    sys.stdout.flush()
+
+
+def write_schema(stream_name: str, schema: Dict, key_properties: List[str],
+                 bookmark_properties: Optional[List[str]] = None, stream_alias: Optional[str] = None) -> None:
+    """Write a schema message."""
+    if isinstance(key_properties, (str, bytes)):
+        key_properties = [key_properties]
+    if not isinstance(key_properties, list):
+        raise Exception("key_properties must be a string or list of strings")
+
+    write_message(
+        SchemaMessage(
+            stream=(stream_alias or stream_name),
+            schema=schema,
+            key_properties=key_properties,
+            bookmark_properties=bookmark_properties))
+
+
+def write_state(value: Any) -> None:
+    """Write a state message."""
+    if _transform_pool is not None:
+        _transform_pool.drain()
+    if _batch_writer is not None:
+        _batch_writer.finish()
+    write_message(StateMessage(value=value))
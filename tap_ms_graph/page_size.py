@@ -0,0 +1,84 @@
+import re
+from typing import Optional
+
+from singer import get_logger
+
+LOGGER = get_logger()
+
+TARGET_LATENCY = 10.0
+MAX_PAGE_BYTES = 16 * 1024 * 1024
+_TOP_PARAM = re.compile(r"([?&](?:\$|%24)top=)\d+", re.IGNORECASE)
+
+
+def with_page_size(url: str, page_size: int) -> str:
+    """Rewrites the `$top` value already present in a (nextLink) URL. URLs
+    without `$top` are returned unchanged, since their page size is encoded
+    in the skip token."""
+    return _TOP_PARAM.sub(lambda match: f"{match.group(1)}{page_size}", url)
+
+
+def max_page_size_header(page_size: int) -> str:
+    """`Prefer` header value asking Graph for at most `page_size` items per
+    page, for endpoints that reject `$top`."""
+    return f"odata.maxpagesize={page_size}"
+
+
+class PageSizeController:
+    """
+    Adapts a stream's page size to how its endpoint behaves.
+    ~~~
+    Grows and shrinks multiplicatively (shrinking faster), within
+    [minimum, maximum]:
+     - halve after a page that needed retries (5xx, 429, timeouts) or took
+       longer than the target latency
+     - shrink proportionally when a page's payload exceeds `max_page_bytes`
+     - grow by a quarter (at least 1) after a full page that came back in
+       under half the target latency
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        target_latency: float = TARGET_LATENCY,
+        max_page_bytes: int = MAX_PAGE_BYTES,
+        name: Optional[str] = None,
+    ) -> None:
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.max_page_bytes = max_page_bytes
+        self.name = name
+        self.page_size = self._clamp(initial)
+
+    def _clamp(self, size: float) -> int:
+        return int(max(self.minimum, min(self.maximum, size)))
+
+    def _set(self, size: float, reason: str) -> int:
+        new_size = self._clamp(size)
+        if new_size != self.page_size:
+            LOGGER.info("Page size for '%s' %s -> %s (%s)", self.name, self.page_size, new_size, reason)
+            self.page_size = new_size
+        return self.page_size
+
+    def observe(self, latency: float, retries: int = 0, page_bytes: int = 0, records: int = 0) -> int:
+        """Feeds the outcome of one page and returns the page size for the next one."""
+        if retries:
+            return self._set(self.page_size / 2, f"{retries} retries")
+        if latency > self.target_latency:
+            return self._set(self.page_size / 2, f"{latency:.1f}s latency")
+        if page_bytes > self.max_page_bytes and records:
+            per_record = page_bytes / records
+            return self._set(self.max_page_bytes / per_record, f"{page_bytes} byte page")
+        if latency < self.target_latency / 2 and records >= self.page_size:
+            return self._set(self.page_size + max(1, self.page_size // 4), f"{latency:.1f}s latency")
+        return self.page_size
+
+    def on_failure(self) -> bool:
+        """Shrinks after a page failed outright. Returns False when already at
+        the minimum, i.e. when retrying smaller cannot help."""
+        if self.page_size <= self.minimum:
+            return False
+        self._set(self.page_size / 2, "request failed")
+        return True
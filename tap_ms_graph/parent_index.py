@@ -0,0 +1,124 @@
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional
+
+from singer import get_logger
+
+from tap_ms_graph.exceptions import MsGraphBackoffError, MsGraphError
+
+LOGGER = get_logger()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parent_ids (
+    stream TEXT NOT NULL,
+    parent_id TEXT NOT NULL,
+    etag TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (stream, parent_id)
+);
+CREATE TABLE IF NOT EXISTS delta_links (
+    stream TEXT PRIMARY KEY,
+    link TEXT NOT NULL
+);
+"""
+
+
+class ParentIndex:
+    """
+    A local index of the ids of parent streams, kept current between runs
+    with Graph delta queries, so child streams can be synced without paging
+    through the whole parent collection first.
+    ~~~
+    The first run lists the collection through its delta endpoint (only
+    `id` is selected) and stores the resulting `@odata.deltaLink`; later runs
+    only fetch what changed since. For each parent the index keeps its last
+    seen `@odata.etag` and when it last changed.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=60)
+        self._connection.executescript(_SCHEMA)
+
+    def ids(self, stream_name: str) -> Iterator[str]:
+        cursor = self._connection.execute(
+            "SELECT parent_id FROM parent_ids WHERE stream = ? ORDER BY parent_id", (stream_name,))
+        for (parent_id,) in cursor:
+            yield parent_id
+
+    def count(self, stream_name: str) -> int:
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM parent_ids WHERE stream = ?", (stream_name,)).fetchone()[0]
+
+    def apply(self, stream_name: str, items: Iterable[Dict]) -> None:
+        """Applies one page of delta results: upserts changed parents and
+        removes the ones marked `@removed`."""
+        now = time.time()
+        with self._connection:
+            for item in items:
+                if "@removed" in item:
+                    self._connection.execute(
+                        "DELETE FROM parent_ids WHERE stream = ? AND parent_id = ?", (stream_name, item["id"]))
+                else:
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO parent_ids (stream, parent_id, etag, updated_at) VALUES (?, ?, ?, ?)",
+                        (stream_name, item["id"], item.get("@odata.etag"), now),
+                    )
+
+    def get_delta_link(self, stream_name: str) -> Optional[str]:
+        row = self._connection.execute("SELECT link FROM delta_links WHERE stream = ?", (stream_name,)).fetchone()
+        return row[0] if row else None
+
+    def set_delta_link(self, stream_name: str, link: str) -> None:
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO delta_links (stream, link) VALUES (?, ?)", (stream_name, link))
+
+    def reset(self, stream_name: str) -> None:
+        """Forgets a stream's parents and delta link, e.g. when the link expired."""
+        with self._connection:
+            self._connection.execute("DELETE FROM parent_ids WHERE stream = ?", (stream_name,))
+            self._connection.execute("DELETE FROM delta_links WHERE stream = ?", (stream_name,))
+
+    def refresh(self, stream) -> None:
+        """
+        Brings the index of `stream` up to date through its `delta_path`:
+        changes since the stored delta link, or a full listing when there is
+        none or Graph no longer accepts it.
+        """
+        stream_name = stream.tap_stream_id
+        link = self.get_delta_link(stream_name)
+        if link:
+            try:
+                self._page_delta(stream, link, {})
+                return
+            except MsGraphBackoffError:
+                raise
+            except MsGraphError as err:
+                LOGGER.warning("Delta link for '%s' is no longer valid (%s); listing all parents.", stream_name, err)
+        self.reset(stream_name)
+        self._page_delta(stream, f"{stream.client.base_url}/{stream.delta_path}", {"$select": "id"})
+
+    def _page_delta(self, stream, url: str, params: Dict) -> None:
+        stream_name = stream.tap_stream_id
+        changes = 0
+        while url:
+            response = stream.client.get(url, params, stream.headers, tag=stream_name)
+            items = response.get("value", [])
+            self.apply(stream_name, items)
+            changes += len(items)
+            url, params = response.get("@odata.nextLink"), {}
+            if response.get("@odata.deltaLink"):
+                self.set_delta_link(stream_name, response["@odata.deltaLink"])
+        LOGGER.info("Parent index for '%s': %s changes applied, %s parents", stream_name, changes,
+                    self.count(stream_name))
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def open_parent_index(config: Mapping[str, Any]) -> Optional[ParentIndex]:
+    """Opens the `parent_index` database, or returns None when it is not set."""
+    if not config.get("parent_index"):
+        return None
+    return ParentIndex(config["parent_index"])
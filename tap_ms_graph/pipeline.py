@@ -0,0 +1,231 @@
+import queue
+import sys
+import threading
+import time
+from typing import Iterable, Iterator
+
+from singer import get_logger
+
+from tap_ms_graph.output import BUFFER_SIZE, FLUSH_INTERVAL, BufferedWriter
+
+LOGGER = get_logger()
+QUEUE_SIZE = 1000
+_POLL_INTERVAL = 0.1
+_DONE = object()
+
+
+class StageStats:
+    """
+    Time accounting for one pipeline stage: how long it spent working, waiting
+    for input from the stage before it, and blocked on a full queue to the
+    stage after it (backpressure).
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.wall = 0.0
+        self.waiting_input = 0.0
+        self.waiting_output = 0.0
+        self.items = 0
+
+    def add(self, wall: float = 0.0, waiting_input: float = 0.0, waiting_output: float = 0.0, items: int = 0) -> None:
+        with self._lock:
+            self.wall += wall
+            self.waiting_input += waiting_input
+            self.waiting_output += waiting_output
+            self.items += items
+
+    @property
+    def busy(self) -> float:
+        return max(0.0, self.wall - self.waiting_input - self.waiting_output)
+
+    def summary(self) -> str:
+        if not self.wall:
+            return f"{self.name} idle"
+        return (
+            f"{self.name} {100 * self.busy / self.wall:.0f}% busy, "
+            f"{100 * self.waiting_input / self.wall:.0f}% waiting for input, "
+            f"{100 * self.waiting_output / self.wall:.0f}% blocked downstream ({self.items} items)"
+        )
+
+
+class PipelineStats:
+    """
+    Utilization of the fetch, transform and write stages, logged and reset at
+    the end of every top-level stream.
+    """
+
+    def __init__(self) -> None:
+        self.fetch = StageStats("fetch")
+        self.transform = StageStats("transform")
+        self.write = StageStats("write")
+
+    def emit(self, stream_name: str) -> None:
+        stages = (self.fetch, self.transform, self.write)
+        if any(stage.wall for stage in stages):
+            LOGGER.info("Pipeline '%s': %s", stream_name, "; ".join(stage.summary() for stage in stages))
+        for stage in stages:
+            stage.reset()
+
+
+def _put(items: queue.Queue, item, stop: threading.Event) -> bool:
+    """Blocking put that gives up once `stop` is set. Returns False if it did."""
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def prefetch(records: Iterable, stats: PipelineStats, size: int = QUEUE_SIZE, name: str = "fetch") -> Iterator:
+    """
+    Iterates `records` on a background thread, at most `size` items ahead of
+    the consumer, and yields them in order.
+    ~~~
+    The bounded queue provides the backpressure: when the consumer (transform
+    and write) falls behind, the fetching thread blocks instead of buffering.
+    An exception raised while fetching is re-raised to the consumer; if the
+    consumer stops early, the fetching thread is stopped too.
+    """
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    errors = []
+
+    def produce() -> None:
+        started = time.monotonic()
+        blocked = 0.0
+        count = 0
+        try:
+            for record in records:
+                put_started = time.monotonic()
+                if not _put(items, record, stop):
+                    return
+                blocked += time.monotonic() - put_started
+                count += 1
+        except BaseException as err:  # re-raised on the consuming thread
+            errors.append(err)
+        finally:
+            stats.fetch.add(wall=time.monotonic() - started, waiting_output=blocked, items=count)
+            _put(items, _DONE, stop)
+
+    thread = threading.Thread(target=produce, name=f"{name}-prefetch", daemon=True)
+    thread.start()
+    started = time.monotonic()
+    waiting = 0.0
+    count = 0
+    try:
+        while True:
+            get_started = time.monotonic()
+            record = items.get()
+            waiting += time.monotonic() - get_started
+            if record is _DONE:
+                break
+            count += 1
+            yield record
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        thread.join()
+        stats.transform.add(wall=time.monotonic() - started, waiting_input=waiting, items=count)
+
+
+class QueueWriter:
+    """
+    The single writer of the pipeline: serialized messages are queued by the
+    transform stage and written to stdout by a dedicated thread.
+    ~~~
+    The queue is bounded, so a slow downstream target blocks the transform
+    stage (and through it, fetching). Messages keep their order, so a STATE
+    message is only written after every record queued before it. Lines go to
+    the `downstream` writer when one is given; otherwise straight to stdout,
+    which is flushed whenever the queue runs empty.
+    """
+
+    def __init__(self, stats: PipelineStats, size: int = QUEUE_SIZE, downstream=None) -> None:
+        self.stats = stats
+        self.downstream = downstream
+        self._queue = queue.Queue(maxsize=size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="singer-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, line: str, flush: bool = False) -> None:
+        if self._error:
+            raise self._error
+        started = time.monotonic()
+        self._queue.put((line, flush))
+        self.stats.transform.add(waiting_output=time.monotonic() - started)
+
+    def flush(self) -> None:
+        """Blocks until everything queued so far is written and flushed."""
+        self._queue.join()
+        if self._error:
+            raise self._error
+        if self.downstream:
+            self.downstream.flush()
+
+    def close(self) -> None:
+        self._queue.put(_DONE)
+        self._thread.join()
+        if self._error:
+            raise self._error
+        if self.downstream:
+            self.downstream.close()
+
+    def _run(self) -> None:
+        started = time.monotonic()
+        waiting = 0.0
+        count = 0
+        while True:
+            get_started = time.monotonic()
+            item = self._queue.get()
+            waiting += time.monotonic() - get_started
+            try:
+                if item is _DONE:
+                    if not self.downstream:
+                        sys.stdout.flush()
+                    break
+                if self._error is None:
+                    line, flush = item
+                    count += 1
+                    if self.downstream:
+                        self.downstream.write(line, flush)
+                    else:
+                        sys.stdout.write(line)
+                        if flush or self._queue.empty():
+                            sys.stdout.flush()
+            except Exception as err:  # surfaced to the producers
+                self._error = err
+            finally:
+                self._queue.task_done()
+                now = time.monotonic()
+                self.stats.write.add(wall=now - started, waiting_input=waiting, items=count)
+                started, waiting, count = now, 0.0, 0
+
+
+def get_queue_size(config) -> int:
+    return int(config.get("pipeline_queue_size") or QUEUE_SIZE)
+
+
+def start_writer(config, stats: PipelineStats):
+    """
+    Returns the writer Singer messages should go through: a `BufferedWriter`
+    with `buffered_output`, behind a `QueueWriter` thread with `pipeline`.
+    None when neither is enabled, i.e. messages are written one by one.
+    """
+    writer = None
+    if config.get("buffered_output"):
+        writer = BufferedWriter(
+            int(config.get("output_buffer_size") or BUFFER_SIZE),
+            float(config.get("output_flush_interval") or FLUSH_INTERVAL),
+        )
+    if config.get("pipeline"):
+        writer = QueueWriter(stats, get_queue_size(config), writer)
+    return writer
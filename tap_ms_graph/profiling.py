@@ -0,0 +1,71 @@
+import cProfile
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from singer import get_logger
+
+LOGGER = get_logger()
+TRACEMALLOC_FRAMES = 10
+TOP_ENTRIES = 30
+
+
+@contextmanager
+def profile_stream(directory: Optional[str], stream_name: str) -> Iterator[None]:
+    """
+    Profiles the wrapped block when `directory` is set; a no-op otherwise.
+    ~~~
+    Writes, per stream, into `directory`:
+     - `<stream>.prof`: cProfile stats (pstats, snakeviz, gprof2dot)
+     - `<stream>.cpu.txt`: the top functions by cumulative time
+     - `<stream>.start.tracemalloc` / `<stream>.end.tracemalloc`: allocation
+       snapshots, loadable with `tracemalloc.Snapshot.load`
+     - `<stream>.memory.txt`: peak traced memory and the largest allocation
+       growth between the two snapshots, by line
+    """
+    if not directory:
+        yield
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    base_path = os.path.join(directory, stream_name)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    tracemalloc.reset_peak()
+    start_snapshot = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        end_snapshot = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+        write_reports(base_path, profiler, start_snapshot, end_snapshot, peak)
+        LOGGER.info(
+            "Profiled stream '%s' (%.1fs, peak traced memory %.1f MiB); reports written to %s.*",
+            stream_name, elapsed, peak / (1024 * 1024), base_path,
+        )
+
+
+def write_reports(base_path: str, profiler: cProfile.Profile, start_snapshot: tracemalloc.Snapshot,
+                  end_snapshot: tracemalloc.Snapshot, peak: int) -> None:
+    profiler.dump_stats(f"{base_path}.prof")
+    with open(f"{base_path}.cpu.txt", "w") as cpu_report:
+        pstats.Stats(profiler, stream=cpu_report).sort_stats("cumulative").print_stats(TOP_ENTRIES)
+
+    start_snapshot.dump(f"{base_path}.start.tracemalloc")
+    end_snapshot.dump(f"{base_path}.end.tracemalloc")
+    with open(f"{base_path}.memory.txt", "w") as memory_report:
+        memory_report.write(f"Peak traced memory: {peak / (1024 * 1024):.1f} MiB\n\n")
+        memory_report.write(f"Top {TOP_ENTRIES} allocation differences by line:\n")
+        for stat in end_snapshot.compare_to(start_snapshot, "lineno")[:TOP_ENTRIES]:
+            memory_report.write(f"{stat}\n")
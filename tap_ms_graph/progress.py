@@ -0,0 +1,88 @@
+import time
+from typing import Optional
+
+from singer import get_logger
+
+LOGGER = get_logger()
+PROGRESS_INTERVAL = 60
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressReporter:
+    """
+    Tracks the progress of one top-level stream and its children, and logs a
+    progress line at most every `interval` seconds (never when it is 0).
+    ~~~
+    Each line holds the records written and their rate, the pages fetched,
+    the parents whose children are done against the parent total (when known)
+    and an ETA extrapolated from the parent completion rate, or from the
+    record rate against the records expected by pre-checks (e.g. mailbox
+    item counts) when that is longer.
+    """
+
+    def __init__(self, stream_name: str, interval: float = PROGRESS_INTERVAL) -> None:
+        self.stream_name = stream_name
+        self.interval = interval
+        self.records = 0
+        self.pages = 0
+        self.parents_done = 0
+        self.total_parents = None
+        self.expected_records = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    def set_total_parents(self, total: Optional[int]) -> None:
+        self.total_parents = total
+
+    def expect(self, count: int) -> None:
+        """Adds records known to be coming, e.g. the item count of a mailbox."""
+        self.expected_records += count
+
+    def record(self, count: int = 1) -> None:
+        self.records += count
+        self.maybe_report()
+
+    def page(self) -> None:
+        self.pages += 1
+        self.maybe_report()
+
+    def parent_done(self, count: int = 1) -> None:
+        self.parents_done += count
+        self.maybe_report()
+
+    def eta(self) -> Optional[float]:
+        """Seconds left, from the parent completion rate or the record rate so
+        far, whichever is longer; None when unknown."""
+        elapsed = time.monotonic() - self.started
+        estimates = []
+        if self.total_parents and self.parents_done:
+            estimates.append(elapsed * max(0, self.total_parents - self.parents_done) / self.parents_done)
+        if self.expected_records and self.records:
+            estimates.append(elapsed * max(0, self.expected_records - self.records) / self.records)
+        return max(estimates) if estimates else None
+
+    def maybe_report(self) -> None:
+        if self.interval and time.monotonic() - self._last_report >= self.interval:
+            self.report()
+
+    def report(self, final: bool = False) -> None:
+        now = time.monotonic()
+        self._last_report = now
+        elapsed = now - self.started
+        rate = self.records / elapsed if elapsed else 0.0
+        message = f"{self.records} records ({rate:.1f}/s), {self.pages} pages"
+        if self.expected_records:
+            message += f", {self.expected_records} records expected"
+        if self.parents_done or self.total_parents:
+            total = self.total_parents if self.total_parents is not None else "?"
+            message += f", {self.parents_done}/{total} parents"
+        if final:
+            message += f", elapsed {format_duration(elapsed)}"
+        else:
+            eta = self.eta()
+            message += f", ETA {format_duration(eta) if eta is not None else 'unknown'}"
+        LOGGER.info("%s '%s': %s", "Finished" if final else "Progress", self.stream_name, message)
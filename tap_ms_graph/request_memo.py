@@ -0,0 +1,125 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from singer import get_logger
+
+from tap_ms_graph.http_metrics import endpoint_template
+
+LOGGER = get_logger()
+# Reuse is opt-in; identical requests in flight are always coalesced.
+MEMO_SIZE = 0
+MEMO_TTL = 300
+# Last segments of the endpoints whose responses are kept: the same counts are
+# asked for by progress reporting, window planning and the parent totals.
+MEMO_SEGMENTS = {"$count"}
+# Request headers that change the response, and so are part of the key.
+KEY_HEADERS = ("ConsistencyLevel", "Prefer")
+
+
+class _Call:
+    """A request in flight, waited for by identical requests."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class RequestMemo:
+    """
+    Coalesces identical GET requests in flight and keeps the responses of
+    idempotent endpoints for a short time.
+    ~~~
+    Requests are identical when their URL, query parameters and the headers in
+    `KEY_HEADERS` are. A thread asking for a request another thread is already
+    sending waits for that response instead of sending it again. Responses of
+    memoizable requests (`memoizable`) are kept in an LRU of `size` entries
+    for `ttl` seconds; `size` 0 only coalesces. Callers always get their own
+    copy of a shared response, as streams modify records in place.
+    """
+
+    def __init__(self, size: int = MEMO_SIZE, ttl: float = MEMO_TTL, base_url: str = None) -> None:
+        self.size = size
+        self.ttl = ttl
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._calls = {}
+        self.hits = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key(endpoint: str, params: Dict, headers: Dict) -> Tuple:
+        return (
+            endpoint,
+            tuple(sorted((str(name), str(value)) for name, value in (params or {}).items())),
+            tuple((name, str((headers or {}).get(name))) for name in KEY_HEADERS),
+        )
+
+    def memoizable(self, endpoint: str, params: Dict) -> bool:
+        """
+        Whether the response can be kept: counts and single record samples
+        (`$top=1`, probed repeatedly by discovery), but not continuation pages
+        or delta rounds.
+        """
+        if not self.size or "$skiptoken" in endpoint or "token=" in endpoint:
+            return False
+        segment = endpoint_template(endpoint, self.base_url).rsplit("/", 1)[-1]
+        if segment == "delta":
+            return False
+        return segment in MEMO_SEGMENTS or str((params or {}).get("$top")) == "1"
+
+    def fetch(self, endpoint: str, params: Dict, headers: Dict, send: Callable[[], Any]) -> Any:
+        """Returns the response of `send()`, or of an identical request sent or in flight."""
+        key = self.key(endpoint, params, headers)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            call = self._calls.get(key)
+            owner = call is None
+            if owner:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+        shared = False
+        try:
+            call.result = send()
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None and self.memoizable(endpoint, params):
+                    self._remember(key, call.result)
+                    shared = True
+                shared = shared or call.waiters > 0
+            call.done.set()
+        # The sender keeps the original unless it is also kept or handed out.
+        return copy.deepcopy(call.result) if shared else call.result
+
+    def _remember(self, key: Hashable, result: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def emit(self) -> None:
+        """Logs and resets the hit counts."""
+        if self.hits or self.coalesced:
+            LOGGER.info("Request memo: %s responses reused, %s identical requests coalesced, %s kept",
+                        self.hits, self.coalesced, len(self._entries))
+        self.hits = self.coalesced = 0
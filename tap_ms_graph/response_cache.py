@@ -0,0 +1,118 @@
+import hashlib
+import sqlite3
+import time
+import zlib
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from singer import get_logger
+
+LOGGER = get_logger()
+MAX_BYTES = 64 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT PRIMARY KEY,
+    etag TEXT,
+    digest TEXT NOT NULL,
+    body BLOB,
+    size INTEGER NOT NULL,
+    used_at REAL NOT NULL
+);
+"""
+
+
+class ResponseCache:
+    """
+    A persistent record of the pages of slowly-changing streams, so unchanged
+    pages are neither transferred nor emitted again on the next run.
+    ~~~
+    For each page URL it keeps the response's `ETag`, sent back as
+    `If-None-Match`, and a SHA-256 of the body for endpoints without one.
+    Bodies are only stored (compressed) when there is an ETag, to answer a
+    `304 Not Modified`. Pages seen during a stream are only saved by
+    `commit`, once the stream has been synced, so a failed run never hides
+    pages that were not emitted. The least recently used pages are evicted
+    beyond `max_bytes`.
+    """
+
+    def __init__(self, path: str, max_bytes: int = MAX_BYTES) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.unchanged = 0
+        self.not_modified = 0
+        self._pending = {}
+        self._connection = sqlite3.connect(path, timeout=60)
+        self._connection.executescript(_SCHEMA)
+
+    @staticmethod
+    def key(endpoint: str, params: Optional[Dict]) -> str:
+        query = "&".join(f"{name}={value}" for name, value in sorted((params or {}).items()))
+        return f"{endpoint}?{query}" if query else endpoint
+
+    def get(self, key: str) -> Optional[Tuple[Optional[str], str, Optional[bytes]]]:
+        """The ETag, digest and body (if stored) of the page at `key`."""
+        row = self._connection.execute("SELECT etag, digest, body FROM pages WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        etag, digest, body = row
+        return etag, digest, zlib.decompress(body) if body is not None else None
+
+    def not_modified_body(self, key: str) -> Optional[bytes]:
+        """The stored body answering a `304 Not Modified` for `key`."""
+        entry = self.get(key)
+        if entry is None or entry[2] is None:
+            return None
+        self.not_modified += 1
+        self._pending[key] = entry
+        return entry[2]
+
+    def put(self, key: str, content: bytes, etag: Optional[str]) -> bool:
+        """
+        Remembers the page at `key` until the next `commit`. Returns whether
+        it is the same as on the previous run.
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        entry = self.get(key)
+        self._pending[key] = (etag, digest, content if etag else None)
+        if entry is not None and entry[1] == digest:
+            self.unchanged += 1
+            return True
+        return False
+
+    def commit(self) -> None:
+        """Saves the pages seen since the last commit, then evicts beyond `max_bytes`."""
+        pending, self._pending = self._pending, {}
+        now = time.time()
+        with self._connection:
+            for key, (etag, digest, body) in pending.items():
+                stored = zlib.compress(body) if body is not None else None
+                size = len(key) + len(digest) + len(etag or "") + len(stored or b"")
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO pages (key, etag, digest, body, size, used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, etag, digest, stored, size, now),
+                )
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._connection.execute("SELECT key, size FROM pages ORDER BY used_at, key").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._connection.execute("DELETE FROM pages WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        LOGGER.info("Response cache: evicted %s pages to stay within %s bytes", evicted, self.max_bytes)
+
+    def close(self) -> None:
+        LOGGER.info("Response cache: %s pages not modified, %s pages unchanged", self.not_modified, self.unchanged)
+        self._connection.close()
+
+
+def open_response_cache(config: Mapping[str, Any]) -> Optional[ResponseCache]:
+    """Opens the `response_cache` database, or returns None when it is not set."""
+    if not config.get("response_cache"):
+        return None
+    return ResponseCache(config["response_cache"], int(config.get("response_cache_max_bytes") or MAX_BYTES))
@@ -0,0 +1,94 @@
+import argparse
+import json
+import sys
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from singer import get_logger
+
+LOGGER = get_logger()
+
+
+def parse_shard(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    Parses a `shard` option of the form `i/N` (0 <= i < N) into `(i, N)`.
+    Returns None when unset.
+    """
+    if not value:
+        return None
+    try:
+        index, count = (int(part) for part in str(value).split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}'; expected 'i/N', e.g. '0/4'.") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{value}'; expected 0 <= i < N.")
+    return index, count
+
+
+def shard_of(parent_id: str, count: int) -> int:
+    """The shard a parent belongs to; stable across processes and runs."""
+    return zlib.crc32(str(parent_id).encode("utf-8")) % count
+
+
+def merge_states(states: List[Dict]) -> Dict:
+    """
+    Merges the final states of the shards of one sync into a single state.
+    ~~~
+    Bookmarks are merged stream by stream; where shards disagree on a value,
+    the lowest (earliest) one is kept so that no shard's data is skipped by
+    the next run. `currently_syncing` is kept from the first state that has
+    one, so an interrupted shard is resumed.
+    """
+    merged = {}
+    for state in states:
+        _merge_into(merged, {key: value for key, value in state.items() if key != "currently_syncing"})
+        if state.get("currently_syncing") and not merged.get("currently_syncing"):
+            merged["currently_syncing"] = state["currently_syncing"]
+    return merged
+
+
+def _merge_into(merged: Dict, state: Dict) -> None:
+    for key, value in state.items():
+        if key not in merged or merged[key] is None:
+            merged[key] = value
+        elif isinstance(value, dict) and isinstance(merged[key], dict):
+            _merge_into(merged[key], value)
+        elif value is not None and value != merged[key]:
+            try:
+                merged[key] = min(merged[key], value)
+            except TypeError:
+                LOGGER.warning("Conflicting values for '%s' in shard states; keeping %r.", key, merged[key])
+
+
+def read_state(path: str) -> Dict:
+    """Reads a state file, or the last STATE message of a file of tap output."""
+    with open(path) as state_file:
+        content = state_file.read()
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+    state = None
+    for line in content.splitlines():
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(message, dict) and message.get("type") == "STATE":
+            state = message["value"]
+    if state is None:
+        raise ValueError(f"No state found in '{path}'.")
+    return state
+
+
+def merge_state_main(argv: Optional[List[str]] = None) -> None:
+    """
+    `tap-ms-graph-merge-state`: merges the state files of a sharded sync and
+    prints the merged state.
+    """
+    parser = argparse.ArgumentParser(description="Merge the state files written by the shards of a sync.")
+    parser.add_argument("states", nargs="+", help="State files, or captured tap output, one per shard")
+    args = parser.parse_args(argv)
+    merged = merge_states([read_state(path) for path in args.states])
+    json.dump(merged, sys.stdout)
+    sys.stdout.write("\n")
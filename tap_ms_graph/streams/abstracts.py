@@ -1,18 +1,34 @@
+import copy
+import math
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Tuple, Iterator, List
+from typing import Any, AsyncIterator, Dict, Tuple, Iterable, Iterator, List, Mapping, Optional
 from singer import (
     Transformer,
     get_bookmark,
     get_logger,
     metrics,
     write_bookmark,
-    write_record,
-    write_schema,
     metadata
 )
-from tap_ms_graph.exceptions import MsGraphNotFoundError
+from requests.exceptions import Timeout
+from tap_ms_graph.async_sync import get_async_runner, sync_children_async
+from tap_ms_graph.exceptions import MsGraphBackoffError, MsGraphError, MsGraphForbiddenError, MsGraphNotFoundError
+from tap_ms_graph.output import get_transform_pool, write_record, write_record_json, write_schema
+from tap_ms_graph.page_size import (
+    MAX_PAGE_BYTES,
+    TARGET_LATENCY,
+    PageSizeController,
+    max_page_size_header,
+    with_page_size,
+)
+from tap_ms_graph.pipeline import get_queue_size, prefetch
+from tap_ms_graph.progress import ProgressReporter
+from tap_ms_graph.sharding import parse_shard, shard_of
+from tap_ms_graph.windows import MAX_WINDOWS, SPLIT_CONCURRENCY, merge_windows, split_windows, window_filter
 
 LOGGER = get_logger()
+PASSTHROUGH_SAMPLE_INTERVAL = 100
 
 
 class BaseStream(ABC):
@@ -36,6 +52,28 @@ class BaseStream(ABC):
     parent_bookmark_key = ""
     http_method = "GET"
     supports_top = True
+    supports_count = False
+    supports_passthrough = False
+    # Set on parent streams by a `work_queue` coordinator: parents are queued
+    # for workers instead of having their children synced here.
+    work_queue = None
+    # Delta endpoint used to keep a `parent_index` of this parent stream.
+    delta_path = ""
+    # Set by the sync when the stream is only synced for its children and a
+    # `parent_index` is configured: parents are then read from the index.
+    parent_index = None
+    # Parents whose endpoint for this (child) stream returned 404/403 before.
+    negative_cache = None
+    # Date-time field a child stream's collection can be split on, for
+    # parents with more than `split_threshold` records.
+    window_field = ""
+    # Whether pages are fetched through the `response_cache`, for streams
+    # that rarely change.
+    conditional_pages = False
+    min_page_size = 10
+    max_page_size = 999
+    # Set by `sync` when streamed pages yield each record with its JSON text.
+    raw_pages = False
 
     def __init__(self, client=None, catalog=None) -> None:
         self.client = client
@@ -46,6 +84,20 @@ class BaseStream(ABC):
         self.params = {}
         self.data_payload = dict()
         self.page_size = self.client.config.get("page_size", 999)
+        self._pending_parents = []
+        # The parent whose children are being fetched by `get_records`.
+        self.current_parent = None
+        # With a `parent_filters` entry that cannot be applied to the listing
+        # itself, the ids of the parents whose children are synced.
+        self.child_parent_ids = None
+        # Replaced by a shared, reporting instance for the streams being synced.
+        self.progress = ProgressReporter(self.tap_stream_id, interval=0)
+        # With `shard` set, parent streams only sync their parents in the shard.
+        self.shard = parse_shard(self.client.config.get("shard")) if self.children else None
+        self.page_size_controller = None
+        if self.client.config.get("adaptive_page_size"):
+            self.page_size_controller = self.build_page_size_controller()
+            self.page_size = self.page_size_controller.page_size
 
     @property
     @abstractmethod
@@ -133,30 +185,491 @@ class BaseStream(ABC):
         """
 
 
+    def build_page_size_controller(self) -> PageSizeController:
+        """
+        Builds the adaptive page size controller for the stream, bounded by
+        `min_page_size`/`max_page_size` or the stream's `page_size_bounds` config.
+        """
+        config = self.client.config
+        minimum, maximum = (config.get("page_size_bounds") or {}).get(
+            self.tap_stream_id, (self.min_page_size, self.max_page_size))
+        return PageSizeController(
+            int(self.page_size),
+            int(minimum),
+            int(maximum),
+            target_latency=float(config.get("page_size_target_latency") or TARGET_LATENCY),
+            max_page_bytes=int(config.get("max_page_bytes") or MAX_PAGE_BYTES),
+            name=self.tap_stream_id,
+        )
+
+    def get_headers(self) -> Dict:
+        """
+        Headers for the next page request. Streams that do not support `$top`
+        ask for the adaptive page size with `Prefer: odata.maxpagesize`.
+        """
+        if self.page_size_controller and not self.supports_top:
+            return {**self.headers, "Prefer": max_page_size_header(self.page_size)}
+        return self.headers
+
+    def apply_page_size(self, params: Dict) -> Dict:
+        """
+        Applies the controller's current page size to the next page request,
+        either in `params` or in the `$top` of a nextLink URL.
+        """
+        self.page_size = self.page_size_controller.page_size
+        if self.supports_top:
+            if "$top" in params:
+                params["$top"] = self.page_size
+            else:
+                self.url_endpoint = with_page_size(self.url_endpoint, self.page_size)
+        return params
+
+    def get_page(self, params: Dict) -> Tuple[Iterable, Mapping]:
+        """Fetches the page at `url_endpoint` and returns its records along with
+        the mapping holding the page's other members (e.g. `@odata.nextLink`).
+
+        With `stream_pages` enabled the response is parsed incrementally; the
+        mapping is then only complete once the records have been consumed.
+        Streams with child streams to sync read their pages fully, so that no
+        response is held open while the children of its records are synced.
+
+        With a `response_cache`, the pages of `conditional_pages` streams that
+        are unchanged since the previous run are not emitted again, unless
+        their records are needed as parents of child streams."""
+        if self.conditional_pages and self.client.config.get("response_cache"):
+            response, unchanged = self.client.get_conditional(
+                self.url_endpoint, params, self.get_headers(), self.path, tag=self.tap_stream_id
+            )
+            if unchanged and not self.child_to_sync:
+                LOGGER.info("Page of '%s' unchanged since the previous run; skipping its records.", self.tap_stream_id)
+                return [], response
+            return response.get(self.data_key, []), response
+        if self.client.config.get("stream_pages") and not self.child_to_sync:
+            page = self.client.get_page_stream(
+                self.url_endpoint, params, self.get_headers(), self.data_key, self.path,
+                tag=self.tap_stream_id,
+            )
+            return (page.iter_raw() if self.raw_pages else page), page.properties
+        response = self.client.get(
+            self.url_endpoint, params, self.get_headers(), self.path, tag=self.tap_stream_id
+        )
+        return response.get(self.data_key, []), response
+
     def get_records(self) -> Iterator:
-        """Interacts with api client interaction and pagination."""
+        """
+        Interacts with api client interaction and pagination.
+        ~~~
+        With an adaptive page size, a page is measured by its request alone
+        (and the reading of a streamed body), never by the child syncs that
+        run while its records are yielded.
+        """
         next_page = 1
         params = self.params
+        controller = self.page_size_controller
         while next_page:
+            if controller:
+                page_started = time.monotonic()
+                retries_before = self.client.retry_count
+                bytes_before = self.client.transfer_stats.get(self.tap_stream_id)["decoded"]
             try:
-                response = self.client.get(
-                    self.url_endpoint, params, self.headers, self.path
-                )
-            except MsGraphNotFoundError:
+                raw_records, page_properties = self.get_page(params)
+                if controller:
+                    retries = self.client.retry_count - retries_before
+                    latency = time.monotonic() - page_started
+            except (MsGraphNotFoundError, MsGraphForbiddenError) as err:
+                if not self.remember_unavailable(self.current_parent, err):
+                    raise
                 LOGGER.warning(
-                    "Resource not found for stream '%s' (endpoint: %s); skipping.",
+                    "Resource %s for stream '%s' (endpoint: %s); skipping.",
+                    "not found" if isinstance(err, MsGraphNotFoundError) else "forbidden",
                     self.tap_stream_id,
                     self.url_endpoint,
                 )
                 return
-            raw_records = response.get(self.data_key, [])
-            next_page = response.get(self.next_page_key)
+            except (MsGraphBackoffError, Timeout):
+                # Retries were exhausted at this page size; try a smaller page.
+                if not (controller and controller.on_failure()):
+                    raise
+                params = self.apply_page_size(params)
+                continue
+            page_records = 0
+            records = iter(raw_records)
+            while True:
+                if controller:
+                    read_started = time.monotonic()
+                try:
+                    record = next(records)
+                except StopIteration:
+                    break
+                finally:
+                    if controller:
+                        latency += time.monotonic() - read_started
+                page_records += 1
+                yield record
+            if controller:
+                page_bytes = self.client.transfer_stats.get(self.tap_stream_id)["decoded"] - bytes_before
+            self.progress.page()
+            next_page = page_properties.get(self.next_page_key)
             if next_page:
                 # The nextLink URL already contains all query params (e.g. $top,
                 # $skiptoken), so passing params again would duplicate them.
                 self.url_endpoint = next_page
                 params = {}
-            yield from raw_records
+            if controller:
+                controller.observe(latency, retries=retries, page_bytes=page_bytes, records=page_records)
+                params = self.apply_page_size(params)
+
+    def iter_records(self) -> Iterator:
+        """
+        Records of `get_records`, fetched ahead on a background thread (up to
+        `pipeline_queue_size` records) when the `pipeline` option is enabled.
+        Only top-level listings are prefetched: the records of a child stream
+        are fetched for one parent at a time, where a thread per parent
+        would cost more than it overlaps.
+        With a `parent_index`, the indexed parent ids instead.
+        """
+        if self.parent_index is not None:
+            return ({"id": parent_id} for parent_id in self.parent_index.ids(self.tap_stream_id))
+        if self.client.config.get("pipeline") and self.current_parent is None:
+            return prefetch(
+                self.get_records(), self.client.pipeline_stats,
+                get_queue_size(self.client.config), self.tap_stream_id,
+            )
+        return self.get_records()
+
+    async def aget_records(self, client, parent_obj: Dict = None) -> AsyncIterator:
+        """Async counterpart of `get_records` driven by an `AsyncClient`.
+
+        Pagination state is kept local to the call rather than on the stream,
+        so a single stream instance can page many parents concurrently.
+        Callers check `skip_parent` first."""
+        url_endpoint = self.get_url_endpoint(parent_obj)
+        params = dict(self.params)
+        while url_endpoint:
+            try:
+                response = await client.get(url_endpoint, params, self.get_headers(), self.path, tag=self.tap_stream_id)
+            except (MsGraphNotFoundError, MsGraphForbiddenError) as err:
+                if not self.remember_unavailable(parent_obj, err):
+                    raise
+                LOGGER.warning(
+                    "Resource %s for stream '%s' (endpoint: %s); skipping.",
+                    "not found" if isinstance(err, MsGraphNotFoundError) else "forbidden",
+                    self.tap_stream_id,
+                    url_endpoint,
+                )
+                return
+            for record in response.get(self.data_key, []):
+                yield record
+            self.progress.page()
+            url_endpoint = response.get(self.next_page_key)
+            params = {}
+
+    def sync_children(self, state: Dict, transformer: Transformer, parent_obj: Dict) -> None:
+        """
+        Sync the selected child streams for one parent record. With
+        `async_child_sync` enabled, parents are buffered and their children
+        are fetched concurrently on an event loop in batches; with a
+        `work_queue`, buffered parents are queued for workers instead. With
+        `precheck_parents`, parents are buffered for the child streams that
+        check them in bulk (see `prepare_parents`).
+        """
+        if not self.child_to_sync:
+            return
+        if self.child_parent_ids is not None and parent_obj["id"] not in self.child_parent_ids:
+            return
+        if self.work_queue is not None:
+            self._pending_parents.append(parent_obj)
+            if len(self._pending_parents) >= 1000:
+                self.flush_children(state, transformer)
+            return
+        batch_size = 0
+        if self.client.config.get("async_child_sync"):
+            batch_size = int(self.client.config.get("async_parent_batch_size") or 1000)
+        elif self.client.config.get("precheck_parents") or self.client.config.get("split_threshold"):
+            batch_size = max(child.parent_batch_size() for child in self.child_to_sync)
+        if batch_size:
+            self._pending_parents.append(parent_obj)
+            if len(self._pending_parents) >= batch_size:
+                self.flush_children(state, transformer)
+            return
+        for child in self.child_to_sync:
+            child.sync(state=state, transformer=transformer, parent_obj=parent_obj)
+        self.progress.parent_done()
+
+    def flush_children(self, state: Dict, transformer: Transformer) -> None:
+        """
+        Sync the children of any parents still buffered by `sync_children`,
+        or add them to the work queue.
+        """
+        parents, self._pending_parents = self._pending_parents, []
+        if not parents:
+            return
+        if self.work_queue is not None:
+            self.work_queue.add(self.tap_stream_id, parents)
+            return
+        for child in self.child_to_sync:
+            child.prepare_parents(parents, state)
+        async_children = []
+        if self.client.config.get("async_child_sync") and get_async_runner() is not None:
+            async_children = [child for child in self.child_to_sync if child.supports_async()]
+        if async_children:
+            sync_children_async(self, parents, state, transformer, async_children)
+        for parent_obj in parents:
+            for child in self.child_to_sync:
+                if child not in async_children:
+                    child.sync(state=state, transformer=transformer, parent_obj=parent_obj)
+        self.progress.parent_done(len(parents))
+
+    def get_parent_filter(self) -> Optional[str]:
+        """
+        The `$filter` from `parent_filters` that selects the records of this
+        stream whose children are synced, if any.
+        """
+        if not self.child_to_sync:
+            return None
+        return (self.client.config.get("parent_filters") or {}).get(self.tap_stream_id)
+
+    def apply_parent_filter(self) -> None:
+        """
+        Limit the parents whose children are synced to those matching the
+        stream's `parent_filters` entry, evaluated by Graph.
+        ~~~
+        When the stream is listed only for its children, the filter is added
+        to the listing itself. When its own records are written (they stay
+        unfiltered) or its ids come from a `parent_index`, the matching ids
+        are listed separately with `$select=id`, and the children of other
+        parents are skipped.
+        """
+        parent_filter = self.get_parent_filter()
+        if not parent_filter:
+            return
+        # Filters such as `assignedLicenses/$count ne 0` are advanced queries,
+        # which need `$count` and `ConsistencyLevel: eventual`.
+        params = {"$filter": parent_filter, "$count": "true"}
+        if not self.is_selected() and self.parent_index is None:
+            self.params.update(params)
+            self.headers = {**self.headers, "ConsistencyLevel": "eventual"}
+            return
+        url, params = f"{self.client.base_url}/{self.path}", {**params, "$select": "id", "$top": 999}
+        headers = {**self.headers, "ConsistencyLevel": "eventual"}
+        self.child_parent_ids = set()
+        while url:
+            response = self.client.get(url, params, headers, tag=self.tap_stream_id)
+            self.child_parent_ids.update(record["id"] for record in response.get(self.data_key, []))
+            url, params = response.get(self.next_page_key), {}
+        LOGGER.info("Syncing the children of %s '%s' records matching %s",
+                    len(self.child_parent_ids), self.tap_stream_id, parent_filter)
+
+    def count_parent_records(self, parent_obj: Dict) -> Optional[int]:
+        """
+        Number of records of this child stream for `parent_obj`, using `$count`
+        on `url_endpoint`; None where unsupported or on failure.
+        """
+        if not self.supports_count:
+            return None
+        try:
+            return int(self.client.get(
+                f"{self.url_endpoint}/$count", {}, {"ConsistencyLevel": "eventual"}, tag=self.tap_stream_id))
+        except (MsGraphError, TypeError, ValueError) as err:
+            LOGGER.warning("Could not count '%s' records of parent %s: %s", self.tap_stream_id, parent_obj["id"], err)
+            return None
+
+    def window_start(self, parent_obj: Dict) -> str:
+        """
+        The date `plan_windows` splits this parent's collection from: its
+        oldest record where known, `start_date` otherwise.
+        """
+        return self.client.config["start_date"]
+
+    def plan_windows(self, parent_obj: Optional[Dict]) -> Optional[List]:
+        """
+        Date windows to fetch this parent's collection in, in parallel, when
+        it has more than `split_threshold` records: one window per threshold,
+        up to `split_max_windows`, from `window_start` to now. None otherwise.
+        """
+        threshold = int(self.client.config.get("split_threshold") or 0)
+        if not (threshold and self.window_field and parent_obj):
+            return None
+        count = self.count_parent_records(parent_obj)
+        if not count or count <= threshold:
+            return None
+        max_windows = int(self.client.config.get("split_max_windows") or MAX_WINDOWS)
+        windows = split_windows(self.window_start(parent_obj), min(max_windows, math.ceil(count / threshold)))
+        LOGGER.info("Splitting '%s' of parent %s (%s records) into %s %s windows",
+                    self.tap_stream_id, parent_obj["id"], count, len(windows), self.window_field)
+        return windows
+
+    def iter_window_records(self, windows: List) -> Iterator:
+        """
+        Records of all `windows`, each paged on its own thread (up to
+        `split_concurrency` at once) and yielded on the calling thread.
+        """
+        return merge_windows(
+            {window: self.get_window_records(window, f"{index}/{len(windows)}")
+             for index, window in enumerate(windows, 1)},
+            int(self.client.config.get("split_concurrency") or SPLIT_CONCURRENCY),
+        )
+
+    def get_window_records(self, window, label: str) -> Iterator:
+        """
+        Pages through the records of one window with `get_records`, on a copy
+        of the stream holding the window's own endpoint and params, and logs
+        its progress.
+        """
+        window_stream = copy.copy(self)
+        window_stream.params = {**self.params, "$filter": window_filter(self.window_field, window)}
+        records = 0
+        for record in window_stream.get_records():
+            records += 1
+            yield record
+        LOGGER.info("Finished window %s of '%s' (%s): %s records",
+                    label, self.tap_stream_id, window_filter(self.window_field, window) or "all", records)
+
+    def parent_batch_size(self) -> int:
+        """
+        How many parents this child stream wants passed to `prepare_parents`
+        at once; 0 when it does not prepare parents.
+        """
+        return 0
+
+    def prepare_parents(self, parents: List[Dict], state: Dict) -> None:
+        """
+        Called with a batch of parents before this child stream is synced for
+        each of them, e.g. to check them in bulk.
+        """
+
+    def supports_async(self) -> bool:
+        """
+        Whether `async_child_sync` can fetch this child stream. It only pages,
+        transforms and writes records, so streams with child streams of their
+        own, split into date windows, sharded, or written in passthrough mode
+        or by `transform_processes` are synced by `sync`, one parent at a time.
+        """
+        config = self.client.config
+        if self.child_to_sync or self.shard is not None:
+            return False
+        if self.tap_stream_id in (config.get("passthrough_streams") or []) or config.get("transform_processes"):
+            return False
+        return not (self.window_field and config.get("split_threshold"))
+
+    def parent_synced(self, parent_obj: Dict, state: Dict) -> None:
+        """Called once this child stream has been fully synced for `parent_obj`."""
+
+    def set_negative_cache(self, negative_cache) -> None:
+        """
+        Share a negative cache with the child streams of this stream.
+        """
+        for child in self.child_to_sync:
+            child.negative_cache = negative_cache
+            child.set_negative_cache(negative_cache)
+
+    def skip_parent(self, parent_obj: Optional[Dict]) -> bool:
+        """
+        Whether to skip syncing this child stream for `parent_obj`, because
+        its endpoint was recently found missing or forbidden.
+        """
+        if self.negative_cache is None or not parent_obj:
+            return False
+        return self.negative_cache.skip(self.tap_stream_id, parent_obj["id"])
+
+    def remember_unavailable(self, parent_obj: Optional[Dict], err: MsGraphError) -> bool:
+        """
+        Handles a 404 or 403 from this stream's endpoint. A 404 is skipped, and
+        with a negative cache, the parent is cached for both. Returns False
+        when the error should be raised instead (a 403 without the cache).
+        """
+        cached = self.negative_cache is not None and bool(parent_obj)
+        if cached:
+            status = 403 if isinstance(err, MsGraphForbiddenError) else 404
+            self.negative_cache.add(self.tap_stream_id, parent_obj["id"], status)
+        return cached or isinstance(err, MsGraphNotFoundError)
+
+    def in_shard(self, record: Dict) -> bool:
+        """
+        Whether a record of this parent stream belongs to the `shard` being
+        synced; its children are only synced by the same shard.
+        """
+        return self.shard is None or shard_of(record["id"], self.shard[1]) == self.shard[0]
+
+    def set_progress(self, progress: ProgressReporter) -> None:
+        """
+        Share a progress reporter with this stream and its child streams.
+        """
+        self.progress = progress
+        for child in self.child_to_sync:
+            child.set_progress(progress)
+
+    def get_count(self) -> Optional[int]:
+        """
+        Return the number of records in the stream's collection using `$count`
+        (which needs `ConsistencyLevel: eventual`), or None where Graph does
+        not support it or the request fails.
+        """
+        if self.child_parent_ids is not None:
+            return len(self.child_parent_ids)
+        if self.parent_index is not None:
+            return self.parent_index.count(self.tap_stream_id)
+        if not self.supports_count:
+            return None
+        url, _, query = self.get_url_endpoint().partition("?")
+        endpoint = f"{url}/$count" + (f"?{query}" if query else "")
+        parent_filter = self.get_parent_filter()
+        params = {"$filter": parent_filter} if parent_filter else {}
+        try:
+            return int(self.client.get(endpoint, params, {"ConsistencyLevel": "eventual"}, tag=self.tap_stream_id))
+        except (MsGraphError, TypeError, ValueError) as err:
+            LOGGER.warning("Could not count records of '%s': %s", self.tap_stream_id, err)
+            return None
+
+    def use_passthrough(self) -> bool:
+        """
+        Whether records can be written without the Transformer: the stream
+        must support it, be listed in `passthrough_streams`, and have no field
+        deselected (which the Transformer would remove).
+        """
+        if self.tap_stream_id not in (self.client.config.get("passthrough_streams") or []):
+            return False
+        if not self.supports_passthrough:
+            LOGGER.warning("Stream '%s' does not support passthrough; transforming its records.", self.tap_stream_id)
+            return False
+        for breadcrumb, field_metadata in self.metadata.items():
+            if not breadcrumb or field_metadata.get("inclusion") == "automatic":
+                continue
+            if field_metadata.get("selected") is False or field_metadata.get("inclusion") == "unsupported":
+                LOGGER.info("Stream '%s' has deselected fields; transforming its records.", self.tap_stream_id)
+                return False
+        return True
+
+    def passthrough_record(self, record: Dict) -> Dict:
+        """
+        The record as written in passthrough mode: Graph's values as returned,
+        keeping only the schema's top-level properties (dropping annotations
+        such as `@odata.type`).
+        """
+        properties = self.schema["properties"]
+        return {key: value for key, value in record.items() if key in properties}
+
+    def uses_raw_pages(self, passthrough: bool, parent_obj: Optional[Dict], windows: Optional[List]) -> bool:
+        """
+        Whether passthrough records can be written as the JSON text of their
+        streamed page: only for a top-level stream (whose records
+        `modify_object` leaves unchanged) whose pages `get_page` streams.
+        """
+        config = self.client.config
+        if not (passthrough and config.get("stream_pages")) or parent_obj or windows or self.child_to_sync:
+            return False
+        return not (self.conditional_pages and config.get("response_cache"))
+
+    def write_passthrough(self, record: Dict, raw: Optional[str]) -> None:
+        """
+        Writes a passthrough record, as its page's JSON text when there is one
+        that holds only schema properties on a single line, so it is not
+        encoded again.
+        """
+        if raw is not None and self.schema["properties"].keys() >= record.keys() and "\n" not in raw:
+            write_record_json(self.tap_stream_id, raw)
+            return
+        write_record(self.tap_stream_id, self.passthrough_record(record))
 
     def write_schema(self) -> None:
         """
@@ -201,6 +714,10 @@ class BaseStream(ABC):
 class IncrementalStream(BaseStream):
     """Base Class for Incremental Stream."""
 
+    def supports_async(self) -> bool:
+        # Bookmarks are only kept by `sync`.
+        return False
+
 
     def get_bookmark(self, state: dict, stream: str, key: Any = None) -> int:
         """A wrapper for singer.get_bookmark to deal with compatibility for
@@ -232,13 +749,18 @@ class IncrementalStream(BaseStream):
         parent_obj: Dict = None,
     ) -> Dict:
         """Implementation for `type: Incremental` stream."""
+        if self.skip_parent(parent_obj):
+            return 0
+        self.current_parent = parent_obj
         bookmark_date = self.get_bookmark(state, self.tap_stream_id)
         current_max_bookmark_date = bookmark_date
         self.update_params(updated_since=bookmark_date)
         self.url_endpoint = self.get_url_endpoint(parent_obj)
 
         with metrics.record_counter(self.tap_stream_id) as counter:
-            for record in self.get_records():
+            for record in self.iter_records():
+                if not self.in_shard(record):
+                    continue
                 record = self.modify_object(record, parent_obj)
                 transformed_record = transformer.transform(
                     record, self.schema, self.metadata
@@ -249,14 +771,15 @@ class IncrementalStream(BaseStream):
                     if self.is_selected():
                         write_record(self.tap_stream_id, transformed_record)
                         counter.increment()
+                        self.progress.record()
 
                     current_max_bookmark_date = max(
                         current_max_bookmark_date, record_timestamp
                     )
 
-                    for child in self.child_to_sync:
-                        child.sync(state=state, transformer=transformer, parent_obj=record)
+                    self.sync_children(state, transformer, record)
 
+            self.flush_children(state, transformer)
             state = self.write_bookmark(state, self.tap_stream_id, value=current_max_bookmark_date)
             return counter.value
 
@@ -271,21 +794,60 @@ class FullTableStream(BaseStream):
         parent_obj: Dict = None,
     ) -> Dict:
         """Abstract implementation for `type: Fulltable` stream."""
+        if self.skip_parent(parent_obj):
+            return 0
+        self.current_parent = parent_obj
         self.url_endpoint = self.get_url_endpoint(parent_obj)
         self.update_data_payload(parent_obj=parent_obj)
         self.update_params()
+        # With `transform_processes`, selected records are transformed and
+        # written by worker processes.
+        pool = get_transform_pool() if self.is_selected() else None
+        # In passthrough mode only every `passthrough_sample_interval`th record
+        # is run through the Transformer, to validate it against the schema.
+        passthrough = self.is_selected() and self.use_passthrough()
+        sample_interval = int(self.client.config.get("passthrough_sample_interval") or PASSTHROUGH_SAMPLE_INTERVAL)
+        # Parents with more records than `split_threshold` are fetched in
+        # parallel date windows.
+        windows = self.plan_windows(parent_obj)
+        # Streamed pages of a passthrough stream also yield each record's JSON
+        # text, which is written as is.
+        self.raw_pages = self.uses_raw_pages(passthrough, parent_obj, windows)
+        records = self.iter_window_records(windows) if windows else self.iter_records()
         with metrics.record_counter(self.tap_stream_id) as counter:
-            for record in self.get_records():
+            for index, record in enumerate(records):
+                raw = None
+                if self.raw_pages:
+                    record, raw = record
+                if not self.in_shard(record):
+                    continue
                 record = self.modify_object(record, parent_obj)
+                if passthrough:
+                    if index % sample_interval == 0:
+                        transformer.transform(record, self.schema, self.metadata)
+                    self.write_passthrough(record, raw)
+                    counter.increment()
+                    self.progress.record()
+                    self.sync_children(state, transformer, record)
+                    continue
+                if pool:
+                    pool.submit(self.tap_stream_id, record, self.schema, self.metadata)
+                    counter.increment()
+                    self.progress.record()
+                    self.sync_children(state, transformer, record)
+                    continue
                 transformed_record = transformer.transform(
                     record, self.schema, self.metadata
                 )
                 if self.is_selected():
                     write_record(self.tap_stream_id, transformed_record)
                     counter.increment()
+                    self.progress.record()
 
-                for child in self.child_to_sync:
-                    child.sync(state=state, transformer=transformer, parent_obj=record)
+                self.sync_children(state, transformer, record)
 
+            self.flush_children(state, transformer)
+            if parent_obj:
+                self.parent_synced(parent_obj, state)
             return counter.value
 
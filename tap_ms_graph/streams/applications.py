@@ -10,5 +10,7 @@ class Applications(FullTableStream):
     key_properties = ["id"]
     replication_method = "FULL_TABLE"
     replication_keys = []
+    supports_passthrough = True
+    conditional_pages = True
     data_key = "value"
     path = "applications"
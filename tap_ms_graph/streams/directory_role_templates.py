@@ -12,6 +12,7 @@ class DirectoryRoleTemplates(FullTableStream):
     replication_keys = []
     data_key = "value"
     path = "directoryRoleTemplates"
+    conditional_pages = True
     supports_top = False
 
 
@@ -12,8 +12,10 @@ class DirectoryRoles(FullTableStream):
     replication_keys = []
     data_key = "value"
     path = "directoryRoles"
+    conditional_pages = True
     children = ["directory_role_member"]
     supports_top = False
+    delta_path = "directoryRoles/delta"
 
 
     def update_params(self, **kwargs) -> None:
@@ -1,8 +1,13 @@
+from collections import OrderedDict
 from typing import Dict, Iterator, List
 from singer import get_logger
+from tap_ms_graph.exceptions import MsGraphNotFoundError
 from tap_ms_graph.streams.abstracts import FullTableStream
 
 LOGGER = get_logger()
+GROUP_TYPE = "#microsoft.graph.group"
+# Groups whose direct members are kept by `group_member_depth`.
+MEMO_SIZE = 1000
 
 
 class GroupMember(FullTableStream):
@@ -13,12 +18,116 @@ class GroupMember(FullTableStream):
     data_key = "value"
     path = "groups/{group_id}/members"
     parent = "groups"
-    
+
+    def __init__(self, client=None, catalog=None) -> None:
+        super().__init__(client, catalog)
+        # Direct member ids per group id, for the `memo_size` most recently
+        # used groups, so that a subgroup shared by many groups is only listed
+        # once while it is in use.
+        self._direct_members = OrderedDict()
+        self.memo_size = int(self.client.config.get("group_member_memo_size") or MEMO_SIZE)
+
+    @property
+    def transitive(self) -> bool:
+        return self.client.config.get("group_member_mode") == "transitive"
+
+    @property
+    def with_depth(self) -> bool:
+        return self.transitive and bool(self.client.config.get("group_member_depth"))
+
+    def supports_async(self) -> bool:
+        return not self.with_depth and super().supports_async()
+
     def get_url_endpoint(self, parent_obj: Dict = None) -> str:
         """Constructs the API endpoint URL for fetching group member for a given group."""
         if not parent_obj or 'id' not in parent_obj:
             raise ValueError("parent_obj must be provided with an 'id' key.")
-        return f"{self.client.base_url}/{self.path.format(group_id = parent_obj['id'])}"
+        path = self.path.replace("/members", "/transitiveMembers") if self.transitive else self.path
+        return f"{self.client.base_url}/{path.format(group_id = parent_obj['id'])}"
+
+    def update_params(self, **kwargs) -> None:
+        """In transitive mode only member ids are requested."""
+        super().update_params(**kwargs)
+        if self.transitive:
+            self.params["$select"] = "id"
+
+    def get_records(self) -> Iterator:
+        """
+        Members of the current group. With `group_member_depth`, the members
+        of a group without subgroups are all direct and are read from
+        `transitiveMembers` as usual; only groups that contain groups are
+        re-crawled from the direct members of the group and its subgroups,
+        to know how deep each member is.
+        """
+        if not self.with_depth:
+            yield from super().get_records()
+            return
+        group_id = self.current_parent["id"]
+        if not self.has_subgroups(group_id):
+            for record in super().get_records():
+                yield {**record, "membership_depth": 1}
+            return
+        yield from self.expand_members(group_id)
+
+    def has_subgroups(self, group_id: str) -> bool:
+        """
+        Whether `group_id` has a group among its direct members, from its
+        memoized direct members or else a request for at most one of its
+        member groups.
+        """
+        if group_id in self._direct_members:
+            return any(member.get("@odata.type") == GROUP_TYPE for member in self._direct_members[group_id])
+        url = f"{self.client.base_url}/{self.path.format(group_id=group_id)}/{GROUP_TYPE.lstrip('#')}"
+        try:
+            response = self.client.get(url, {"$select": "id", "$top": 1}, self.get_headers(), tag=self.tap_stream_id)
+        except MsGraphNotFoundError:
+            # Left to the `transitiveMembers` listing to report.
+            return False
+        return bool(response.get(self.data_key))
+
+    def expand_members(self, group_id: str) -> Iterator[Dict]:
+        """
+        Every member of `group_id`, direct or through subgroups, once, with
+        `membership_depth` set to 1 for direct members, 2 for members of a
+        direct subgroup and so on (the shortest path when there are several).
+        """
+        seen, groups, depth = {group_id}, [group_id], 1
+        expanded = {group_id}
+        while groups:
+            subgroups = []
+            for parent_id in groups:
+                for member in self.get_direct_members(parent_id):
+                    if member["id"] in seen:
+                        continue
+                    seen.add(member["id"])
+                    yield {**member, "membership_depth": depth}
+                    if member.get("@odata.type") == GROUP_TYPE and member["id"] not in expanded:
+                        expanded.add(member["id"])
+                        subgroups.append(member["id"])
+            groups, depth = subgroups, depth + 1
+
+    def get_direct_members(self, group_id: str) -> List[Dict]:
+        """Ids and types of the direct members of `group_id`, memoized in an LRU."""
+        if group_id in self._direct_members:
+            self._direct_members.move_to_end(group_id)
+            return self._direct_members[group_id]
+        members = []
+        url = f"{self.client.base_url}/{self.path.format(group_id=group_id)}"
+        params = {"$select": "id", "$top": self.page_size}
+        while url:
+            try:
+                response = self.client.get(url, params, self.get_headers(), tag=self.tap_stream_id)
+            except MsGraphNotFoundError:
+                LOGGER.warning("Group %s not found for stream '%s'; skipping.", group_id, self.tap_stream_id)
+                break
+            members.extend({key: record.get(key) for key in ("@odata.type", "id")}
+                           for record in response.get(self.data_key, []))
+            self.progress.page()
+            url, params = response.get(self.next_page_key), {}
+        self._direct_members[group_id] = members
+        while len(self._direct_members) > self.memo_size:
+            self._direct_members.popitem(last=False)
+        return members
 
     def modify_object(self, record: Dict, parent_record: Dict = None) -> Dict:
         """
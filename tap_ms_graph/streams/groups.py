@@ -12,4 +12,6 @@ class Groups(FullTableStream):
     replication_keys = []
     data_key = "value"
     path = "groups"
+    supports_count = True
+    delta_path = "groups/delta"
     children = ["group_owner", "group_member"]
@@ -1,8 +1,13 @@
-from typing import Dict, Iterator, List
+import urllib.parse
+from typing import Dict, Iterator, List, Optional, Tuple
+from requests.exceptions import Timeout
 from singer import get_logger
+from tap_ms_graph.exceptions import MsGraphError
+from tap_ms_graph.graph_batch import batch_get
 from tap_ms_graph.streams.abstracts import FullTableStream
 
 LOGGER = get_logger()
+PRECHECK_BATCH_SIZE = 100
 
 
 class MailMessages(FullTableStream):
@@ -13,7 +18,24 @@ class MailMessages(FullTableStream):
     data_key = "value"
     path = "users/{user_id}/messages"
     parent = "users"
+    supports_count = True
+    window_field = "receivedDateTime"
 
+    def __init__(self, client=None, catalog=None) -> None:
+        super().__init__(client, catalog)
+        # Pre-check outcome per parent id: True when its mailbox is skipped.
+        self._skip_mailbox = {}
+        # Item counts and oldest message dates from the pre-check, used by
+        # `plan_windows` instead of `$count` and `start_date`.
+        self._mailbox_totals = {}
+        self._mailbox_oldest = {}
+        # Fingerprints of the mailboxes to sync, saved once they are synced.
+        self._pending_fingerprints = {}
+
+    def sync(self, state: Dict, transformer, parent_obj: Dict = None) -> Dict:
+        if self.parent_batch_size() and parent_obj and parent_obj["id"] not in self._skip_mailbox:
+            self.prepare_parents([parent_obj], state)
+        return super().sync(state, transformer, parent_obj)
 
     def get_url_endpoint(self, parent_obj: Dict = None) -> str:
         """Constructs the API endpoint URL for fetching mail messages for a given user."""
@@ -28,3 +50,145 @@ class MailMessages(FullTableStream):
         if parent_record:
             record["user_id"] = parent_record.get("id")
         return record
+
+    def parent_batch_size(self) -> int:
+        if not (self.client.config.get("precheck_parents") or self.client.config.get("split_threshold")):
+            return 0
+        return int(self.client.config.get("precheck_batch_size") or PRECHECK_BATCH_SIZE)
+
+    def prepare_parents(self, parents: List[Dict], state: Dict) -> None:
+        """
+        Checks the mailboxes of `parents` in bulk, with JSON batching: the item
+        counts of their top-level mail folders and the last modification of
+        their newest message.
+        ~~~
+        Mailboxes without any message, or whose counts and newest modification
+        (kept in the state under `mailboxes` once a mailbox has been synced)
+        are unchanged since the previous run, are skipped. With a negative
+        cache, so are mailboxes that are missing or forbidden, which are added
+        to it; without one they are synced, so their errors are handled as
+        without the pre-check. Mailboxes whose pre-check failed are synced. The item
+        counts of the mailboxes that are synced are added to the records the
+        progress reporter expects.
+
+        With `split_threshold`, the number of messages (`$count`, which unlike
+        the folder counts includes subfolders) and the date of the oldest one
+        are also kept for `plan_windows`; without `precheck_parents`, only
+        those are requested and no mailbox is skipped.
+        """
+        precheck = bool(self.client.config.get("precheck_parents"))
+        split = bool(self.client.config.get("split_threshold"))
+        if not (precheck or split):
+            return
+        requests = {}
+        for index, parent in enumerate(parents):
+            user = f"/users/{parent['id']}"
+            requests[f"{index}-folders"] = f"{user}/mailFolders?$select=totalItemCount&$top=999"
+            if precheck:
+                requests[f"{index}-newest"] = (
+                    f"{user}/messages?$select=lastModifiedDateTime"
+                    f"&$orderby={urllib.parse.quote('lastModifiedDateTime desc')}&$top=1"
+                )
+            if split:
+                requests[f"{index}-oldest"] = (
+                    f"{user}/messages?$select=receivedDateTime"
+                    f"&$orderby={urllib.parse.quote('receivedDateTime asc')}&$top=1&$count=true"
+                )
+        try:
+            results = batch_get(self.client, requests)
+        except (MsGraphError, Timeout) as err:
+            # Without results every mailbox of the group is synced, as when
+            # one of its requests fails inside the batch.
+            LOGGER.warning("Mailbox pre-check of %s users failed; syncing them all: %s", len(parents), err)
+            results = {}
+        if precheck:
+            self.check_mailboxes(parents, results, state)
+        for index, parent in enumerate(parents):
+            self._skip_mailbox.setdefault(parent["id"], False)
+            if split and not self._skip_mailbox[parent["id"]]:
+                self.remember_size(parent["id"], results.get(f"{index}-folders"), results.get(f"{index}-oldest"))
+
+    def check_mailboxes(self, parents: List[Dict], results: Dict, state: Dict) -> None:
+        """Decides from their pre-check `results` which of `parents` are skipped."""
+        fingerprints = state.setdefault("bookmarks", {}).setdefault(self.tap_stream_id, {}).setdefault("mailboxes", {})
+        outcomes = {"sync": 0, "empty": 0, "unchanged": 0, "unavailable": 0}
+        for index, parent in enumerate(parents):
+            outcome = self.check_mailbox(
+                parent["id"], results.get(f"{index}-folders"), results.get(f"{index}-newest"), fingerprints)
+            self._skip_mailbox[parent["id"]] = outcome != "sync"
+            outcomes[outcome] += 1
+        LOGGER.info(
+            "Mailbox pre-check: %s of %s mailboxes to sync (%s empty, %s unchanged, %s unavailable)",
+            outcomes["sync"], len(parents), outcomes["empty"], outcomes["unchanged"], outcomes["unavailable"],
+        )
+
+    def check_mailbox(self, user_id: str, folders: Optional[Tuple[int, Dict]],
+                      newest: Optional[Tuple[int, Dict]], fingerprints: Dict) -> str:
+        """
+        Returns `sync`, `empty`, `unchanged` or `unavailable` for one mailbox
+        from its pre-check responses (`(status, body)`, None if missing).
+        """
+        statuses = {result[0] for result in (folders, newest) if result}
+        if statuses & {403, 404} and self.negative_cache is not None:
+            self.negative_cache.add(self.tap_stream_id, user_id, 403 if 403 in statuses else 404)
+            return "unavailable"
+        if statuses != {200} or not folders or not newest:
+            # The pre-check failed; sync the mailbox rather than guess.
+            return "sync"
+        messages = newest[1].get("value", [])
+        if not messages:
+            return "empty"
+        total = mailbox_total(folders[1])
+        fingerprint = f"{total}:{messages[0].get('lastModifiedDateTime')}"
+        if fingerprints.get(user_id) == fingerprint:
+            return "unchanged"
+        self._pending_fingerprints[user_id] = fingerprint
+        self.progress.expect(total)
+        return "sync"
+
+    def remember_size(self, user_id: str, folders: Optional[Tuple[int, Dict]],
+                      oldest: Optional[Tuple[int, Dict]]) -> None:
+        """
+        Keeps a mailbox's message count for `plan_windows`, and the date of
+        its oldest message when it is large enough to be split, from its
+        `folders` and `oldest` pre-check responses.
+        ~~~
+        The count is the `@odata.count` of `oldest`. Without it, the item
+        counts of the top-level folders, which leave out subfolders, are only
+        trusted well below `split_threshold`; `plan_windows` counts the
+        messages of other mailboxes with `$count`.
+        """
+        threshold = int(self.client.config["split_threshold"])
+        body = oldest[1] if oldest and oldest[0] == 200 else {}
+        total = body.get("@odata.count")
+        if total is None:
+            if not (folders and folders[0] == 200) or mailbox_total(folders[1]) * 2 > threshold:
+                return
+            total = mailbox_total(folders[1])
+        self._mailbox_totals[user_id] = int(total)
+        messages = body.get("value", [])
+        if int(total) > threshold and messages and messages[0].get("receivedDateTime"):
+            self._mailbox_oldest[user_id] = messages[0]["receivedDateTime"]
+
+    def parent_synced(self, parent_obj: Dict, state: Dict) -> None:
+        fingerprint = self._pending_fingerprints.pop(parent_obj["id"], None)
+        if fingerprint is not None:
+            mailboxes = state.setdefault("bookmarks", {}).setdefault(self.tap_stream_id, {}).setdefault("mailboxes", {})
+            mailboxes[parent_obj["id"]] = fingerprint
+
+    def count_parent_records(self, parent_obj: Dict) -> Optional[int]:
+        total = self._mailbox_totals.pop(parent_obj["id"], None)
+        return total if total is not None else super().count_parent_records(parent_obj)
+
+    def window_start(self, parent_obj: Dict) -> str:
+        return self._mailbox_oldest.pop(parent_obj["id"], None) or super().window_start(parent_obj)
+
+    def skip_parent(self, parent_obj: Optional[Dict]) -> bool:
+        if parent_obj and self._skip_mailbox.pop(parent_obj["id"], False):
+            return True
+        return super().skip_parent(parent_obj)
+
+
+def mailbox_total(folders: Dict) -> int:
+    """Number of items in a mailbox, from its top-level mail folders."""
+    return sum(folder.get("totalItemCount") or 0 for folder in folders.get("value", []))
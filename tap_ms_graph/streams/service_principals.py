@@ -10,5 +10,6 @@ class ServicePrincipals(FullTableStream):
     key_properties = ["id"]
     replication_method = "FULL_TABLE"
     replication_keys = []
+    supports_passthrough = True
     data_key = "value"
     path = "servicePrincipals"
@@ -12,4 +12,6 @@ class Users(FullTableStream):
     replication_keys = []
     data_key = "value"
     path = "users"
+    supports_count = True
+    delta_path = "users/delta"
     children = ["calendar_events", "contacts", "drive_items", "mail_messages"]
@@ -1,7 +1,19 @@
 import singer
 from typing import Dict
 from tap_ms_graph.streams import STREAMS
+from tap_ms_graph.async_sync import set_async_runner, start_async_runner
 from tap_ms_graph.client import Client
+from tap_ms_graph.batch import start_batch_writer
+from tap_ms_graph.codec import get_codec
+from tap_ms_graph.negative_cache import open_negative_cache
+from tap_ms_graph.output import set_batch_writer, set_codec, set_transform_pool, set_writer, write_state
+from tap_ms_graph.parent_index import open_parent_index
+from tap_ms_graph.pipeline import start_writer
+from tap_ms_graph.profiling import profile_stream
+from tap_ms_graph.progress import PROGRESS_INTERVAL, ProgressReporter
+from tap_ms_graph.sharding import parse_shard
+from tap_ms_graph.transform_pool import start_transform_pool
+from tap_ms_graph.work_queue import POLL_INTERVAL, WAIT_TIMEOUT, open_work_queue, sync_from_queue
 
 LOGGER = singer.get_logger()
 
@@ -14,7 +26,7 @@ def update_currently_syncing(state: Dict, stream_name: str) -> None:
         del state["currently_syncing"]
     else:
         singer.set_currently_syncing(state, stream_name)
-    singer.write_state(state)
+    write_state(state)
 
 
 def write_schema(stream, client, streams_to_sync, catalog) -> None:
@@ -39,36 +51,136 @@ def sync(client: Client, config: Dict, catalog: singer.Catalog, state) -> None:
     """
     Sync selected streams from catalog
     """
+    codec = get_codec(config.get("json_codec"))
+    set_codec(codec)
 
     streams_to_sync = []
     for stream in catalog.get_selected_streams(state):
         streams_to_sync.append(stream.stream)
     LOGGER.info("selected_streams: {}".format(streams_to_sync))
 
+    # Parents are split across shards by id; streams with no children are
+    # synced by the first shard only.
+    shard = parse_shard(config.get("shard"))
+    if shard:
+        LOGGER.info("Syncing shard %s of %s", *shard)
+
+    # In a distributed sync the coordinator lists parents into the work queue
+    # and syncs the streams without children; workers sync child streams.
+    work_queue = open_work_queue(config)
+    role = config.get("work_queue_role") if work_queue else None
+    if role == "coordinator":
+        LOGGER.info("Started work queue run %s", work_queue.start_run())
+    elif role == "worker":
+        LOGGER.info("Joined work queue run %s", work_queue.join_run(
+            float(config.get("work_queue_wait_timeout") or WAIT_TIMEOUT),
+            float(config.get("work_queue_poll_interval") or POLL_INTERVAL)))
+
+    # Parent streams synced only for their children read their ids from
+    # the index, refreshed with delta queries, instead of listing them.
+    parent_index = open_parent_index(config)
+    # Child endpoints that returned 404/403 for a parent are skipped until
+    # their entry expires.
+    negative_cache = open_negative_cache(config)
+
     last_stream = singer.get_currently_syncing(state)
     LOGGER.info("last/currently syncing stream: {}".format(last_stream))
 
-    with singer.Transformer() as transformer:
-        for stream_name in streams_to_sync:
-
-            stream = STREAMS[stream_name](client, catalog.get_stream(stream_name))
-            if stream.parent:
-
-                if stream.parent not in streams_to_sync:
-
-                    streams_to_sync.append(stream.parent)
-                continue
-
-
-            write_schema(stream, client, streams_to_sync, catalog)
-
-            LOGGER.info("START Syncing: {}".format(stream_name))
-            update_currently_syncing(state, stream_name)
-            total_records = stream.sync(state=state, transformer=transformer)
-
-            update_currently_syncing(state, None)
-            LOGGER.info(
-                "FINISHED Syncing: {}, total_records: {}".format(
-                    stream_name, total_records
+    # With `pipeline` or `buffered_output`, messages go through a writer
+    # rather than being written and flushed one by one.
+    writer = start_writer(config, client.pipeline_stats)
+    set_writer(writer)
+    batch_writer = start_batch_writer(config, codec)
+    set_batch_writer(batch_writer)
+    transform_pool = start_transform_pool(config, codec)
+    set_transform_pool(transform_pool)
+    # With `async_child_sync`, one event loop and session serve every batch.
+    async_runner = start_async_runner(config, client)
+    set_async_runner(async_runner)
+    try:
+        with singer.Transformer() as transformer:
+            for stream_name in streams_to_sync:
+
+                stream = STREAMS[stream_name](client, catalog.get_stream(stream_name))
+                if stream.parent:
+
+                    if stream.parent not in streams_to_sync:
+
+                        streams_to_sync.append(stream.parent)
+                    continue
+
+                if shard and not stream.children and shard[0] != 0:
+                    LOGGER.info("Skipping '%s': synced by shard 0", stream_name)
+                    continue
+
+                write_schema(stream, client, streams_to_sync, catalog)
+                if role == "worker" and not stream.child_to_sync:
+                    LOGGER.info("Skipping '%s': synced by the coordinator", stream_name)
+                    continue
+                queue_parents = role == "coordinator" and bool(stream.child_to_sync)
+                if queue_parents:
+                    stream.work_queue = work_queue
+                if parent_index and stream.delta_path and stream.child_to_sync and not stream.is_selected():
+                    stream.parent_index = parent_index
+                    parent_index.refresh(stream)
+                if stream.child_to_sync:
+                    stream.apply_parent_filter()
+
+                LOGGER.info("START Syncing: {}".format(stream_name))
+                update_currently_syncing(state, stream_name)
+                progress_interval = config.get("progress_interval")
+                progress = ProgressReporter(
+                    stream_name, float(PROGRESS_INTERVAL if progress_interval is None else progress_interval))
+                stream.set_progress(progress)
+                if negative_cache:
+                    stream.set_negative_cache(negative_cache)
+                if stream.child_to_sync:
+                    total_parents = stream.get_count()
+                    if shard and total_parents:
+                        total_parents = -(-total_parents // shard[1])
+                    progress.set_total_parents(total_parents)
+                with profile_stream(config.get("profile_dir"), stream_name):
+                    if role == "worker":
+                        total_records = sync_from_queue(stream, work_queue, state, transformer, config)
+                    else:
+                        total_records = stream.sync(state=state, transformer=transformer)
+                if queue_parents:
+                    work_queue.mark_listed(stream_name)
+                progress.report(final=True)
+
+                update_currently_syncing(state, None)
+                client.transfer_stats.emit()
+                client.endpoint_metrics.emit()
+                client.request_memo.emit()
+                if writer:
+                    writer.flush()
+                # Pages are remembered as seen only once their records are out.
+                if config.get("response_cache"):
+                    client.response_cache.commit()
+                client.pipeline_stats.emit(stream_name)
+                LOGGER.info(
+                    "FINISHED Syncing: {}, total_records: {}".format(
+                        stream_name, total_records
+                    )
                 )
-            )
+        if role == "coordinator":
+            work_queue.finish_run()
+    finally:
+        if async_runner:
+            set_async_runner(None)
+            async_runner.close()
+        if negative_cache:
+            negative_cache.close()
+        if parent_index:
+            parent_index.close()
+        if work_queue:
+            work_queue.close()
+        if transform_pool:
+            set_transform_pool(None)
+            transform_pool.close()
+        if batch_writer:
+            set_batch_writer(None)
+            batch_writer.close()
+        if writer:
+            set_writer(None)
+            writer.close()
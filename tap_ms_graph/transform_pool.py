@@ -0,0 +1,90 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Mapping, Optional
+
+from singer import Transformer, get_logger
+
+from tap_ms_graph import output
+from tap_ms_graph.codec import get_codec
+
+LOGGER = get_logger()
+CHUNK_SIZE = 500
+
+# Per worker process, created by the first chunk it transforms.
+_transformer = None
+
+
+def _transform_chunk(schema: Dict, mdata: Dict, records: List[Dict], codec_name: str) -> List[str]:
+    """Runs in a worker process: transforms `records` and returns them encoded."""
+    global _transformer
+    if _transformer is None:
+        _transformer = Transformer()
+    codec = get_codec(codec_name)
+    return [codec.dumps(_transformer.transform(record, schema, mdata)) for record in records]
+
+
+class TransformPool:
+    """
+    Transforms and serializes the records of selected streams in worker
+    processes, so that CPU-bound streams are not limited to one core.
+    ~~~
+    Records are sent to the workers in chunks of `chunk_size` per stream and
+    written in the order they were submitted: each stream's chunks are written
+    oldest first, blocking on the oldest one once `max_pending` chunks are in
+    flight. Everything submitted is written before any STATE message (see
+    `output.set_transform_pool`), so bookmarks never get ahead of records.
+    """
+
+    def __init__(self, processes: int, codec_name: str, chunk_size: int = CHUNK_SIZE,
+                 max_pending: Optional[int] = None) -> None:
+        self.codec_name = codec_name
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending or 2 * processes
+        self._executor = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"))
+        self._chunks = {}
+        self._pending = deque()
+
+    def submit(self, stream_name: str, record: Dict, schema: Dict, mdata: Dict) -> None:
+        """Queues `record` to be transformed against `schema`/`mdata` and written."""
+        chunk = self._chunks.get(stream_name)
+        if chunk is None:
+            chunk = self._chunks[stream_name] = (schema, mdata, [])
+        chunk[2].append(record)
+        if len(chunk[2]) >= self.chunk_size:
+            self._submit_chunk(stream_name)
+
+    def _submit_chunk(self, stream_name: str) -> None:
+        schema, mdata, records = self._chunks.pop(stream_name)
+        future = self._executor.submit(_transform_chunk, schema, mdata, records, self.codec_name)
+        self._pending.append((stream_name, future))
+        while len(self._pending) > self.max_pending or (self._pending and self._pending[0][1].done()):
+            self._write_oldest()
+
+    def _write_oldest(self) -> None:
+        stream_name, future = self._pending.popleft()
+        for record_json in future.result():
+            output.write_record_json(stream_name, record_json)
+
+    def drain(self) -> None:
+        """Transforms and writes every record submitted so far."""
+        for stream_name in list(self._chunks):
+            self._submit_chunk(stream_name)
+        while self._pending:
+            self._write_oldest()
+
+    def close(self) -> None:
+        """Stops the workers; records not drained yet are dropped."""
+        self._chunks.clear()
+        self._pending.clear()
+        self._executor.shutdown(cancel_futures=True)
+
+
+def start_transform_pool(config: Mapping[str, Any], codec) -> Optional[TransformPool]:
+    """Returns a `TransformPool` of `transform_processes` workers, or None when
+    the option is not set."""
+    processes = int(config.get("transform_processes") or 0)
+    if processes <= 0:
+        return None
+    LOGGER.info("Transforming records in %s worker processes", processes)
+    return TransformPool(processes, codec.name, int(config.get("transform_chunk_size") or CHUNK_SIZE))
@@ -0,0 +1,104 @@
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from singer import get_logger
+from singer.utils import strftime, strptime_to_utc
+
+LOGGER = get_logger()
+SPLIT_CONCURRENCY = 4
+MAX_WINDOWS = 16
+_DONE = object()
+
+Window = Tuple[Optional[str], Optional[str]]
+
+
+def split_windows(start: str, count: int, end: Optional[datetime] = None) -> List[Window]:
+    """
+    Splits the time from `start` to `end` (now by default) into `count`
+    windows of equal length, as `(lower, upper)` bounds. The first window has
+    no lower bound and the last none upper bound, so together they cover all
+    time with no gap or overlap.
+    """
+    lower = strptime_to_utc(start)
+    upper = end or datetime.now(timezone.utc)
+    if count < 2 or upper <= lower:
+        return [(None, None)]
+    step = (upper - lower) / count
+    bounds = [strftime(lower + step * index) for index in range(1, count)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def window_filter(field: str, window: Window) -> str:
+    """The `$filter` selecting the records of `window` (`ge` lower, `lt` upper)."""
+    lower, upper = window
+    clauses = []
+    if lower:
+        clauses.append(f"{field} ge {lower}")
+    if upper:
+        clauses.append(f"{field} lt {upper}")
+    return " and ".join(clauses)
+
+
+def _put(items: queue.Queue, item, stop: threading.Event) -> bool:
+    """Blocking put that gives up once `stop` is set. Returns False if it did."""
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def merge_windows(windows: Dict[Window, Iterable], concurrency: int = SPLIT_CONCURRENCY,
+                  size: int = 1000) -> Iterator:
+    """
+    Iterates the record iterables of several windows on up to `concurrency`
+    threads and yields their records on the calling thread, in no particular
+    order across windows. Fetch errors are re-raised to the consumer.
+    """
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    pending = list(windows.items())
+    lock = threading.Lock()
+    errors = []
+
+    def produce() -> None:
+        while not stop.is_set():
+            with lock:
+                if not pending:
+                    break
+                window, records = pending.pop(0)
+            try:
+                for record in records:
+                    if not _put(items, record, stop):
+                        break
+            except BaseException as err:  # re-raised on the consuming thread
+                errors.append(err)
+                stop.set()
+        items.put(_DONE)
+
+    threads = [threading.Thread(target=produce, name=f"window-{index}", daemon=True)
+               for index in range(min(concurrency, len(pending)))]
+    for thread in threads:
+        thread.start()
+    running = len(threads)
+    try:
+        while running:
+            record = items.get()
+            if record is _DONE:
+                running -= 1
+                continue
+            yield record
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        # Unblock producers waiting on a full queue, then wait for them.
+        while any(thread.is_alive() for thread in threads):
+            try:
+                items.get(timeout=0.1)
+            except queue.Empty:
+                pass
@@ -0,0 +1,232 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from singer import get_logger, metrics
+
+LOGGER = get_logger()
+LEASE_SECONDS = 600
+POLL_INTERVAL = 5.0
+WAIT_TIMEOUT = 3600
+ROLES = ("coordinator", "worker")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parents (
+    stream TEXT NOT NULL,
+    parent_id TEXT NOT NULL,
+    record TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (stream, parent_id)
+);
+CREATE TABLE IF NOT EXISTS listed_streams (
+    stream TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL,
+    finished REAL
+);
+"""
+
+
+class WorkQueueTimeout(Exception):
+    """Raised when a worker waited longer than `work_queue_wait_timeout`."""
+
+
+class WorkQueue:
+    """
+    A durable queue of parent records shared by the processes of one
+    distributed sync, stored in a local SQLite database.
+    ~~~
+    The coordinator lists each parent stream once and adds its parents; the
+    workers claim parents, sync their child streams, and mark them done. A
+    claim is a lease: a worker renews it between child streams, and a parent
+    whose lease expired (its worker crashed or hung) can be claimed again.
+    Each coordinator run starts from an empty queue (`start_run`), so a
+    queue file can be reused across runs.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = LEASE_SECONDS) -> None:
+        self.path = path
+        self.lease_seconds = lease_seconds
+        # Autocommit; transactions that must be atomic are opened explicitly.
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def start_run(self) -> int:
+        """Clears the parents and listings of any previous run and starts a new one."""
+        with self._transaction():
+            self._connection.execute("DELETE FROM parents")
+            self._connection.execute("DELETE FROM listed_streams")
+            return self._connection.execute("INSERT INTO runs (started) VALUES (?)", (time.time(),)).lastrowid
+
+    def finish_run(self) -> None:
+        """Records that the coordinator has listed every parent stream."""
+        self._connection.execute("UPDATE runs SET finished = ? WHERE finished IS NULL", (time.time(),))
+
+    def join_run(self, timeout: float = WAIT_TIMEOUT, poll_interval: float = POLL_INTERVAL) -> int:
+        """
+        Waits for a run with work left (one the coordinator is still listing,
+        or with parents not done) and returns its id, so a worker started
+        before its coordinator does not take a previous finished run for its
+        own. Raises `WorkQueueTimeout` after `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            row = self._connection.execute("SELECT id, finished FROM runs ORDER BY id DESC LIMIT 1").fetchone()
+            if row and (row[1] is None or self._connection.execute(
+                    "SELECT 1 FROM parents WHERE status != 'done' LIMIT 1").fetchone()):
+                return row[0]
+            if time.monotonic() >= deadline:
+                raise WorkQueueTimeout(f"No coordinator run started in {self.path} within {timeout:.0f}s")
+            time.sleep(poll_interval)
+
+    def add(self, stream_name: str, records: Iterable[Dict]) -> None:
+        """Adds parents of `stream_name`; parents already queued are kept as they are."""
+        rows = [(stream_name, str(record["id"]), json.dumps(record, default=str)) for record in records]
+        with self._transaction():
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO parents (stream, parent_id, record) VALUES (?, ?, ?)", rows)
+
+    def mark_listed(self, stream_name: str) -> None:
+        """Records that every parent of `stream_name` has been added."""
+        self._connection.execute("INSERT OR IGNORE INTO listed_streams (stream) VALUES (?)", (stream_name,))
+
+    def is_listed(self, stream_name: str) -> bool:
+        return self._connection.execute(
+            "SELECT 1 FROM listed_streams WHERE stream = ?", (stream_name,)).fetchone() is not None
+
+    def claim(self, stream_name: str, worker: str, limit: int = 1) -> List[Dict]:
+        """Leases up to `limit` pending (or expired) parents to `worker`."""
+        now = time.time()
+        with self._transaction():
+            rows = self._connection.execute(
+                "SELECT parent_id, record FROM parents WHERE stream = ? AND "
+                "(status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+                "ORDER BY attempts, rowid LIMIT ?",
+                (stream_name, now, limit),
+            ).fetchall()
+            self._connection.executemany(
+                "UPDATE parents SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE stream = ? AND parent_id = ?",
+                [(worker, now + self.lease_seconds, stream_name, parent_id) for parent_id, _ in rows],
+            )
+        return [json.loads(record) for _, record in rows]
+
+    def renew(self, stream_name: str, parent_id: str, worker: str) -> bool:
+        """Extends `worker`'s lease on a parent. False if it lost the lease."""
+        cursor = self._connection.execute(
+            "UPDATE parents SET lease_expires = ? WHERE stream = ? AND parent_id = ? "
+            "AND worker = ? AND status = 'leased'",
+            (time.time() + self.lease_seconds, stream_name, str(parent_id), worker),
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, stream_name: str, parent_id: str, worker: str) -> None:
+        self._connection.execute(
+            "UPDATE parents SET status = 'done', lease_expires = NULL WHERE stream = ? AND parent_id = ? "
+            "AND worker = ?",
+            (stream_name, str(parent_id), worker),
+        )
+
+    def counts(self, stream_name: str) -> Dict[str, int]:
+        """Number of parents of `stream_name` by status."""
+        return dict(self._connection.execute(
+            "SELECT status, COUNT(*) FROM parents WHERE stream = ? GROUP BY status", (stream_name,)).fetchall())
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _transaction(self):
+        return _Transaction(self._connection)
+
+
+class _Transaction:
+    """Takes the database write lock up front, so concurrent claims never
+    lease the same parent twice."""
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+
+    def __enter__(self) -> None:
+        self.connection.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def get_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def open_work_queue(config: Mapping[str, Any]) -> Optional[WorkQueue]:
+    """Opens the `work_queue` database, or returns None when it is not set."""
+    if not config.get("work_queue"):
+        return None
+    role = config.get("work_queue_role")
+    if role not in ROLES:
+        raise ValueError(f"Invalid work_queue_role '{role}'; expected 'coordinator' or 'worker'.")
+    return WorkQueue(config["work_queue"], float(config.get("work_queue_lease") or LEASE_SECONDS))
+
+
+def sync_from_queue(stream, work_queue: WorkQueue, state: Dict, transformer, config: Mapping[str, Any]) -> int:
+    """
+    Worker side of a distributed sync: claims the parents of `stream` one at
+    a time and syncs its selected child streams for each.
+    ~~~
+    Runs until every parent is done. While other workers still hold leases
+    (or the coordinator is still listing), it polls, so parents left behind
+    by a crashed worker are picked up once their lease expires. After
+    `work_queue_wait_timeout` seconds without claiming anything it gives up:
+    it returns if the stream is fully listed (the remaining leases belong to
+    live workers) and raises `WorkQueueTimeout` if the coordinator never
+    finished listing. A parent whose lease was lost to another worker is
+    left to that worker. Returns the number of parents synced by this worker.
+    """
+    worker = get_worker_id()
+    poll_interval = float(config.get("work_queue_poll_interval") or POLL_INTERVAL)
+    timeout = float(config.get("work_queue_wait_timeout") or WAIT_TIMEOUT)
+    stream_name = stream.tap_stream_id
+    synced = 0
+    idle_since = time.monotonic()
+    with metrics.record_counter(f"{stream_name}_parents") as counter:
+        while True:
+            parents = work_queue.claim(stream_name, worker)
+            if not parents:
+                counts = work_queue.counts(stream_name)
+                listed = work_queue.is_listed(stream_name)
+                if listed and not counts.get("pending") and not counts.get("leased"):
+                    break
+                if time.monotonic() - idle_since >= timeout:
+                    if listed:
+                        LOGGER.warning("Stopped waiting for the %s '%s' parents leased by other workers",
+                                       counts.get("leased", 0), stream_name)
+                        break
+                    raise WorkQueueTimeout(
+                        f"The coordinator did not finish listing '{stream_name}' within {timeout:.0f}s")
+                time.sleep(poll_interval)
+                continue
+            idle_since = time.monotonic()
+            parent = parents[0]
+            lost = False
+            for child in stream.child_to_sync:
+                if not work_queue.renew(stream_name, parent["id"], worker):
+                    lost = True
+                    break
+                child.sync(state=state, transformer=transformer, parent_obj=parent)
+            if lost:
+                LOGGER.warning("Lost the lease on '%s' parent %s; leaving it to its new worker",
+                               stream_name, parent["id"])
+                continue
+            work_queue.complete(stream_name, parent["id"], worker)
+            stream.progress.parent_done()
+            counter.increment()
+            synced += 1
+    return synced
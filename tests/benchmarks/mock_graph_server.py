@@ -0,0 +1,516 @@
+"""
+A local stand-in for the Microsoft Graph API, for offline throughput benchmarks.
+~~~
+Serves synthetic, schema-conforming records for every stream of the tap:
+ - `@odata.nextLink` pagination driven by `$top` / `Prefer: odata.maxpagesize`
+ - `/$count` segments (requires `ConsistencyLevel: eventual`, like Graph)
+   and `$count=true` (`@odata.count`)
+ - `$filter` ranges (`ge`/`gt`/`le`/`lt`) on the date-time fields of records,
+   and `$orderby` one such field, `asc` or `desc`
+ - JSON batching (`POST /$batch`), including per-request throttling, and the
+   `users/{id}/mailFolders` item counts the mailbox pre-check reads
+ - gzip responses when the client sends `Accept-Encoding: gzip`
+ - injected latency and 429 responses with `Retry-After`
+ - request counters exposed on `/_mock/stats`
+
+Run standalone with `python tests/benchmarks/mock_graph_server.py --port 8080`
+and point the tap at it with the `base_url` and `token_url` config options.
+"""
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+import math
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from tap_ms_graph.schema import get_schemas
+
+API_PREFIX = "/v1.0"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 999
+EPOCH = datetime(2024, 1, 1)
+
+# Top-level Graph collections and the stream whose schema they serve.
+COLLECTIONS = {
+    "users": "users",
+    "groups": "groups",
+    "chats": "chats",
+    "drives": "drives",
+    "applications": "applications",
+    "servicePrincipals": "service_principals",
+    "directoryRoles": "directory_roles",
+    "directoryRoleTemplates": "directory_role_templates",
+    "identity/conditionalAccess/policies": "conditional_access_policies",
+    "auditLogs/directoryAudits": "audit_logs_directory",
+    "auditLogs/signIns": "audit_logs_signins",
+}
+
+# (parent collection, segment) -> child stream.
+CHILD_COLLECTIONS = {
+    ("users", "messages"): "mail_messages",
+    ("users", "events"): "calendar_events",
+    ("users", "contacts"): "contacts",
+    ("users", "drives"): "drive_items",
+    ("groups", "members"): "group_member",
+    ("groups", "owners"): "group_owner",
+    ("teams", "channels"): "channels",
+    ("teams", "members"): "team_member",
+    ("chats", "messages"): "chat_messages",
+    ("directoryRoles", "members"): "directory_role_member",
+}
+
+# Records per collection; child streams are per parent record.
+DEFAULT_SIZES = {
+    "users": 200,
+    "groups": 50,
+    "teams": 10,
+    "chats": 20,
+    "drives": 20,
+    "applications": 100,
+    "service_principals": 100,
+    "directory_roles": 10,
+    "directory_role_templates": 50,
+    "conditional_access_policies": 20,
+    "audit_logs_directory": 2000,
+    "audit_logs_signins": 2000,
+    "mail_messages": 50,
+    "calendar_events": 10,
+    "contacts": 10,
+    "drive_items": 2,
+    "group_member": 20,
+    "group_owner": 2,
+    "channels": 5,
+    "team_member": 20,
+    "chat_messages": 50,
+    "directory_role_member": 5,
+}
+
+_MAX_PAGE_SIZE_PREFERENCE = re.compile(r"odata\.maxpagesize=(\d+)")
+_DATE_CLAUSE = re.compile(r"(\w+) (ge|gt|le|lt) (\d{4}-\d\d-\d\dT[\d:.]+Z?)")
+RECORD_INTERVAL = timedelta(minutes=1)
+
+
+def synthesize(schema: Dict, name: str = "value", depth: int = 0):
+    """Builds a value conforming to a JSON schema fragment."""
+    types = schema.get("type", ["null"])
+    types = [types] if isinstance(types, str) else types
+    enum = [value for value in schema.get("enum", []) if value is not None]
+    if enum:
+        return enum[0]
+    if "object" in types:
+        if depth >= 3 and "null" in types:
+            return None
+        return {key: synthesize(sub_schema, key, depth + 1)
+                for key, sub_schema in schema.get("properties", {}).items()}
+    if "array" in types:
+        if depth >= 3:
+            return []
+        return [synthesize(schema.get("items", {}), name, depth + 1) for _ in range(2)]
+    if "string" in types:
+        if schema.get("format") == "date-time":
+            return EPOCH.strftime("%Y-%m-%dT%H:%M:%SZ")
+        if schema.get("format") == "uri":
+            return f"https://example.com/{name}"
+        return f"synthetic {name}"
+    if "boolean" in types:
+        return True
+    if "integer" in types:
+        return 1
+    if "number" in types:
+        return 1.5
+    return None
+
+
+class SyntheticCollection:
+    """Deterministic records for one stream, generated from its schema."""
+
+    def __init__(self, stream_name: str, schema: Dict, id_prefix: Optional[str] = None) -> None:
+        self.stream_name = stream_name
+        self.id_prefix = id_prefix or stream_name
+        self.template = synthesize(schema)
+        self.date_fields = [
+            key for key, sub_schema in schema.get("properties", {}).items()
+            if sub_schema.get("format") == "date-time"
+        ]
+
+    def record_id(self, index: int, parent_id: Optional[str] = None) -> str:
+        if parent_id:
+            return f"{parent_id}-{self.stream_name}-{index:06d}"
+        return f"{self.id_prefix}-{index:06d}"
+
+    def record(self, index: int, parent_id: Optional[str] = None) -> Dict:
+        record = dict(self.template)
+        record["id"] = self.record_id(index, parent_id)
+        timestamp = (EPOCH + RECORD_INTERVAL * index).strftime("%Y-%m-%dT%H:%M:%SZ")
+        for key in self.date_fields:
+            record[key] = timestamp
+        if "displayName" in record:
+            record["displayName"] = f"{self.stream_name} {index}"
+        return record
+
+
+class MockGraph:
+    """
+    The request-independent state of the mock: collections, sizes, fault
+    injection settings and counters.
+    """
+
+    def __init__(
+        self,
+        sizes: Optional[Dict[str, int]] = None,
+        scale: float = 1.0,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: int = 1,
+        seed: int = 0,
+    ) -> None:
+        sizes = {**DEFAULT_SIZES, **(sizes or {})}
+        self.sizes = {name: max(0, int(size * scale)) for name, size in sizes.items()}
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        schemas, _ = get_schemas()
+        self.collections = {name: SyntheticCollection(name, schema) for name, schema in schemas.items()}
+        # Teams are groups; their ids must resolve as group (and team) ids.
+        self.collections["teams"] = SyntheticCollection("teams", schemas["teams"], id_prefix="groups")
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats = {"requests": 0, "batched": 0, "throttled": 0, "bytes_sent": 0}
+
+    def count(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def should_throttle(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.throttle_rate
+
+    def resolve(self, path: str, query: Dict[str, str]) -> Optional[Tuple[str, Optional[str]]]:
+        """Maps a Graph path to (stream, parent id), or None when it does not exist."""
+        if path in COLLECTIONS:
+            stream = COLLECTIONS[path]
+            if stream == "groups" and "Team" in query.get("$filter", ""):
+                stream = "teams"
+            return stream, None
+        parts = path.split("/")
+        if len(parts) == 3 and (parts[0], parts[2]) in CHILD_COLLECTIONS:
+            parent_collection, parent_id, segment = parts
+            parent_stream = "teams" if parent_collection == "teams" else COLLECTIONS[parent_collection]
+            if not self.has_record(parent_stream, parent_id):
+                return None
+            return CHILD_COLLECTIONS[(parent_collection, segment)], parent_id
+        return None
+
+    def has_record(self, stream: str, record_id: str) -> bool:
+        collection = self.collections[stream]
+        prefix = f"{collection.id_prefix}-"
+        if not record_id.startswith(prefix) or not record_id[len(prefix):].isdigit():
+            return False
+        return int(record_id[len(prefix):]) < self.sizes[stream]
+
+    def bounds(self, stream: str, query: Dict[str, str]) -> Tuple[int, int]:
+        """
+        The `[lower, upper)` record indexes matching the date ranges of the
+        `$filter` (record `i` is dated `EPOCH + i` minutes on every date field).
+        """
+        lower, upper = 0, self.sizes[stream]
+        date_fields = self.collections[stream].date_fields
+        for field, operator, value in _DATE_CLAUSE.findall(query.get("$filter", "")):
+            if field not in date_fields:
+                continue
+            offset = (datetime.strptime(value.rstrip("Z")[:19], "%Y-%m-%dT%H:%M:%S") - EPOCH) / RECORD_INTERVAL
+            if operator in ("ge", "gt"):
+                lower = max(lower, math.floor(offset) + 1 if operator == "gt" else math.ceil(offset))
+            else:
+                upper = min(upper, math.floor(offset) + 1 if operator == "le" else math.ceil(offset))
+        return max(0, lower), max(0, lower, upper)
+
+    def page(self, stream: str, parent_id: Optional[str], skip: int, top: int,
+             bounds: Optional[Tuple[int, int]] = None, descending: bool = False) -> Tuple[List[Dict], bool]:
+        """Returns the records of one page within `bounds` and whether more pages follow."""
+        collection = self.collections[stream]
+        lower, upper = bounds or (0, self.sizes[stream])
+        end = min(lower + skip + top, upper)
+        indexes = range(lower + skip, end)
+        if descending:
+            indexes = [upper - 1 - (index - lower) for index in indexes]
+        records = [collection.record(index, parent_id) for index in indexes]
+        return records, end < upper
+
+    def mail_folders(self, user_id: str) -> Optional[Dict]:
+        """The top-level mail folders of a user: one folder holding every message."""
+        if not self.has_record("users", user_id):
+            return None
+        return {"value": [{"id": f"{user_id}-inbox", "displayName": "Inbox",
+                           "totalItemCount": self.sizes["mail_messages"]}]}
+
+
+def error_payload(code: str, message: str) -> Dict:
+    return {"error": {"code": code, "message": message}}
+
+
+class GraphRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY every
+    # keep-alive response would stall on delayed ACKs.
+    disable_nagle_algorithm = True
+
+    @property
+    def graph(self) -> MockGraph:
+        return self.server.graph
+
+    def log_message(self, format, *args) -> None:  # noqa: A002 - silence per-request logging
+        pass
+
+    def send_body(self, status: int, body: bytes, content_type: str = "application/json",
+                  headers: Optional[Dict[str, str]] = None) -> None:
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=5)
+            headers = {**(headers or {}), "Content-Encoding": "gzip"}
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.graph.count("bytes_sent", len(body))
+
+    def send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_body(status, json.dumps(payload).encode(), headers=headers)
+
+    def send_error_json(self, status: int, code: str, message: str,
+                        headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_json(status, error_payload(code, message), headers)
+
+    def send_result(self, status: int, payload) -> None:
+        """Sends a `route` result: JSON, or a bare `$count` as plain text."""
+        if isinstance(payload, str):
+            self.send_body(status, payload.encode(), content_type="text/plain")
+        else:
+            self.send_json(status, payload)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        path = urlsplit(self.path).path
+        if path == "/_mock/reset":
+            self.graph.reset()
+            self.send_json(200, {})
+        elif path.endswith("/token"):
+            self.send_json(200, {"token_type": "Bearer", "expires_in": 3600, "access_token": "mock-token"})
+        elif path == f"{API_PREFIX}/$batch":
+            self.send_batch(body)
+        else:
+            self.send_error_json(404, "Request_ResourceNotFound", f"No route for POST {path}")
+
+    def admit(self) -> bool:
+        """
+        Counts a request and applies latency, throttling and authentication;
+        returns False when an error response has been sent instead.
+        """
+        self.graph.count("requests")
+        if self.graph.latency:
+            time.sleep(self.graph.latency)
+        if self.graph.should_throttle():
+            self.graph.count("throttled")
+            self.send_error_json(429, "TooManyRequests", "Too many requests",
+                                 headers={"Retry-After": str(self.graph.retry_after)})
+            return False
+        if not self.headers.get("Authorization"):
+            self.send_error_json(401, "InvalidAuthenticationToken", "Access token is empty.")
+            return False
+        return True
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path == "/_mock/stats":
+            self.send_json(200, dict(self.graph.stats))
+            return
+        if not self.admit():
+            return
+        self.send_result(*self.route(url.path, url.query, self.headers))
+
+    def send_batch(self, body: bytes) -> None:
+        """
+        Answers a JSON batch: every request is routed like a GET, and may be
+        throttled on its own (a 429 with `Retry-After` in its response).
+        """
+        if not self.admit():
+            return
+        responses = []
+        for request in json.loads(body or b"{}").get("requests", []):
+            self.graph.count("batched")
+            if self.graph.should_throttle():
+                self.graph.count("throttled")
+                responses.append({"id": request["id"], "status": 429,
+                                  "headers": {"Retry-After": str(self.graph.retry_after)},
+                                  "body": error_payload("TooManyRequests", "Too many requests")})
+                continue
+            url = urlsplit(API_PREFIX + request["url"])
+            status, payload = self.route(url.path, url.query, request.get("headers") or {})
+            responses.append({"id": request["id"], "status": status, "body": payload})
+        self.send_json(200, {"responses": responses})
+
+    def route(self, path: str, query_string: str, headers) -> Tuple[int, object]:
+        """Answers one GET: its status and JSON payload (a `$count` as a string)."""
+        if not path.startswith(API_PREFIX + "/"):
+            return 404, error_payload("Request_ResourceNotFound", f"No route for {path}")
+
+        query = {key: values[-1] for key, values in parse_qs(query_string).items()}
+        path = path[len(API_PREFIX) + 1:]
+        count_only = path.endswith("/$count")
+        if count_only:
+            path = path[:-len("/$count")]
+
+        parts = path.split("/")
+        if len(parts) == 3 and (parts[0], parts[2]) == ("users", "mailFolders"):
+            folders = self.graph.mail_folders(parts[1])
+            if folders is None:
+                return 404, error_payload("Request_ResourceNotFound", f"Resource '{path}' does not exist.")
+            return 200, folders
+
+        resolved = self.graph.resolve(path, query)
+        if resolved is None:
+            return 404, error_payload("Request_ResourceNotFound", f"Resource '{path}' does not exist.")
+        stream, parent_id = resolved
+
+        if count_only:
+            if (headers.get("ConsistencyLevel") or "").lower() != "eventual":
+                return 400, error_payload("Request_UnsupportedQuery",
+                                          "$count requires the ConsistencyLevel header set to eventual.")
+            lower, upper = self.graph.bounds(stream, query)
+            return 200, str(upper - lower)
+
+        return 200, self.page_payload(API_PREFIX + "/" + path, query, headers, stream, parent_id)
+
+    def page_payload(self, path: str, query: Dict[str, str], headers, stream: str,
+                     parent_id: Optional[str]) -> Dict:
+        top = DEFAULT_PAGE_SIZE
+        if "$top" in query:
+            top = int(query["$top"])
+        preference = _MAX_PAGE_SIZE_PREFERENCE.search(headers.get("Prefer") or "")
+        if preference:
+            top = min(top, int(preference.group(1))) if "$top" in query else int(preference.group(1))
+        top = max(1, min(top, MAX_PAGE_SIZE))
+        skip = int(query.get("$skiptoken") or 0)
+        bounds = self.graph.bounds(stream, query)
+        descending = query.get("$orderby", "").lower().endswith(" desc")
+
+        records, has_more = self.graph.page(stream, parent_id, skip, top, bounds, descending)
+        payload = {"@odata.context": f"{self.server.base_url}/$metadata#{stream}", "value": records}
+        if query.get("$count") == "true":
+            payload["@odata.count"] = bounds[1] - bounds[0]
+        if has_more:
+            next_query = {key: value for key, value in query.items() if key != "$skiptoken"}
+            next_query["$skiptoken"] = str(skip + top)
+            payload["@odata.nextLink"] = f"{self.server.root_url}{path}?{urlencode(next_query, safe='$')}"
+        return payload
+
+
+class MockGraphServer:
+    """
+    Runs a `MockGraph` on a local port in a background thread.
+    ~~~
+    Usable as a context manager; `config()` returns a tap config pointed at it.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **graph_options) -> None:
+        self.graph = MockGraph(**graph_options)
+        self.httpd = ThreadingHTTPServer((host, port), GraphRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.graph = self.graph
+        self.httpd.root_url = f"http://{host}:{self.httpd.server_address[1]}"
+        self.httpd.base_url = self.httpd.root_url + API_PREFIX
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    @property
+    def base_url(self) -> str:
+        return self.httpd.base_url
+
+    @property
+    def token_url(self) -> str:
+        return f"{self.httpd.root_url}/mock-tenant/oauth2/v2.0/token"
+
+    def config(self, **overrides) -> Dict:
+        return {
+            "tenant_id": "mock-tenant",
+            "client_id": "mock-client",
+            "client_secret": "mock-secret",
+            "scope": "https://graph.microsoft.com/.default",
+            "start_date": "2024-01-01T00:00:00Z",
+            "base_url": self.base_url,
+            "token_url": self.token_url,
+            **overrides,
+        }
+
+    def start(self) -> "MockGraphServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockGraphServer":
+        return self.start()
+
+    def __exit__(self, exception_type, exception_value, traceback) -> None:
+        self.stop()
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for every collection size")
+    parser.add_argument("--sizes", type=json.loads, default=None,
+                        help='JSON object of per-stream sizes, e.g. \'{"users": 1000}\'')
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def server_options(args: argparse.Namespace) -> Dict:
+    return {
+        "sizes": args.sizes,
+        "scale": args.scale,
+        "latency": args.latency,
+        "throttle_rate": args.throttle_rate,
+        "retry_after": args.retry_after,
+        "seed": args.seed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("~~~")[0].strip())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockGraphServer(host=args.host, port=args.port, **server_options(args))
+    print(json.dumps(server.config(), indent=2), flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+End-to-end throughput benchmarks for the tap, against the local mock Graph server.
+~~~
+Starts `mock_graph_server` in its own process, then runs `tap_ms_graph.sync.sync`
+once per stream in a fresh process (so peak memory is per stream) with stdout
+replaced by a counting sink, and reports:
+ - records/sec and requests/sec
+ - peak RSS, and the peak of traced Python allocations with `--tracemalloc`
+ - throttled requests and bytes served
+
+Example:
+    python tests/benchmarks/run_benchmarks.py --streams users mail_messages \\
+        --scale 2 --latency 0.02 --config '{"json_codec": "orjson"}'
+"""
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import traceback
+import tracemalloc
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_graph_server import MockGraphServer, add_server_arguments, server_options  # noqa: E402
+
+DEFAULT_STREAMS = [
+    "users",
+    "groups",
+    "applications",
+    "service_principals",
+    "audit_logs_directory",
+    "audit_logs_signins",
+    "mail_messages",
+    "calendar_events",
+    "group_member",
+    "chat_messages",
+]
+# Longest a stream may run before it is reported as failed.
+STREAM_TIMEOUT = 3600
+RECORD_MARKERS = ('{"type": "RECORD"', '{"type":"RECORD"')
+BATCH_MARKERS = ('{"type": "BATCH"', '{"type":"BATCH"')
+
+
+def count_batch_records(line: str) -> int:
+    """Counts the records in the files of a BATCH message."""
+    count = 0
+    for uri in json.loads(line)["manifest"]:
+        with gzip.open(urlparse(uri).path, "rt") as batch_file:
+            count += sum(1 for _ in batch_file)
+    return count
+
+
+class CountingSink:
+    """A stdout replacement that counts Singer records (RECORD messages and
+    records in BATCH files) and bytes."""
+
+    def __init__(self) -> None:
+        self.record_messages = 0
+        self.bytes = 0
+        self.batch_messages = []
+
+    @property
+    def records(self) -> int:
+        """Batch files are only read here, outside the timed sync."""
+        return self.record_messages + sum(count_batch_records(line) for line in self.batch_messages)
+
+    def write(self, data: str) -> int:
+        self.bytes += len(data)
+        self.record_messages += sum(data.count(marker) for marker in RECORD_MARKERS)
+        if any(marker in data for marker in BATCH_MARKERS):
+            self.batch_messages.extend(line for line in data.splitlines() if line.startswith(BATCH_MARKERS))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+def build_catalog(stream_name: str):
+    """A catalog with every stream present and only `stream_name` selected."""
+    from singer import metadata
+    from singer.catalog import Catalog, CatalogEntry, Schema
+    from tap_ms_graph.schema import get_schemas
+    from tap_ms_graph.streams import STREAMS
+
+    schemas, field_metadata = get_schemas()
+    catalog = Catalog([])
+    for name, schema in schemas.items():
+        mdata = metadata.to_map(field_metadata[name])
+        if name == stream_name:
+            for breadcrumb in mdata:
+                mdata[breadcrumb]["selected"] = True
+        catalog.streams.append(CatalogEntry(
+            stream=name,
+            tap_stream_id=name,
+            key_properties=STREAMS[name].key_properties,
+            schema=Schema.from_dict(schema),
+            metadata=metadata.to_list(mdata),
+        ))
+    return catalog
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_stream(config: Dict, stream_name: str, trace_memory: bool, results) -> None:
+    """Syncs one stream; runs in a child process and puts its measurements
+    (or the error it failed with) on `results`."""
+    from tap_ms_graph.client import Client
+    from tap_ms_graph.sync import sync
+
+    catalog = build_catalog(stream_name)
+    sink = CountingSink()
+    if trace_memory:
+        tracemalloc.start()
+    stdout, sys.stdout = sys.stdout, sink
+    try:
+        start = time.perf_counter()
+        with Client(config) as client:
+            sync(client=client, config=config, catalog=catalog, state={})
+        elapsed = time.perf_counter() - start
+    except Exception as err:  # reported in the benchmark's row
+        sys.stdout = stdout
+        traceback.print_exc()
+        results.put(failed_row(stream_name, f"{type(err).__name__}: {err}"))
+        return
+    finally:
+        sys.stdout = stdout
+    traced_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if trace_memory else None
+    results.put({
+        "stream": stream_name,
+        "records": sink.records,
+        "output_bytes": sink.bytes,
+        "seconds": elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+        "traced_peak_mb": traced_peak,
+    })
+
+
+def failed_row(stream_name: str, error: str) -> Dict:
+    return {
+        "stream": stream_name, "records": 0, "output_bytes": 0, "seconds": 0.0,
+        "peak_rss_mb": None, "traced_peak_mb": None, "error": error,
+    }
+
+
+def wait_for_result(worker, results, stream_name: str, timeout: float = STREAM_TIMEOUT) -> Dict:
+    """
+    The row `worker` puts on `results`, or a failed row when it exits without
+    one (e.g. killed or crashed) or runs longer than `timeout`.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            pass
+        if not worker.is_alive():
+            # The row may have been put just before the worker exited.
+            try:
+                return results.get(timeout=1)
+            except queue.Empty:
+                return failed_row(stream_name, f"worker exited with code {worker.exitcode}")
+        if time.monotonic() > deadline:
+            worker.terminate()
+            return failed_row(stream_name, f"timed out after {timeout:.0f}s")
+
+
+def serve(options: Dict, ready) -> None:
+    """Runs the mock server until the process is terminated."""
+    server = MockGraphServer(**options)
+    ready.put(server.config())
+    server.httpd.serve_forever()
+
+
+def benchmark(streams: List[str], options: Dict, config_overrides: Dict, trace_memory: bool,
+              timeout: float = STREAM_TIMEOUT) -> List[Dict]:
+    context = multiprocessing.get_context("spawn")
+    ready = context.Queue()
+    server = context.Process(target=serve, args=(options, ready), daemon=True)
+    server.start()
+    config = {**ready.get(timeout=60), **config_overrides}
+    root_url = config["base_url"].rsplit("/", 1)[0]
+
+    rows = []
+    try:
+        for stream_name in streams:
+            requests.post(f"{root_url}/_mock/reset", timeout=10)
+            results = context.Queue()
+            worker = context.Process(target=run_stream, args=(config, stream_name, trace_memory, results))
+            worker.start()
+            row = wait_for_result(worker, results, stream_name, timeout)
+            worker.join()
+            stats = requests.get(f"{root_url}/_mock/stats", timeout=10).json()
+            row.update(stats)
+            row["records_per_sec"] = row["records"] / row["seconds"] if row["seconds"] else 0.0
+            row["requests_per_sec"] = stats["requests"] / row["seconds"] if row["seconds"] else 0.0
+            rows.append(row)
+    finally:
+        server.terminate()
+        server.join()
+    return rows
+
+
+def format_report(rows: List[Dict]) -> str:
+    header = (f"{'stream':<28}{'records':>10}{'requests':>10}{'throttled':>10}{'seconds':>10}"
+              f"{'records/s':>12}{'requests/s':>12}{'peak MB':>10}{'traced MB':>10}")
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        traced = f"{row['traced_peak_mb']:.1f}" if row["traced_peak_mb"] is not None else "-"
+        rss = f"{row['peak_rss_mb']:.1f}" if row["peak_rss_mb"] is not None else "-"
+        lines.append(
+            f"{row['stream']:<28}{row['records']:>10}{row['requests']:>10}{row['throttled']:>10}"
+            f"{row['seconds']:>10.2f}{row['records_per_sec']:>12.0f}{row['requests_per_sec']:>12.1f}"
+            f"{rss:>10}{traced:>10}"
+        )
+        if row.get("error"):
+            lines.append(f"  failed: {row['error']}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("~~~")[0].strip())
+    parser.add_argument("--streams", nargs="+", default=DEFAULT_STREAMS)
+    parser.add_argument("--config", type=json.loads, default={},
+                        help='JSON object merged into the tap config, e.g. \'{"page_size": 500}\'')
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Also report the peak of traced Python allocations (slower)")
+    parser.add_argument("--timeout", type=float, default=STREAM_TIMEOUT,
+                        help="Seconds after which a stream is stopped and reported as failed")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    parser.add_argument("--output", help="Also write the report to this file")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    rows = benchmark(args.streams, server_options(args), args.config, args.tracemalloc, args.timeout)
+    report = "\n".join(json.dumps(row) for row in rows) if args.json else format_report(rows)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
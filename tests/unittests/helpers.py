@@ -0,0 +1,21 @@
+"""Helpers shared by the unit tests."""
+from unittest.mock import MagicMock
+
+from singer import metadata as singer_metadata
+
+ID_SCHEMA = {"type": "object", "properties": {"id": {"type": ["null", "string"]}}}
+
+
+def make_catalog_entry(schema=None, selected=None):
+    """A FULL_TABLE catalog entry keyed on `id`, optionally marked `selected`."""
+    schema = schema or ID_SCHEMA
+    mdata = singer_metadata.get_standard_metadata(
+        schema=schema, key_properties=["id"], valid_replication_keys=[],
+        replication_method="FULL_TABLE",
+    )
+    if selected is not None:
+        mdata = singer_metadata.to_list(singer_metadata.write(singer_metadata.to_map(mdata), (), "selected", selected))
+    entry = MagicMock()
+    entry.schema.to_dict.return_value = schema
+    entry.metadata = mdata
+    return entry
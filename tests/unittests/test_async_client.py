@@ -0,0 +1,285 @@
+"""Unit tests for tap_ms_graph/async_client.py and the async stream helpers."""
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from tap_ms_graph.async_client import AsyncClient, AsyncResponse
+from tap_ms_graph.exceptions import (
+    MsGraphRateLimitError,
+    MsGraphUnauthorizedError,
+)
+from tap_ms_graph.streams.users import Users
+from helpers import make_catalog_entry
+
+
+BASE_URL = "https://graph.microsoft.com/v1.0"
+CONFIG = {
+    "client_id": "mocked_client_id",
+    "client_secret": "mocked_secret",
+    "tenant_id": "mocked_tenant",
+    "scope": "mocked_scope",
+}
+
+
+def make_client():
+    client = MagicMock()
+    client.base_url = BASE_URL
+    client.config = {"page_size": 10, "start_date": "2024-01-01T00:00:00Z"}
+    return client
+
+
+def get_response(status_code, json_data=None, headers=None):
+    return AsyncResponse(status_code, headers or {}, json.dumps(json_data or {}).encode())
+
+
+def make_async_client(token="mocked_token", expired=False):
+    """An AsyncClient with a token already set, bypassing the aiohttp session."""
+    client = AsyncClient(CONFIG)
+    client._token_lock = asyncio.Lock()
+    client._access_token = token
+    delta = timedelta(hours=-1) if expired else timedelta(hours=1)
+    client._expires_at = datetime.now() + delta
+    return client
+
+
+def run(coro_factory):
+    """Run a coroutine built inside the event loop (locks bind to the running loop)."""
+    async def runner():
+        return await coro_factory()
+    return asyncio.run(runner())
+
+
+class TestAsyncClient:
+    def test_get_returns_parsed_json_and_sets_authorization(self):
+        client = make_async_client()
+        client._send = AsyncMock(return_value=get_response(200, {"value": [1, 2]}))
+
+        result = run(lambda: client.get(f"{BASE_URL}/users", {"$top": 2}, {"Accept": "application/json"}))
+
+        assert result == {"value": [1, 2]}
+        args, kwargs = client._send.call_args
+        assert args == ("GET", f"{BASE_URL}/users")
+        assert kwargs["headers"]["Authorization"] == "mocked_token"
+        assert kwargs["params"] == {"$top": 2}
+
+    def test_get_accounts_wire_and_decoded_bytes_to_tag(self):
+        client = make_async_client()
+        response = get_response(200, {"value": ["a" * 1000]}, headers={"Content-Length": "40"})
+        client._send = AsyncMock(return_value=response)
+
+        run(lambda: client.get(f"{BASE_URL}/users", {}, {}, tag="users"))
+
+        counts = client.transfer_stats.get("users")
+        assert (counts["requests"], counts["wire"], counts["decoded"]) == (1, 40, len(response.content))
+
+    def test_from_client_shares_transfer_stats(self):
+        sync_client = MagicMock()
+        sync_client.config = CONFIG
+        assert AsyncClient.from_client(sync_client).transfer_stats is sync_client.transfer_stats
+
+    def test_get_does_not_mutate_caller_headers(self):
+        client = make_async_client()
+        client._send = AsyncMock(return_value=get_response(200, {}))
+        headers = {"Accept": "application/json"}
+
+        run(lambda: client.get(f"{BASE_URL}/users", {}, headers))
+
+        assert "Authorization" not in headers
+
+    @patch("asyncio.sleep", new_callable=AsyncMock)
+    def test_rate_limit_retried_and_retry_after_honoured(self, mock_sleep):
+        client = make_async_client()
+        client._send = AsyncMock(
+            return_value=get_response(429, {"error": "throttled"}, headers={"Retry-After": "7"})
+        )
+
+        with pytest.raises(MsGraphRateLimitError):
+            run(lambda: client.get(f"{BASE_URL}/users", {}, {}))
+
+        assert client._send.call_count == 6
+        assert any(c.args == (7,) for c in mock_sleep.call_args_list)
+
+    @patch("asyncio.sleep", new_callable=AsyncMock)
+    def test_connection_error_retried_then_succeeds(self, mock_sleep):
+        client = make_async_client()
+        client._send = AsyncMock(side_effect=[
+            ConnectionError("reset"),
+            asyncio.TimeoutError(),
+            get_response(200, {"value": []}),
+        ])
+
+        result = run(lambda: client.get(f"{BASE_URL}/users", {}, {}))
+
+        assert result == {"value": []}
+        assert client._send.call_count == 3
+
+    def test_unauthorized_not_retried(self):
+        client = make_async_client()
+        client._send = AsyncMock(return_value=get_response(401, {}))
+
+        with pytest.raises(MsGraphUnauthorizedError):
+            run(lambda: client.get(f"{BASE_URL}/users", {}, {}))
+
+        assert client._send.call_count == 1
+
+    def test_expired_token_refreshed_once_for_concurrent_requests(self):
+        client = make_async_client(expired=True)
+        token_response = get_response(200, {"access_token": "new_token", "expires_in": 3600})
+        data_response = get_response(200, {"value": []})
+
+        async def send(method, endpoint, **kwargs):
+            return token_response if method == "POST" else data_response
+
+        client._send = AsyncMock(side_effect=send)
+
+        async def many():
+            return await asyncio.gather(*(
+                client.get(f"{BASE_URL}/users", {}, {}) for _ in range(5)
+            ))
+
+        run(many)
+
+        methods = [c.args[0] for c in client._send.call_args_list]
+        assert methods.count("POST") == 1
+        assert methods.count("GET") == 5
+        assert client._access_token == "new_token"
+
+    def test_from_client_reuses_token(self):
+        sync_client = MagicMock()
+        sync_client.config = CONFIG
+        sync_client.base_url = BASE_URL
+        sync_client._access_token = "shared"
+        sync_client._expires_at = datetime.now() + timedelta(hours=1)
+
+        client = AsyncClient.from_client(sync_client)
+
+        assert client._access_token == "shared"
+        assert client._expires_at == sync_client._expires_at
+
+
+class TestAsyncGetRecords:
+    def test_paginates_with_local_state(self):
+        stream = Users(make_client(), make_catalog_entry(selected=True))
+        stream.update_params()
+        next_link = f"{BASE_URL}/users?$skiptoken=abc"
+        async_client = MagicMock()
+        async_client.get = AsyncMock(side_effect=[
+            {"value": [{"id": "1"}], "@odata.nextLink": next_link},
+            {"value": [{"id": "2"}]},
+        ])
+
+        async def collect():
+            return [r async for r in stream.aget_records(async_client)]
+
+        records = run(collect)
+
+        assert [r["id"] for r in records] == ["1", "2"]
+        assert async_client.get.call_args_list[1].args[0] == next_link
+        assert async_client.get.call_args_list[1].args[1] == {}
+        # The stream's own pagination state is untouched.
+        assert stream.params["$top"] == stream.page_size
+
+
+class TestAsyncChildSync:
+    @patch("tap_ms_graph.streams.abstracts.get_async_runner", return_value=MagicMock())
+    @patch("tap_ms_graph.streams.abstracts.sync_children_async")
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_parents_are_batched_for_async_children(self, mock_write_record, mock_async, mock_runner):
+        client = make_client()
+        client.config["async_child_sync"] = True
+        client.config["async_parent_batch_size"] = 2
+        client.get.return_value = {"value": [{"id": "u1"}, {"id": "u2"}, {"id": "u3"}]}
+        stream = Users(client, make_catalog_entry(selected=True))
+        child = MagicMock()
+        child.supports_async.return_value = True
+        stream.child_to_sync = [child]
+
+        from singer import Transformer
+        with Transformer() as transformer:
+            stream.sync(state={}, transformer=transformer)
+
+        child.sync.assert_not_called()
+        batches = [[p["id"] for p in c.args[1]] for c in mock_async.call_args_list]
+        assert batches == [["u1", "u2"], ["u3"]]
+
+    @patch("tap_ms_graph.streams.abstracts.get_async_runner", return_value=MagicMock())
+    @patch("tap_ms_graph.streams.abstracts.sync_children_async")
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_children_without_async_support_are_synced_per_parent(self, mock_write_record, mock_async, mock_runner):
+        client = make_client()
+        client.config["async_child_sync"] = True
+        client.get.return_value = {"value": [{"id": "u1"}, {"id": "u2"}]}
+        stream = Users(client, make_catalog_entry(selected=True))
+        async_child, windowed_child = MagicMock(), MagicMock()
+        async_child.supports_async.return_value = True
+        windowed_child.supports_async.return_value = False
+        stream.child_to_sync = [async_child, windowed_child]
+
+        from singer import Transformer
+        with Transformer() as transformer:
+            stream.sync(state={}, transformer=transformer)
+
+        assert mock_async.call_args.args[4] == [async_child]
+        async_child.sync.assert_not_called()
+        assert [c.kwargs["parent_obj"]["id"] for c in windowed_child.sync.call_args_list] == ["u1", "u2"]
+
+    def test_children_with_children_or_windows_do_not_support_async(self):
+        client = make_client()
+        stream = Users(client, make_catalog_entry(selected=True))
+        assert stream.supports_async()
+        stream.child_to_sync = [MagicMock()]
+        assert not stream.supports_async()
+        stream.child_to_sync = []
+        stream.window_field = "lastModifiedDateTime"
+        client.config["split_threshold"] = 1000
+        assert not stream.supports_async()
+
+    def test_passthrough_and_transform_pool_streams_do_not_support_async(self):
+        client = make_client()
+        stream = Users(client, make_catalog_entry(selected=True))
+        client.config["passthrough_streams"] = ["users"]
+        assert not stream.supports_async()
+        client.config["passthrough_streams"] = []
+        client.config["transform_processes"] = 2
+        assert not stream.supports_async()
+
+
+class TestAsyncRunner:
+    def test_one_session_serves_every_batch_and_marks_parents_synced(self):
+        from tap_ms_graph import async_sync
+
+        client = MagicMock()
+        client.__aenter__ = AsyncMock()
+        client.__aexit__ = AsyncMock()
+        runner = async_sync.AsyncRunner(client)
+        child = MagicMock()
+        child.tap_stream_id = "mail_messages"
+        child.skip_parent.return_value = False
+
+        async def no_records(_client, _parent):
+            return
+            yield
+
+        child.aget_records = no_records
+        stream = MagicMock()
+        stream.client.config = {}
+        async_sync.set_async_runner(runner)
+        try:
+            async_sync.sync_children_async(stream, [{"id": "u1"}], {}, MagicMock(), [child])
+            async_sync.sync_children_async(stream, [{"id": "u2"}], {}, MagicMock(), [child])
+        finally:
+            async_sync.set_async_runner(None)
+            runner.close()
+
+        client.__aenter__.assert_awaited_once()
+        client.__aexit__.assert_awaited_once()
+        assert [c.args[0]["id"] for c in child.parent_synced.call_args_list] == ["u1", "u2"]
+
+    def test_cassettes_fall_back_to_sequential_sync(self):
+        from tap_ms_graph.async_sync import start_async_runner
+
+        assert start_async_runner({}, MagicMock()) is None
+        assert start_async_runner({"async_child_sync": True, "cassette_replay": "x.jsonl"}, MagicMock()) is None
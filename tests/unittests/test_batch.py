@@ -0,0 +1,74 @@
+"""Unit tests for tap_ms_graph/batch.py"""
+import gzip
+import json
+from decimal import Decimal
+from urllib.parse import urlparse
+
+import pytest
+
+from tap_ms_graph import output
+from tap_ms_graph.batch import BatchWriter, start_batch_writer
+from tap_ms_graph.codec import JsonCodec
+
+
+@pytest.fixture
+def batch_dir(tmp_path):
+    return str(tmp_path / "batches")
+
+
+@pytest.fixture(autouse=True)
+def reset_batch_writer():
+    yield
+    output.set_batch_writer(None)
+
+
+def read_messages(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def read_batch(message):
+    with gzip.open(urlparse(message["manifest"][0]).path, "rt") as batch_file:
+        return [json.loads(line) for line in batch_file]
+
+
+class TestBatchWriter:
+    def test_records_go_to_batch_file_announced_before_state(self, capsys, batch_dir):
+        output.set_batch_writer(BatchWriter(batch_dir, JsonCodec()))
+
+        output.write_record("audit_logs_signins", {"id": "1", "score": Decimal("1.5")})
+        output.write_record("audit_logs_signins", {"id": "2", "score": Decimal("2")})
+        output.write_state({"bookmarks": {}})
+
+        batch, state = read_messages(capsys)
+        assert batch["type"] == "BATCH"
+        assert batch["stream"] == "audit_logs_signins"
+        assert batch["encoding"] == {"format": "jsonl", "compression": "gzip"}
+        assert state["type"] == "STATE"
+        assert read_batch(batch) == [{"id": "1", "score": 1.5}, {"id": "2", "score": 2}]
+
+    def test_files_are_size_capped(self, capsys, batch_dir):
+        writer = BatchWriter(batch_dir, JsonCodec(), max_bytes=1)
+        output.set_batch_writer(writer)
+
+        output.write_record("users", {"id": "1"})
+        output.write_record("users", {"id": "2"})
+        writer.close()
+
+        batches = read_messages(capsys)
+        assert len(batches) == 2
+        assert batches[0]["manifest"] != batches[1]["manifest"]
+        assert read_batch(batches[1]) == [{"id": "2"}]
+
+    def test_unlisted_streams_are_written_as_records(self, capsys, batch_dir):
+        output.set_batch_writer(BatchWriter(batch_dir, JsonCodec(), streams=["mail_messages"]))
+
+        output.write_record("users", {"id": "1"})
+
+        assert read_messages(capsys)[0]["type"] == "RECORD"
+
+    def test_start_batch_writer_is_opt_in(self, batch_dir):
+        assert start_batch_writer({}, JsonCodec()) is None
+        writer = start_batch_writer({"batch_dir": batch_dir, "batch_max_bytes": 10,
+                                     "batch_streams": ["users"]}, JsonCodec())
+        assert writer.max_bytes == 10
+        assert writer.handles("users") and not writer.handles("groups")
@@ -0,0 +1,119 @@
+"""Unit tests for tap_ms_graph/cassette.py"""
+import gzip
+import json
+
+import pytest
+import requests
+from unittest.mock import patch
+
+from tap_ms_graph.cassette import CassetteMissError, ReplaySession, request_key
+from tap_ms_graph.client import Client
+
+USERS_URL = "https://graph.microsoft.com/v1.0/users"
+NEXT_LINK = USERS_URL + "?$top=1&$skiptoken=abc"
+CONFIG = {
+    "client_id": "mocked_client_id",
+    "client_secret": "mocked_secret",
+    "tenant_id": "mocked_tenant",
+    "scope": "mocked_scope",
+}
+
+
+def make_response(payload, status_code=200, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers = requests.structures.CaseInsensitiveDict(
+        {"Content-Type": "application/json", "X-Request-Id": "abc", **(headers or {})})
+    response._content = json.dumps(payload).encode()
+    response.encoding = "utf-8"
+    return response
+
+
+def record(path):
+    """Records a token request and two pages of users into `path`."""
+    responses = [
+        make_response({"access_token": "secret-token", "expires_in": 3600}),
+        make_response({"value": [{"id": "1"}], "@odata.nextLink": NEXT_LINK}),
+        make_response({"value": [{"id": "2"}]}),
+    ]
+    with patch("requests.Session.request", side_effect=responses):
+        with Client({**CONFIG, "cassette_record": path}) as client:
+            first = client.get(USERS_URL, {"$top": 1}, {})
+            second = client.get(NEXT_LINK, {}, {})
+    return first, second
+
+
+class TestRecordAndReplay:
+    def test_replay_returns_recorded_responses_without_network(self, tmp_path):
+        path = str(tmp_path / "sync.cassette.gz")
+        recorded = record(path)
+
+        with patch("requests.Session.request", side_effect=AssertionError("network used")):
+            with Client({**CONFIG, "cassette_replay": path, "cassette_time_scale": 0}) as client:
+                replayed = (client.get(USERS_URL, {"$top": 1}, {}), client.get(NEXT_LINK, {}, {}))
+
+        assert replayed == recorded
+
+    def test_cassette_is_compact_and_redacted(self, tmp_path):
+        path = str(tmp_path / "sync.cassette.gz")
+        record(path)
+
+        with gzip.open(path, "rt") as cassette:
+            lines = [json.loads(line) for line in cassette]
+
+        assert lines[0] == {"version": 1}
+        assert "secret-token" not in lines[1]["body"]
+        assert lines[2]["key"] == f"GET {USERS_URL}?%24top=1"
+        assert lines[2]["headers"] == {"Content-Type": "application/json"}
+
+    def test_replay_streams_pages(self, tmp_path):
+        path = str(tmp_path / "sync.cassette.gz")
+        record(path)
+
+        with Client({**CONFIG, "cassette_replay": path, "cassette_time_scale": 0}) as client:
+            page = client.get_page_stream(USERS_URL, {"$top": 1}, {}, "value")
+            assert list(page) == [{"id": "1"}]
+            assert page.properties["@odata.nextLink"] == NEXT_LINK
+
+
+class TestReplaySession:
+    def write_cassette(self, path, *entries):
+        with gzip.open(path, "wt") as cassette:
+            cassette.write(json.dumps({"version": 1}) + "\n")
+            for entry in entries:
+                cassette.write(json.dumps(entry) + "\n")
+
+    def entry(self, status=200, headers=None, body='{"value": []}', elapsed=0.5):
+        return {"key": request_key("GET", USERS_URL), "status": status, "headers": headers or {},
+                "body": body, "wire_bytes": 10, "offset": 0, "elapsed": elapsed}
+
+    @patch("tap_ms_graph.cassette.time.sleep")
+    def test_timing_and_retry_after_are_scaled(self, mock_sleep, tmp_path):
+        path = str(tmp_path / "c.gz")
+        self.write_cassette(path, self.entry(status=429, headers={"Retry-After": "10"}), self.entry())
+        session = ReplaySession(path, time_scale=0.5)
+
+        throttled = session.request("GET", USERS_URL)
+        ok = session.request("GET", USERS_URL)
+
+        assert mock_sleep.call_args_list[0].args == (0.25,)
+        assert throttled.status_code == 429
+        assert throttled.headers["Retry-After"] == "5"
+        assert ok.status_code == 200
+        assert ok.headers["Content-Length"] == "10"
+
+    def test_unrecorded_request_raises(self, tmp_path):
+        path = str(tmp_path / "c.gz")
+        self.write_cassette(path, self.entry())
+        session = ReplaySession(path, time_scale=0)
+
+        session.request("GET", USERS_URL)
+        with pytest.raises(CassetteMissError):
+            session.request("GET", USERS_URL)
+
+    def test_rejects_unknown_version(self, tmp_path):
+        path = str(tmp_path / "c.gz")
+        with gzip.open(path, "wt") as cassette:
+            cassette.write(json.dumps({"version": 99}) + "\n")
+        with pytest.raises(ValueError):
+            ReplaySession(path)
@@ -335,3 +335,57 @@ def test_token_reuse_if_not_expired(mock_request, client_config, mock_token):
     # Token fetch once, and 2 GET calls
     assert mock_request.call_count == 3
 
+
+
+@patch("requests.Session.request")
+def test_get_page_stream_parses_body_incrementally(mock_request, client_config, mock_token):
+    """
+    Test that get_page_stream requests a streamed response and yields the
+    records of the page along with its nextLink.
+    """
+    body = b'{"value": [{"id": "1"}, {"id": "2"}], "@odata.nextLink": "next"}'
+    streamed = MagicMock()
+    streamed.status_code = 200
+    streamed.iter_content.return_value = [body[i:i + 5] for i in range(0, len(body), 5)]
+    mock_request.side_effect = [mock_token, streamed]
+
+    with Client(client_config) as client:
+        page = client.get_page_stream("https://graph.microsoft.com/v1.0/users", {}, {}, "value")
+        records = list(page)
+
+    assert records == [{"id": "1"}, {"id": "2"}]
+    assert page.properties["@odata.nextLink"] == "next"
+    assert mock_request.call_args.kwargs["stream"] is True
+    streamed.close.assert_called_once()
+
+
+@patch("requests.Session.request")
+def test_orjson_codec_decodes_responses(mock_request, client_config):
+    """
+    Test that a client configured with the orjson codec decodes response
+    bodies from the raw content instead of requests' json().
+    """
+    pytest.importorskip("orjson")
+    token_response = MagicMock(status_code=200, content=b'{"access_token": "mocked_token", "expires_in": 3600}')
+    data_response = MagicMock(status_code=200, content=b'{"value": [{"id": "1"}]}')
+    mock_request.side_effect = [token_response, data_response]
+
+    with Client({**client_config, "json_codec": "orjson"}) as client:
+        result = client.get("https://graph.microsoft.com/v1.0/users", {}, {})
+
+    assert result == {"value": [{"id": "1"}]}
+    data_response.json.assert_not_called()
+
+
+def test_retry_count_is_per_thread(client_config):
+    """Retries counted on one thread are not seen by requests of another."""
+    import threading
+
+    client = Client(client_config)
+    client.retry_count += 2
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(client.retry_count))
+    thread.start()
+    thread.join()
+
+    assert (client.retry_count, seen) == (2, [0])
@@ -0,0 +1,134 @@
+"""Unit tests for tap_ms_graph/codec.py and tap_ms_graph/output.py"""
+import json
+from decimal import Decimal
+
+import pytest
+from unittest.mock import MagicMock, patch
+from singer.messages import RecordMessage, StateMessage, format_message
+
+from tap_ms_graph import codec as codec_module, output
+from tap_ms_graph.codec import JsonCodec, OrjsonCodec, get_codec
+from tap_ms_graph.output import BufferedWriter
+
+
+RECORD = {
+    "id": "1",
+    "displayName": "Zoë ✓",
+    "amount": Decimal("12.50"),
+    "count": Decimal("3"),
+    "nested": {"list": [1, None, True]},
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_output_codec():
+    yield
+    output.set_codec(JsonCodec())
+
+
+class TestGetCodec:
+    def test_default_when_unset(self):
+        assert isinstance(get_codec(None), JsonCodec)
+        assert get_codec("default").name == "default"
+
+    def test_auto_prefers_orjson_when_installed(self):
+        with patch.object(codec_module, "orjson", MagicMock()):
+            assert get_codec("auto").name == "orjson"
+
+    def test_auto_falls_back_without_orjson(self):
+        with patch.object(codec_module, "orjson", None):
+            assert get_codec("auto").name == "default"
+            assert get_codec("orjson").name == "default"
+
+    def test_unknown_codec_raises(self):
+        with pytest.raises(ValueError):
+            get_codec("ujson")
+
+
+class TestCodecOutput:
+    def test_default_codec_is_byte_identical_to_singer(self):
+        message = RecordMessage(stream="users", record=RECORD)
+        assert JsonCodec().dumps(message.asdict()) == format_message(message)
+
+    def test_orjson_codec_is_semantically_equal(self):
+        pytest.importorskip("orjson")
+        message = RecordMessage(stream="users", record=RECORD)
+        expected = json.loads(format_message(message))
+        assert json.loads(OrjsonCodec().dumps(message.asdict())) == expected
+
+    def test_format_record_matches_encoding_the_message(self):
+        pytest.importorskip("orjson")
+        message = RecordMessage(stream="users", record=RECORD)
+        for codec in (JsonCodec(), OrjsonCodec()):
+            assert codec.format_record("users", codec.dumps(RECORD)) == codec.dumps(message.asdict())
+
+    def test_orjson_codec_keeps_long_decimals_exact(self):
+        pytest.importorskip("orjson")
+        record = {"id": "1", "amount": Decimal("1234567890.123456789012345678"), "name": "Zoë"}
+        encoded = OrjsonCodec().dumps(record)
+        assert encoded == '{"id":"1","amount":1234567890.123456789012345678,"name":"Zoë"}'
+        assert json.loads(encoded, parse_float=Decimal) == record
+
+    def test_orjson_codec_decodes_response_content(self):
+        pytest.importorskip("orjson")
+        response = MagicMock()
+        response.content = b'{"value": [{"id": "1"}]}'
+        assert OrjsonCodec().decode_response(response) == {"value": [{"id": "1"}]}
+        response.json.assert_not_called()
+
+
+class TestOutputWriters:
+    def test_write_record_uses_active_codec(self, capsys):
+        stub = MagicMock()
+        stub.dumps.return_value = "ENCODED"
+        output.set_codec(stub)
+
+        output.write_record("users", {"id": "1"})
+
+        assert capsys.readouterr().out == "ENCODED\n"
+        assert stub.dumps.call_args[0][0] == {"type": "RECORD", "stream": "users", "record": {"id": "1"}}
+
+    def test_write_state_matches_singer(self, capsys):
+        output.write_state({"bookmarks": {}})
+        expected = format_message(StateMessage(value={"bookmarks": {}}))
+        assert capsys.readouterr().out == expected + "\n"
+
+    def test_write_schema_rejects_invalid_key_properties(self):
+        with pytest.raises(Exception):
+            output.write_schema("users", {}, 5)
+
+
+class TestBufferedWriter:
+    @pytest.fixture(autouse=True)
+    def buffered_output(self):
+        writer = BufferedWriter(buffer_size=1000, flush_interval=3600)
+        output.set_writer(writer)
+        yield writer
+        output.set_writer(None)
+
+    def test_records_are_batched(self, capsys):
+        output.write_record("users", {"id": "1"})
+        output.write_record("users", {"id": "2"})
+        assert capsys.readouterr().out == ""
+
+    def test_state_flushes_preceding_records(self, capsys):
+        output.write_record("users", {"id": "1"})
+        output.write_state({"bookmarks": {}})
+        lines = capsys.readouterr().out.splitlines()
+        assert [json.loads(line)["type"] for line in lines] == ["RECORD", "STATE"]
+
+    def test_flushes_when_buffer_is_full(self, capsys):
+        for i in range(30):
+            output.write_record("users", {"id": str(i)})
+        written = capsys.readouterr().out.splitlines()
+        assert 0 < len(written) < 30
+
+    def test_close_flushes_everything(self, capsys, buffered_output):
+        output.write_record("users", {"id": "1"})
+        buffered_output.close()
+        assert json.loads(capsys.readouterr().out)["record"] == {"id": "1"}
+
+    def test_flushes_after_interval(self, capsys, buffered_output):
+        buffered_output.flush_interval = 0
+        output.write_record("users", {"id": "1"})
+        assert capsys.readouterr().out
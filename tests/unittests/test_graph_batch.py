@@ -0,0 +1,152 @@
+"""Unit tests for tap_ms_graph/graph_batch.py and the mail_messages pre-check"""
+import json
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from tap_ms_graph.codec import JsonCodec
+from tap_ms_graph.exceptions import MsGraphInternalServerError, MsGraphNotFoundError
+from tap_ms_graph.graph_batch import batch_get
+from tap_ms_graph.streams.mail_messages import MailMessages
+from tap_ms_graph.streams.users import Users
+from helpers import make_catalog_entry
+
+
+def make_client(config=None):
+    client = MagicMock()
+    client.config = config or {}
+    client.base_url = "https://graph.microsoft.com/v1.0"
+    client.codec = JsonCodec()
+    return client
+
+
+def batch_response(responses):
+    return {"responses": [{"id": request_id, "status": status, "body": body}
+                          for request_id, (status, body) in responses.items()]}
+
+
+class TestBatchGet:
+    def test_requests_are_sent_in_batches_of_twenty(self):
+        client = make_client()
+        client.post.side_effect = lambda url, params, headers, body: batch_response(
+            {request["id"]: (200, {"value": []}) for request in json.loads(body)["requests"]})
+
+        results = batch_get(client, {str(i): f"/users/{i}" for i in range(45)})
+
+        assert len(results) == 45
+        assert client.post.call_count == 3
+        assert client.post.call_args.args[0] == "https://graph.microsoft.com/v1.0/$batch"
+
+    @patch("tap_ms_graph.graph_batch.time.sleep")
+    def test_throttled_requests_are_retried(self, mock_sleep):
+        client = make_client()
+        throttled = {"responses": [{"id": "a", "status": 429, "headers": {"Retry-After": "2"}}]}
+        client.post.side_effect = [throttled, batch_response({"a": (200, {"value": [1]})})]
+
+        assert batch_get(client, {"a": "/users/a"}) == {"a": (200, {"value": [1]})}
+        mock_sleep.assert_called_once_with(2.0)
+
+
+class TestMailboxPrecheck:
+    def make_stream(self):
+        client = make_client({"precheck_parents": True})
+        stream = MailMessages(client, make_catalog_entry())
+        stream.is_selected = MagicMock(return_value=True)
+        return stream
+
+    def precheck_responses(self, newest_modified, total=3):
+        def respond(url, params, headers, body):
+            responses = {}
+            for request in json.loads(body)["requests"]:
+                user = request["url"].split("/")[2]
+                if user == "nomailbox":
+                    responses[request["id"]] = (404, {"error": {"code": "MailboxNotEnabledForRESTAPI"}})
+                elif request["id"].endswith("folders"):
+                    responses[request["id"]] = (200, {"value": [{"totalItemCount": total}]})
+                else:
+                    modified = None if user == "empty" else newest_modified
+                    responses[request["id"]] = (200, {"value": [{"lastModifiedDateTime": modified}] if modified else []})
+            return batch_response(responses)
+        return respond
+
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_skips_empty_unavailable_and_unchanged_mailboxes(self, mock_write_record):
+        stream = self.make_stream()
+        stream.negative_cache = MagicMock()
+        stream.negative_cache.skip.return_value = False
+        stream.client.post.side_effect = self.precheck_responses("2024-01-01T00:00:00Z")
+        stream.client.get.return_value = {"value": [{"id": "m1"}]}
+        parents = [{"id": "u1"}, {"id": "empty"}, {"id": "nomailbox"}]
+        state = {}
+
+        stream.prepare_parents(parents, state)
+        counts = [stream.sync(state, MagicMock(transform=lambda r, *a: r), parent) for parent in parents]
+
+        assert counts == [1, 0, 0]
+        assert state["bookmarks"]["mail_messages"]["mailboxes"] == {"u1": "3:2024-01-01T00:00:00Z"}
+        assert stream.progress.expected_records == 3
+
+        # Unchanged on the next run; changed again after a new message.
+        stream.prepare_parents([{"id": "u1"}], state)
+        assert stream.sync(state, MagicMock(), {"id": "u1"}) == 0
+        stream.client.post.side_effect = self.precheck_responses("2024-01-02T00:00:00Z")
+        stream.prepare_parents([{"id": "u1"}], state)
+        assert stream.sync(state, MagicMock(transform=lambda r, *a: r), {"id": "u1"}) == 1
+
+    def test_unavailable_mailboxes_are_synced_without_a_negative_cache(self):
+        stream = self.make_stream()
+        stream.client.post.side_effect = self.precheck_responses("2024-01-01T00:00:00Z")
+
+        stream.prepare_parents([{"id": "nomailbox"}], {})
+
+        assert stream._skip_mailbox == {"nomailbox": False}
+
+    def test_failed_batch_syncs_every_mailbox(self):
+        stream = self.make_stream()
+        stream.client.post.side_effect = MsGraphNotFoundError("no $batch")
+
+        stream.prepare_parents([{"id": "u1"}, {"id": "u2"}], {})
+
+        assert stream._skip_mailbox == {"u1": False, "u2": False}
+        assert stream._pending_fingerprints == {}
+
+    def test_fingerprint_is_saved_only_after_the_mailbox_is_synced(self):
+        stream = self.make_stream()
+        stream.client.post.side_effect = self.precheck_responses("2024-01-01T00:00:00Z")
+        stream.client.get.side_effect = MsGraphInternalServerError("failed")
+        state = {}
+
+        stream.prepare_parents([{"id": "u1"}], state)
+        with pytest.raises(MsGraphInternalServerError):
+            stream.sync(state, MagicMock(transform=lambda r, *a: r), {"id": "u1"})
+
+        assert state["bookmarks"]["mail_messages"]["mailboxes"] == {}
+        stream.prepare_parents([{"id": "u1"}], state)
+        assert stream._skip_mailbox == {"u1": False}
+
+    def test_orderby_is_url_encoded(self):
+        stream = self.make_stream()
+        stream.client.post.side_effect = self.precheck_responses("2024-01-01T00:00:00Z")
+
+        stream.prepare_parents([{"id": "u1"}], {})
+
+        urls = [request["url"] for request in json.loads(stream.client.post.call_args.args[3])["requests"]]
+        assert "$orderby=lastModifiedDateTime%20desc" in urls[1]
+        assert not any(" " in url for url in urls)
+
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_parents_are_checked_in_batches(self, mock_write_record):
+        client = make_client({"precheck_parents": True, "precheck_batch_size": 2})
+        users = Users(client, make_catalog_entry())
+        users.is_selected = MagicMock(return_value=False)
+        child = MailMessages(client, make_catalog_entry())
+        child.is_selected = MagicMock(return_value=True)
+        users.child_to_sync = [child]
+        client.post.side_effect = self.precheck_responses("2024-01-01T00:00:00Z")
+        client.get.side_effect = lambda url, *args, **kwargs: (
+            {"value": [{"id": "u1"}, {"id": "u2"}, {"id": "u3"}]} if url.endswith("/users") else {"value": []})
+
+        users.sync(state={}, transformer=MagicMock(transform=lambda r, *a: r))
+
+        assert client.post.call_count == 2
+        assert users.progress.parents_done == 3
@@ -0,0 +1,222 @@
+"""Unit tests for tap_ms_graph/http_metrics.py"""
+import gzip
+import io
+import json
+import threading
+
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+from urllib3.response import HTTPResponse
+
+from tap_ms_graph.client import Client
+from tap_ms_graph.exceptions import MsGraphRateLimitError
+from tap_ms_graph.http_metrics import (
+    EndpointMetrics,
+    LatencyHistogram,
+    TransferStats,
+    endpoint_template,
+    get_response_sizes)
+
+
+CONFIG = {
+    "client_id": "mocked_client_id",
+    "client_secret": "mocked_secret",
+    "tenant_id": "mocked_tenant",
+    "scope": "mocked_scope",
+}
+
+
+def make_gzip_response(payload, status_code=200):
+    """A real requests.Response whose body is gzip-encoded on the 'wire'."""
+    body = gzip.compress(json.dumps(payload).encode())
+    raw = HTTPResponse(
+        body=io.BytesIO(body),
+        headers={"Content-Encoding": "gzip", "Content-Type": "application/json"},
+        status=status_code,
+        preload_content=False,
+        decode_content=True,
+    )
+    response = requests.Response()
+    response.status_code = status_code
+    response.raw = raw
+    response.headers = requests.structures.CaseInsensitiveDict(raw.headers)
+    return response, len(body)
+
+
+def make_json_response(payload, status_code=200, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers = requests.structures.CaseInsensitiveDict(headers or {})
+    response._content = json.dumps(payload).encode()
+    return response
+
+
+class TestGetResponseSizes:
+    def test_compressed_response_reports_wire_and_decoded_sizes(self):
+        payload = {"value": [{"id": str(i), "subject": "hello " * 20} for i in range(50)]}
+        response, wire_size = make_gzip_response(payload)
+
+        wire, decoded = get_response_sizes(response)
+
+        assert decoded == len(json.dumps(payload).encode())
+        assert wire == wire_size
+        assert wire < decoded
+
+    def test_falls_back_to_content_length(self):
+        response = MagicMock(spec=["content", "headers"])
+        response.content = b"x" * 10
+        response.headers = {"Content-Length": "4"}
+        assert get_response_sizes(response) == (4, 10)
+
+    def test_falls_back_to_decoded_size(self):
+        response = MagicMock(spec=["content", "headers"])
+        response.content = b"x" * 10
+        response.headers = {}
+        assert get_response_sizes(response) == (10, 10)
+
+
+class TestTransferStats:
+    def test_accumulates_per_tag(self):
+        stats = TransferStats()
+        stats.add("users", 10, 100)
+        stats.add("users", 5, 50)
+        stats.add(None, 1, 1)
+
+        assert stats.get("users") == {"requests": 2, "wire": 15, "decoded": 150}
+        assert stats.get("other")["requests"] == 1
+
+    def test_concurrent_adds_are_all_counted(self):
+        stats = TransferStats()
+
+        def add():
+            for _ in range(1000):
+                stats.add("users", 1, 2)
+
+        threads = [threading.Thread(target=add) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert stats.get("users") == {"requests": 8000, "wire": 8000, "decoded": 16000}
+
+    @patch("tap_ms_graph.http_metrics.metrics.log")
+    def test_emit_logs_metrics_and_resets(self, mock_log):
+        stats = TransferStats()
+        stats.add("mail_messages", 10, 100)
+
+        stats.emit()
+
+        points = {(c.args[1].metric, c.args[1].value) for c in mock_log.call_args_list}
+        assert points == {("http_wire_bytes", 10), ("http_decoded_bytes", 100)}
+        assert mock_log.call_args_list[0].args[1].tags == {"endpoint": "mail_messages"}
+        assert stats.get("mail_messages")["requests"] == 0
+
+
+class TestClientCompression:
+    def test_session_negotiates_compression(self):
+        client = Client(CONFIG)
+        assert "gzip" in client._session.headers["Accept-Encoding"]
+
+    @patch("requests.Session.request")
+    def test_get_accounts_bytes_to_tag(self, mock_request):
+        token = MagicMock(status_code=200, content=b"{}")
+        token.json.return_value = {"access_token": "token", "expires_in": 3600}
+        payload = {"value": [{"id": "1", "body": "a" * 2000}]}
+        response, wire_size = make_gzip_response(payload)
+        mock_request.side_effect = [token, response]
+
+        with Client(CONFIG) as client:
+            result = client.get("https://graph.microsoft.com/v1.0/users", {}, {}, tag="users")
+
+        assert result == payload
+        counts = client.transfer_stats.get("users")
+        assert counts["wire"] == wire_size
+        assert counts["decoded"] == len(json.dumps(payload).encode())
+
+
+class TestEndpointTemplate:
+    @pytest.mark.parametrize("url, expected", [
+        ("https://graph.microsoft.com/v1.0/users?$top=999", "users"),
+        ("https://graph.microsoft.com/v1.0/users/8a1f6c3e-2b4d-4e5f-9a6b-7c8d9e0f1a2b/messages?$skiptoken=x",
+         "users/{id}/messages"),
+        ("https://graph.microsoft.com/v1.0/chats/19:abc@thread.v2/messages", "chats/{id}/messages"),
+        ("https://graph.microsoft.com/v1.0/users/AAMkAGI2TG93AAA=/messages", "users/{id}/messages"),
+        ("https://graph.microsoft.com/v1.0/identity/conditionalAccess/policies", "identity/conditionalAccess/policies"),
+        ("https://graph.microsoft.com/v1.0/users/$count", "users/$count"),
+        ("https://login.microsoftonline.com/8a1f6c3e-2b4d-4e5f-9a6b-7c8d9e0f1a2b/oauth2/v2.0/token",
+         "{id}/oauth2/v2.0/token"),
+    ])
+    def test_templates(self, url, expected):
+        assert endpoint_template(url, "https://graph.microsoft.com/v1.0") == expected
+
+
+class TestLatencyHistogram:
+    def test_percentiles_are_within_bucket_resolution(self):
+        histogram = LatencyHistogram()
+        for millis in range(1, 1001):
+            histogram.add(millis / 1000.0)
+
+        assert histogram.percentile(50) == pytest.approx(0.5, rel=0.05)
+        assert histogram.percentile(99) == pytest.approx(0.99, rel=0.05)
+        assert histogram.percentile(100) == 1.0
+
+    def test_empty_histogram(self):
+        assert LatencyHistogram().percentile(95) == 0.0
+
+
+class TestEndpointMetrics:
+    @patch("tap_ms_graph.http_metrics.metrics.log")
+    def test_emits_window_per_endpoint_and_resets(self, mock_log):
+        endpoint_metrics = EndpointMetrics(interval=3600)
+        endpoint_metrics.observe("users/{id}/messages", 200, 0.2)
+        endpoint_metrics.observe("users/{id}/messages", 429, 0.1, retry_after=7)
+        endpoint_metrics.add_bytes("users/{id}/messages", 1000)
+        mock_log.assert_not_called()
+
+        endpoint_metrics.emit()
+
+        points = {c.args[1].metric: c.args[1].value for c in mock_log.call_args_list}
+        assert points["http_requests"] == 2
+        assert points["http_pages"] == 1
+        assert points["http_throttled"] == 1
+        assert points["http_retry_after_seconds"] == 7
+        assert points["http_bytes"] == 1000
+        assert points["http_request_duration_p99"] == pytest.approx(0.2)
+        assert mock_log.call_args_list[0].args[1].tags == {"endpoint": "users/{id}/messages"}
+        assert endpoint_metrics.get("users/{id}/messages") == {}
+
+    @patch("tap_ms_graph.http_metrics.metrics.log")
+    def test_emits_periodically(self, mock_log):
+        endpoint_metrics = EndpointMetrics(interval=0)
+        endpoint_metrics.observe("users", 200, 0.1)
+        assert mock_log.called
+
+
+class TestClientEndpointMetrics:
+    @patch("tap_ms_graph.client.time.sleep")
+    @patch("requests.Session.request")
+    def test_records_throttling_and_templated_timer(self, mock_request, mock_sleep):
+        token = make_json_response({"access_token": "token", "expires_in": 3600})
+        throttled = make_json_response({"error": "throttled"}, 429, {"Retry-After": "3"})
+        page = make_json_response({"value": []})
+        mock_request.side_effect = [token, throttled, page]
+        url = "https://graph.microsoft.com/v1.0/users/8a1f6c3e-2b4d-4e5f-9a6b-7c8d9e0f1a2b/messages"
+
+        with patch("tap_ms_graph.client.metrics.http_request_timer") as mock_timer:
+            with Client(CONFIG) as client:
+                client.get(url, {}, {})
+
+        counts = client.endpoint_metrics.get("users/{id}/messages")
+        assert counts["requests"] == 2
+        assert counts["pages"] == 1
+        assert counts["throttled"] == 1
+        assert counts["retry_after_seconds"] == 3
+        assert mock_timer.call_args.args == ("users/{id}/messages",)
+        # Retry-After is honoured rather than lost on the falsy 429 response.
+        mock_sleep.assert_any_call(3)
+
+    def test_rate_limit_error_reads_retry_after_from_4xx_response(self):
+        response = make_json_response({}, 429, {"Retry-After": "12"})
+        assert MsGraphRateLimitError("throttled", response).retry_after == 12
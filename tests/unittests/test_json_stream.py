@@ -0,0 +1,88 @@
+"""Unit tests for tap_ms_graph/json_stream.py"""
+import json
+
+import pytest
+
+from tap_ms_graph.json_stream import StreamingPage
+
+
+def chunked(text, size):
+    data = text.encode("utf-8")
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+PAGE = {
+    "@odata.context": "https://graph.microsoft.com/v1.0/$metadata#users",
+    "value": [
+        {"id": "1", "displayName": "Ünïcødé ✓", "tags": ["a", "]", "}"]},
+        {"id": "2", "nested": {"list": [1, 2.5, None, True], "s": "x\"y\\z"}},
+        {"id": "3", "size": 1234567890},
+    ],
+    "@odata.nextLink": "https://graph.microsoft.com/v1.0/users?$skiptoken=abc",
+    "@odata.count": 12345,
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 100000])
+def test_records_and_next_link_across_chunk_sizes(chunk_size):
+    page = StreamingPage(chunked(json.dumps(PAGE, ensure_ascii=False), chunk_size), "value")
+
+    records = list(page)
+
+    assert records == PAGE["value"]
+    assert page.properties["@odata.nextLink"] == PAGE["@odata.nextLink"]
+    assert page.properties["@odata.count"] == 12345
+    assert "value" not in page.properties
+
+
+def test_next_link_before_value_is_available():
+    body = '{"@odata.nextLink": "next", "value": [{"id": "1"}]}'
+    page = StreamingPage(chunked(body, 4), "value")
+
+    assert list(page) == [{"id": "1"}]
+    assert page.properties == {"@odata.nextLink": "next"}
+
+
+def test_records_are_yielded_before_page_is_fully_read():
+    body = '{"value": [{"id": "1"}, {"id": "2"}], "@odata.nextLink": "next"}'
+    consumed = []
+
+    def chunks():
+        for chunk in chunked(body, 5):
+            consumed.append(chunk)
+            yield chunk
+
+    page = StreamingPage(chunks(), "value")
+    first = next(iter(page))
+
+    assert first == {"id": "1"}
+    assert sum(len(c) for c in consumed) < len(body)
+
+
+def test_raw_records_are_original_text():
+    body = '{"value":[{"id":"1","a":[1,2]} , {"id":"2"}]}'
+    page = StreamingPage(chunked(body, 3), "value")
+
+    assert list(page.iter_raw()) == [
+        ({"id": "1", "a": [1, 2]}, '{"id":"1","a":[1,2]}'),
+        ({"id": "2"}, '{"id":"2"}'),
+    ]
+
+
+@pytest.mark.parametrize("body", ['{"value": []}', '{}', '{"@odata.context": "x"}'])
+def test_empty_pages(body):
+    page = StreamingPage(chunked(body, 2), "value")
+    assert list(page) == []
+
+
+def test_truncated_page_raises():
+    page = StreamingPage(chunked('{"value": [{"id": "1"}, {"id": ', 4), "value")
+    with pytest.raises(ValueError):
+        list(page)
+
+
+def test_page_can_only_be_iterated_once():
+    page = StreamingPage(chunked('{"value": []}', 4), "value")
+    list(page)
+    with pytest.raises(RuntimeError):
+        list(page)
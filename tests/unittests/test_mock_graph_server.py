@@ -0,0 +1,106 @@
+"""Smoke tests for the benchmark mock Graph server (tests/benchmarks)"""
+import os
+import queue
+import sys
+
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from mock_graph_server import MockGraphServer  # noqa: E402
+from run_benchmarks import CountingSink, build_catalog, wait_for_result  # noqa: E402
+
+from tap_ms_graph.client import Client  # noqa: E402
+from tap_ms_graph.sync import sync  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    with MockGraphServer(sizes={"users": 25, "mail_messages": 3}) as mock_server:
+        yield mock_server
+
+
+def run_sync(server, stream_name, **config_overrides):
+    config = server.config(**config_overrides)
+    sink = CountingSink()
+    with patch("sys.stdout", sink), Client(config) as client:
+        sync(client=client, config=config, catalog=build_catalog(stream_name), state={})
+    return sink
+
+
+def test_client_uses_configured_urls(server):
+    with Client(server.config()) as client:
+        assert client.base_url == server.base_url
+        response = client.get(f"{server.base_url}/users", {"$top": 2}, {})
+    assert [record["id"] for record in response["value"]] == ["users-000000", "users-000001"]
+    assert "$skiptoken=2" in response["@odata.nextLink"]
+
+
+def test_sync_follows_next_links(server):
+    sink = run_sync(server, "users", page_size=10)
+    assert sink.records == 25
+    assert server.graph.stats["requests"] == 3
+
+
+def test_sync_child_stream_for_every_parent(server):
+    sink = run_sync(server, "mail_messages")
+    assert sink.records == 25 * 3
+
+
+def test_unknown_parent_is_not_found(server):
+    response = requests.get(f"{server.base_url}/users/missing/messages", headers={"Authorization": "x"})
+    assert response.status_code == 404
+
+
+def test_count_requires_eventual_consistency(server):
+    url = f"{server.base_url}/users/$count"
+    assert requests.get(url, headers={"Authorization": "x"}).status_code == 400
+    response = requests.get(url, headers={"Authorization": "x", "ConsistencyLevel": "eventual"})
+    assert response.text == "25"
+
+
+def test_throttled_requests_carry_retry_after(server):
+    server.graph.throttle_rate = 1.0
+    response = requests.get(f"{server.base_url}/users", headers={"Authorization": "x"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert server.graph.stats["throttled"] == 1
+
+
+def test_date_filters_select_record_ranges(server):
+    url = f"{server.base_url}/users/users-000000/messages"
+    response = requests.get(url, headers={"Authorization": "x"}, params={
+        "$filter": "receivedDateTime ge 2024-01-01T00:01:00Z and receivedDateTime lt 2024-01-01T00:02:30Z",
+        "$count": "true",
+    }).json()
+    assert [record["id"][-1] for record in response["value"]] == ["1", "2"]
+    assert response["@odata.count"] == 2
+
+
+def test_batch_answers_each_request(server):
+    body = {"requests": [
+        {"id": "1", "method": "GET", "url": "/users/users-000000/mailFolders?$select=totalItemCount"},
+        {"id": "2", "method": "GET", "url": "/users/users-000000/messages?$orderby=lastModifiedDateTime%20desc&$top=1"},
+        {"id": "3", "method": "GET", "url": "/users/missing/mailFolders"},
+    ]}
+    response = requests.post(f"{server.base_url}/$batch", json=body, headers={"Authorization": "x"}).json()
+    responses = {item["id"]: item for item in response["responses"]}
+    assert responses["1"]["body"]["value"][0]["totalItemCount"] == 3
+    assert responses["2"]["body"]["value"][0]["id"].endswith("000002")
+    assert responses["3"]["status"] == 404
+    assert server.graph.stats["batched"] == 3
+
+
+def test_windowed_precheck_sync_emits_each_message_once(server):
+    sink = run_sync(server, "mail_messages", precheck_parents=True, split_threshold=1)
+    assert sink.records == 25 * 3
+
+
+def test_worker_exiting_without_a_result_is_reported_failed():
+    worker = MagicMock(exitcode=1)
+    worker.is_alive.return_value = False
+    with patch.object(queue.Queue, "get", side_effect=queue.Empty):
+        row = wait_for_result(worker, queue.Queue(), "mail_messages")
+    assert (row["stream"], row["records"], row["error"]) == ("mail_messages", 0, "worker exited with code 1")
@@ -0,0 +1,96 @@
+"""Unit tests for tap_ms_graph/negative_cache.py"""
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from tap_ms_graph.async_sync import _sync_child
+from tap_ms_graph.exceptions import MsGraphForbiddenError, MsGraphNotFoundError
+from tap_ms_graph.negative_cache import NegativeCache, open_negative_cache
+from tap_ms_graph.streams.mail_messages import MailMessages
+from tap_ms_graph.streams.users import Users
+from helpers import make_catalog_entry
+
+
+def make_stream(negative_cache=None):
+    client = MagicMock()
+    client.config = {}
+    client.base_url = "https://graph.microsoft.com/v1.0"
+    stream = MailMessages(client, make_catalog_entry())
+    stream.negative_cache = negative_cache
+    return stream
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return NegativeCache(str(tmp_path / "negative.db"), ttl=3600)
+
+
+class TestNegativeCache:
+    def test_entries_expire(self, cache):
+        cache.add("mail_messages", "u1", 404)
+        assert cache.contains("mail_messages", "u1")
+        assert not cache.contains("contacts", "u1")
+        with patch("tap_ms_graph.negative_cache.time.time", return_value=10 ** 12):
+            assert not cache.contains("mail_messages", "u1")
+
+    def test_ttl_is_spread(self, cache):
+        with patch("tap_ms_graph.negative_cache.random.uniform", return_value=0.5), \
+                patch("tap_ms_graph.negative_cache.time.time", return_value=0):
+            cache.add("mail_messages", "u1", 404)
+            assert cache.contains("mail_messages", "u1")
+        with patch("tap_ms_graph.negative_cache.time.time", return_value=1801):
+            assert not cache.contains("mail_messages", "u1")
+
+    def test_open_negative_cache_is_opt_in(self, tmp_path):
+        assert open_negative_cache({}) is None
+        cache = open_negative_cache({"negative_cache": str(tmp_path / "n.db"), "negative_cache_ttl": 60})
+        assert cache.ttl == 60
+
+
+class TestStreamNegativeCache:
+    @pytest.mark.parametrize("error", [MsGraphNotFoundError, MsGraphForbiddenError])
+    def test_unavailable_parents_are_cached_and_skipped(self, cache, error):
+        stream = make_stream(cache)
+        stream.client.get.side_effect = error("unavailable")
+
+        assert stream.sync(state={}, transformer=MagicMock(), parent_obj={"id": "u1"}) == 0
+        assert stream.sync(state={}, transformer=MagicMock(), parent_obj={"id": "u1"}) == 0
+
+        assert stream.client.get.call_count == 1
+        assert cache.skipped == 1
+
+    def test_forbidden_still_raises_without_cache(self):
+        stream = make_stream()
+        stream.client.get.side_effect = MsGraphForbiddenError("forbidden")
+        with pytest.raises(MsGraphForbiddenError):
+            stream.sync(state={}, transformer=MagicMock(), parent_obj={"id": "u1"})
+
+    def test_async_children_skip_cached_parents(self, cache):
+        cache.add("mail_messages", "u1", 404)
+        stream = make_stream(cache)
+        client = MagicMock()
+        client.get = AsyncMock(return_value={"value": [{"id": "m1"}]})
+
+        stream.is_selected = MagicMock(return_value=True)
+        stream.parent_synced = MagicMock()
+        counter = MagicMock()
+
+        async def sync_child(parent_id):
+            await _sync_child(stream, client, {"id": parent_id}, {}, MagicMock(transform=lambda r, *a: r),
+                              asyncio.Semaphore(1), counter)
+
+        with patch("tap_ms_graph.async_sync.write_record") as mock_write_record:
+            asyncio.run(sync_child("u1"))
+            asyncio.run(sync_child("u2"))
+
+        assert [c.args[1]["id"] for c in mock_write_record.call_args_list] == ["m1"]
+        # Only the parent that was not skipped is marked synced.
+        assert [c.args[0]["id"] for c in stream.parent_synced.call_args_list] == ["u2"]
+
+    def test_cache_is_shared_with_child_streams(self, cache):
+        users = Users(make_stream().client, make_catalog_entry())
+        child = make_stream()
+        users.child_to_sync = [child]
+        users.set_negative_cache(cache)
+        assert child.negative_cache is cache
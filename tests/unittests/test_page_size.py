@@ -0,0 +1,152 @@
+"""Unit tests for tap_ms_graph/page_size.py and its use in BaseStream.get_records"""
+import pytest
+from unittest.mock import MagicMock, patch
+
+from tap_ms_graph.exceptions import MsGraphServiceUnavailableError
+from tap_ms_graph.http_metrics import TransferStats
+from tap_ms_graph.page_size import PageSizeController, max_page_size_header, with_page_size
+from tap_ms_graph.streams.directory_roles import DirectoryRoles
+from tap_ms_graph.streams.users import Users
+from helpers import make_catalog_entry
+
+
+def make_client(**config):
+    client = MagicMock()
+    client.base_url = "https://graph.microsoft.com/v1.0"
+    client.config = {"page_size": 400, "start_date": "2024-01-01T00:00:00Z",
+                     "adaptive_page_size": True, **config}
+    client.retry_count = 0
+    client.transfer_stats = TransferStats()
+    return client
+
+
+class TestPageSizeController:
+    def test_halves_after_retries(self):
+        controller = PageSizeController(400, 10, 999)
+        assert controller.observe(1.0, retries=2, records=400) == 200
+
+    def test_halves_after_slow_page(self):
+        controller = PageSizeController(400, 10, 999, target_latency=5)
+        assert controller.observe(6.0, records=400) == 200
+
+    def test_grows_after_fast_full_page(self):
+        controller = PageSizeController(400, 10, 999, target_latency=5)
+        assert controller.observe(1.0, records=400) == 500
+
+    def test_does_not_grow_after_partial_page(self):
+        controller = PageSizeController(400, 10, 999, target_latency=5)
+        assert controller.observe(1.0, records=12) == 400
+
+    def test_shrinks_to_fit_payload_budget(self):
+        controller = PageSizeController(400, 10, 999, max_page_bytes=1000)
+        assert controller.observe(1.0, page_bytes=4000, records=400) == 100
+
+    def test_respects_bounds(self):
+        controller = PageSizeController(5000, 50, 999, target_latency=5)
+        assert controller.page_size == 999
+        assert controller.observe(1.0, records=999) == 999
+        for _ in range(10):
+            controller.observe(1.0, retries=1)
+        assert controller.page_size == 50
+
+    def test_on_failure_stops_at_minimum(self):
+        controller = PageSizeController(20, 10, 999)
+        assert controller.on_failure() is True
+        assert controller.page_size == 10
+        assert controller.on_failure() is False
+
+
+class TestHelpers:
+    @pytest.mark.parametrize("url, expected", [
+        ("https://g/v1.0/users?$top=999&$skiptoken=abc", "https://g/v1.0/users?$top=50&$skiptoken=abc"),
+        ("https://g/v1.0/users?$skiptoken=abc&%24top=999", "https://g/v1.0/users?$skiptoken=abc&%24top=50"),
+        ("https://g/v1.0/users?$skiptoken=abc", "https://g/v1.0/users?$skiptoken=abc"),
+    ])
+    def test_with_page_size(self, url, expected):
+        assert with_page_size(url, 50) == expected
+
+    def test_max_page_size_header(self):
+        assert max_page_size_header(100) == "odata.maxpagesize=100"
+
+
+class TestAdaptiveGetRecords:
+    def test_disabled_by_default(self):
+        client = make_client(adaptive_page_size=False)
+        stream = Users(client, make_catalog_entry())
+        assert stream.page_size_controller is None
+
+    def test_retries_shrink_top_in_next_link(self):
+        client = make_client()
+        next_link = "https://graph.microsoft.com/v1.0/users?$top=400&$skiptoken=abc"
+
+        def get(*args, **kwargs):
+            if client.get.call_count == 1:
+                client.retry_count += 1  # the first page needed a retry
+                return {"value": [{"id": "1"}], "@odata.nextLink": next_link}
+            return {"value": [{"id": "2"}]}
+
+        client.get.side_effect = get
+        stream = Users(client, make_catalog_entry())
+        stream.update_params()
+
+        list(stream.get_records())
+
+        assert client.get.call_args_list[0][0][1]["$top"] == 400
+        assert client.get.call_args_list[1][0][0] == next_link.replace("$top=400", "$top=200")
+
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_child_retries_leave_parent_page_size(self, mock_write_record):
+        client = make_client()
+        next_link = "https://graph.microsoft.com/v1.0/users?$top=400&$skiptoken=abc"
+        client.get.side_effect = [
+            {"value": [{"id": "1"}], "@odata.nextLink": next_link},
+            {"value": [{"id": "2"}]},
+        ]
+        stream = Users(client, make_catalog_entry())
+        stream.is_selected = MagicMock(return_value=True)
+        child = MagicMock()
+
+        def child_sync(**kwargs):
+            client.retry_count += 1  # every child request needed a retry
+        child.sync.side_effect = child_sync
+        stream.child_to_sync = [child]
+
+        stream.sync(state={}, transformer=MagicMock(transform=lambda record, *args: record))
+
+        assert client.get.call_args_list[1][0][0] == next_link
+
+    def test_failed_page_is_retried_smaller(self):
+        client = make_client()
+        client.get.side_effect = [
+            MsGraphServiceUnavailableError("503"),
+            {"value": [{"id": "1"}]},
+        ]
+        stream = Users(client, make_catalog_entry())
+        stream.update_params()
+
+        records = list(stream.get_records())
+
+        assert records == [{"id": "1"}]
+        assert client.get.call_args_list[1][0][1]["$top"] == 200
+
+    def test_failure_at_minimum_is_raised(self):
+        client = make_client(page_size_bounds={"users": [10, 10]})
+        client.get.side_effect = MsGraphServiceUnavailableError("503")
+        stream = Users(client, make_catalog_entry())
+        stream.update_params()
+
+        with pytest.raises(MsGraphServiceUnavailableError):
+            list(stream.get_records())
+
+    def test_streams_without_top_use_prefer_header(self):
+        client = make_client()
+        client.get.return_value = {"value": [{"id": "1"}]}
+        stream = DirectoryRoles(client, make_catalog_entry())
+        stream.update_params()
+
+        list(stream.get_records())
+
+        params, headers = client.get.call_args[0][1], client.get.call_args[0][2]
+        assert "$top" not in params
+        assert headers["Prefer"] == "odata.maxpagesize=400"
+        assert "Prefer" not in DirectoryRoles.headers
@@ -0,0 +1,88 @@
+"""Unit tests for tap_ms_graph/parent_index.py"""
+import pytest
+from unittest.mock import MagicMock
+
+from tap_ms_graph.exceptions import MsGraphError
+from tap_ms_graph.parent_index import ParentIndex, open_parent_index
+from tap_ms_graph.streams.users import Users
+from helpers import make_catalog_entry
+
+BASE_URL = "https://graph.microsoft.com/v1.0"
+
+
+def make_stream():
+    client = MagicMock()
+    client.config = {}
+    client.base_url = BASE_URL
+    return Users(client, make_catalog_entry())
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ParentIndex(str(tmp_path / "parents.db"))
+    yield index
+    index.close()
+
+
+class TestParentIndex:
+    def test_first_refresh_lists_ids_through_delta(self, index):
+        stream = make_stream()
+        stream.client.get.side_effect = [
+            {"value": [{"id": "u1", "@odata.etag": "W/1"}], "@odata.nextLink": f"{BASE_URL}/users/delta?$skiptoken=a"},
+            {"value": [{"id": "u2"}], "@odata.deltaLink": f"{BASE_URL}/users/delta?$deltatoken=b"},
+        ]
+
+        index.refresh(stream)
+
+        first_call = stream.client.get.call_args_list[0]
+        assert first_call.args[:2] == (f"{BASE_URL}/users/delta", {"$select": "id"})
+        assert list(index.ids("users")) == ["u1", "u2"]
+        assert index.get_delta_link("users") == f"{BASE_URL}/users/delta?$deltatoken=b"
+
+    def test_later_refresh_applies_changes_only(self, index):
+        index.apply("users", [{"id": "u1"}, {"id": "u2"}])
+        index.set_delta_link("users", "delta-link")
+        stream = make_stream()
+        stream.client.get.return_value = {
+            "value": [{"id": "u1", "@removed": {"reason": "deleted"}}, {"id": "u3"}],
+            "@odata.deltaLink": "next-delta-link",
+        }
+
+        index.refresh(stream)
+
+        stream.client.get.assert_called_once()
+        assert stream.client.get.call_args.args[0] == "delta-link"
+        assert list(index.ids("users")) == ["u2", "u3"]
+        assert index.get_delta_link("users") == "next-delta-link"
+
+    def test_expired_delta_link_relists(self, index):
+        index.apply("users", [{"id": "stale"}])
+        index.set_delta_link("users", "expired-link")
+        stream = make_stream()
+        stream.client.get.side_effect = [
+            MsGraphError("HTTP-error-code: 410, Error: resyncRequired"),
+            {"value": [{"id": "u1"}], "@odata.deltaLink": "fresh-link"},
+        ]
+
+        index.refresh(stream)
+
+        assert list(index.ids("users")) == ["u1"]
+        assert index.get_delta_link("users") == "fresh-link"
+
+    def test_children_are_synced_from_the_index(self, index):
+        index.apply("users", [{"id": "u1"}, {"id": "u2"}])
+        stream = make_stream()
+        stream.is_selected = MagicMock(return_value=False)
+        stream.parent_index = index
+        child = MagicMock()
+        stream.child_to_sync = [child]
+
+        stream.sync(state={}, transformer=MagicMock())
+
+        stream.client.get.assert_not_called()
+        assert stream.get_count() == 2
+        assert [c.kwargs["parent_obj"] for c in child.sync.call_args_list] == [{"id": "u1"}, {"id": "u2"}]
+
+    def test_open_parent_index_is_opt_in(self, tmp_path):
+        assert open_parent_index({}) is None
+        assert open_parent_index({"parent_index": str(tmp_path / "p.db")}).path.endswith("p.db")
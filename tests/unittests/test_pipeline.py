@@ -0,0 +1,161 @@
+"""Unit tests for tap_ms_graph/pipeline.py"""
+import threading
+import time
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from tap_ms_graph import output
+from tap_ms_graph.pipeline import PipelineStats, QueueWriter, StageStats, prefetch, start_writer
+from tap_ms_graph.streams.users import Users
+from helpers import make_catalog_entry
+
+
+class TestPrefetch:
+    def test_yields_records_in_order(self):
+        stats = PipelineStats()
+        assert list(prefetch(iter(range(100)), stats, size=3)) == list(range(100))
+        assert stats.fetch.items == 100
+        assert stats.transform.items == 100
+
+    def test_bounded_queue_applies_backpressure(self):
+        produced = []
+
+        def records():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        iterator = prefetch(records(), PipelineStats(), size=2)
+        assert next(iterator) == 0
+        time.sleep(0.2)
+        # One record consumed, two queued, one held by the blocked producer.
+        assert len(produced) <= 4
+        iterator.close()
+
+    def test_fetch_errors_are_raised_to_consumer(self):
+        def records():
+            yield 1
+            raise ValueError("fetch failed")
+
+        iterator = prefetch(records(), PipelineStats(), size=2)
+        assert next(iterator) == 1
+        with pytest.raises(ValueError, match="fetch failed"):
+            next(iterator)
+
+    def test_closing_consumer_stops_fetching(self):
+        stopped = threading.Event()
+
+        def records():
+            try:
+                i = 0
+                while True:
+                    yield i
+                    i += 1
+            finally:
+                stopped.set()
+
+        iterator = prefetch(records(), PipelineStats(), size=2)
+        next(iterator)
+        iterator.close()
+        assert stopped.wait(1)
+
+
+class TestQueueWriter:
+    def test_writes_messages_in_order(self, capsys):
+        writer = QueueWriter(PipelineStats(), size=2)
+        for i in range(50):
+            writer.write(f"{i}\n")
+        writer.close()
+        assert capsys.readouterr().out == "".join(f"{i}\n" for i in range(50))
+
+    def test_flush_waits_for_queued_messages(self, capsys):
+        writer = QueueWriter(PipelineStats())
+        writer.write("a\n")
+        writer.flush()
+        assert capsys.readouterr().out == "a\n"
+        writer.close()
+
+    def test_write_errors_surface_to_producer(self):
+        stdout = MagicMock()
+        stdout.write.side_effect = OSError("broken pipe")
+        with patch("sys.stdout", stdout):
+            writer = QueueWriter(PipelineStats())
+            writer.write("a\n")
+            with pytest.raises(OSError):
+                writer.flush()
+            with pytest.raises(OSError):
+                writer.close()
+
+    def test_output_routes_messages_through_writer(self):
+        writer = MagicMock()
+        output.set_writer(writer)
+        try:
+            output.write_state({"bookmarks": {}})
+        finally:
+            output.set_writer(None)
+        assert writer.write.call_args.args[0].startswith('{"type": "STATE"')
+        assert writer.write.call_args.kwargs == {"flush": True}
+
+    def test_queue_writer_feeds_buffered_writer(self, capsys):
+        writer = start_writer({"pipeline": True, "buffered_output": True}, PipelineStats())
+        assert isinstance(writer.downstream, output.BufferedWriter)
+        writer.write("a\n")
+        writer.write("b\n", flush=True)
+        writer.flush()
+        assert capsys.readouterr().out == "a\nb\n"
+        writer.close()
+
+    def test_start_writer_is_opt_in(self):
+        assert start_writer({}, PipelineStats()) is None
+        writer = start_writer({"pipeline": True, "pipeline_queue_size": 5}, PipelineStats())
+        assert writer._queue.maxsize == 5
+        writer.close()
+
+
+class TestStreamPipeline:
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_sync_prefetches_records_when_enabled(self, mock_write_record):
+        client = MagicMock()
+        client.config = {"pipeline": True, "pipeline_queue_size": 1}
+        client.pipeline_stats = PipelineStats()
+        client.get.side_effect = [
+            {"value": [{"id": "1"}], "@odata.nextLink": "https://graph.microsoft.com/v1.0/users?$skiptoken=x"},
+            {"value": [{"id": "2"}]},
+        ]
+        stream = Users(client, make_catalog_entry())
+        stream.is_selected = MagicMock(return_value=True)
+
+        count = stream.sync(state={}, transformer=MagicMock(transform=lambda record, *args: record))
+
+        assert count == 2
+        assert [c.args[1] for c in mock_write_record.call_args_list] == [{"id": "1"}, {"id": "2"}]
+        assert client.pipeline_stats.fetch.items == 2
+
+    @patch("tap_ms_graph.streams.abstracts.prefetch")
+    def test_child_records_are_not_prefetched(self, mock_prefetch):
+        client = MagicMock()
+        client.config = {"pipeline": True}
+        stream = Users(client, make_catalog_entry())
+        stream.current_parent = {"id": "g1"}
+
+        stream.iter_records()
+
+        mock_prefetch.assert_not_called()
+
+
+class TestStats:
+    def test_summary_reports_utilization(self):
+        stage = StageStats("transform")
+        stage.add(wall=10, waiting_input=5, waiting_output=1, items=7)
+        assert stage.summary() == (
+            "transform 40% busy, 50% waiting for input, 10% blocked downstream (7 items)"
+        )
+
+    @patch("tap_ms_graph.pipeline.LOGGER")
+    def test_emit_logs_and_resets(self, mock_logger):
+        stats = PipelineStats()
+        stats.fetch.add(wall=1)
+        stats.emit("users")
+        assert mock_logger.info.call_args.args[1] == "users"
+        assert stats.fetch.wall == 0
@@ -0,0 +1,62 @@
+"""Unit tests for tap_ms_graph/profiling.py and the --profile option"""
+import json
+import os
+import pstats
+import tracemalloc
+
+from unittest.mock import patch
+
+from tap_ms_graph import parse_args
+from tap_ms_graph.profiling import profile_stream
+
+
+class TestProfileStream:
+    def test_writes_cpu_and_memory_reports(self, tmp_path):
+        directory = str(tmp_path / "profiles")
+
+        with profile_stream(directory, "mail_messages"):
+            data = [str(i) * 10 for i in range(10000)]
+
+        files = sorted(os.listdir(directory))
+        assert files == [
+            "mail_messages.cpu.txt",
+            "mail_messages.end.tracemalloc",
+            "mail_messages.memory.txt",
+            "mail_messages.prof",
+            "mail_messages.start.tracemalloc",
+        ]
+        assert pstats.Stats(os.path.join(directory, "mail_messages.prof")).total_calls > 0
+        snapshot = tracemalloc.Snapshot.load(os.path.join(directory, "mail_messages.end.tracemalloc"))
+        assert snapshot.statistics("filename")
+        assert not tracemalloc.is_tracing()
+        assert data
+
+    def test_noop_without_directory(self, tmp_path):
+        with profile_stream(None, "users"):
+            pass
+        assert not tracemalloc.is_tracing()
+
+    def test_reports_are_written_when_sync_fails(self, tmp_path):
+        directory = str(tmp_path)
+        try:
+            with profile_stream(directory, "users"):
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+        assert os.path.exists(os.path.join(directory, "users.prof"))
+
+
+class TestParseArgs:
+    def test_profile_option_is_carried_into_config(self, tmp_path):
+        config_path = tmp_path / "config.json"
+        config_path.write_text(json.dumps({
+            "tenant_id": "t", "client_id": "c", "client_secret": "s",
+            "scope": "x", "start_date": "2024-01-01T00:00:00Z",
+        }))
+        argv = ["tap-ms-graph", "--config", str(config_path), "--profile", "profiles", "--discover"]
+
+        with patch("sys.argv", argv):
+            parsed_args = parse_args()
+
+        assert parsed_args.discover
+        assert parsed_args.config["profile_dir"] == "profiles"
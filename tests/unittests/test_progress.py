@@ -0,0 +1,102 @@
+"""Unit tests for tap_ms_graph/progress.py and its use in the streams"""
+from unittest.mock import MagicMock, patch
+
+from tap_ms_graph.exceptions import MsGraphBadRequestError
+from tap_ms_graph.progress import ProgressReporter, format_duration
+from tap_ms_graph.streams.chats import Chats
+from tap_ms_graph.streams.users import Users
+from helpers import make_catalog_entry
+
+
+def make_client(**config):
+    client = MagicMock()
+    client.base_url = "https://graph.microsoft.com/v1.0"
+    client.config = {"page_size": 100, "start_date": "2024-01-01T00:00:00Z", **config}
+    return client
+
+
+class TestProgressReporter:
+    def test_eta_from_parent_rate(self):
+        progress = ProgressReporter("users")
+        progress.set_total_parents(100)
+        progress.started -= 50
+        progress.parent_done(25)
+        assert round(progress.eta()) == 150
+
+    def test_eta_uses_expected_records_when_longer(self):
+        progress = ProgressReporter("users")
+        progress.set_total_parents(100)
+        progress.started -= 50
+        progress.parent_done(25)
+        progress.expect(1000)
+        progress.record(100)
+        assert round(progress.eta()) == 450
+
+    def test_eta_unknown_without_total(self):
+        progress = ProgressReporter("users")
+        progress.parent_done()
+        assert progress.eta() is None
+
+    @patch("tap_ms_graph.progress.LOGGER")
+    def test_reports_after_interval(self, mock_logger):
+        progress = ProgressReporter("users", interval=3600)
+        progress.set_total_parents(10)
+        progress.record(5)
+        mock_logger.info.assert_not_called()
+
+        progress._last_report -= 3600
+        progress.page()
+
+        line = mock_logger.info.call_args.args[3]
+        assert line.startswith("5 records (")
+        assert "1 pages, 0/10 parents, ETA unknown" in line
+
+    @patch("tap_ms_graph.progress.LOGGER")
+    def test_zero_interval_never_reports(self, mock_logger):
+        progress = ProgressReporter("users", interval=0)
+        progress.record(1000)
+        mock_logger.info.assert_not_called()
+
+    def test_format_duration(self):
+        assert format_duration(3725.9) == "01:02:05"
+
+
+class TestStreamProgress:
+    def test_get_count_uses_eventual_consistency(self):
+        client = make_client()
+        client.get.return_value = 1234
+        stream = Users(client, make_catalog_entry())
+
+        assert stream.get_count() == 1234
+        endpoint, params, headers = client.get.call_args.args
+        assert endpoint == "https://graph.microsoft.com/v1.0/users/$count"
+        assert headers == {"ConsistencyLevel": "eventual"}
+
+    def test_get_count_failure_returns_none(self):
+        client = make_client()
+        client.get.side_effect = MsGraphBadRequestError("unsupported")
+        assert Users(client, make_catalog_entry()).get_count() is None
+
+    def test_get_count_unsupported_stream(self):
+        client = make_client()
+        assert Chats(client, make_catalog_entry()).get_count() is None
+        client.get.assert_not_called()
+
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_sync_counts_records_pages_and_parents(self, mock_write_record):
+        client = make_client()
+        client.get.side_effect = [
+            {"value": [{"id": "1"}], "@odata.nextLink": "https://graph.microsoft.com/v1.0/users?$skiptoken=x"},
+            {"value": [{"id": "2"}]},
+        ]
+        stream = Users(client, make_catalog_entry())
+        stream.is_selected = MagicMock(return_value=True)
+        child = MagicMock()
+        stream.child_to_sync = [child]
+        progress = ProgressReporter("users", interval=0)
+        stream.set_progress(progress)
+
+        stream.sync(state={}, transformer=MagicMock(transform=lambda record, *args: record))
+
+        child.set_progress.assert_called_once_with(progress)
+        assert (progress.records, progress.pages, progress.parents_done) == (2, 2, 2)
@@ -0,0 +1,105 @@
+"""Unit tests for tap_ms_graph/request_memo.py"""
+import threading
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from tap_ms_graph.exceptions import MsGraphError
+from tap_ms_graph.request_memo import RequestMemo
+
+BASE_URL = "https://graph.microsoft.com/v1.0"
+MEMBERS = f"{BASE_URL}/teams/0b1e8c2c-7a0e-4a3c-9f0e-1c2d3e4f5a6b/members"
+COUNT = f"{BASE_URL}/users/$count"
+
+
+def make_memo(size=10, ttl=300):
+    return RequestMemo(size, ttl, BASE_URL)
+
+
+class TestRequestMemo:
+    def test_disabled_by_default(self):
+        memo = RequestMemo(base_url=BASE_URL)
+        send = MagicMock(return_value=5)
+        memo.fetch(COUNT, {}, {}, send)
+        memo.fetch(COUNT, {}, {}, send)
+        assert send.call_count == 2
+
+    def test_samples_are_reused_as_copies(self):
+        memo = make_memo()
+        send = MagicMock(return_value={"value": [{"id": "u1"}]})
+
+        first = memo.fetch(f"{BASE_URL}/users", {"$top": "1"}, {}, send)
+        first["value"][0]["team_id"] = "t1"
+        second = memo.fetch(f"{BASE_URL}/users", {"$top": "1"}, {}, send)
+
+        assert second == {"value": [{"id": "u1"}]}
+        assert send.call_count == 1
+        assert memo.hits == 1
+
+    def test_other_endpoints_and_pages_are_not_kept(self):
+        memo = make_memo()
+        send = MagicMock(return_value={"value": []})
+        for _ in range(2):
+            memo.fetch(f"{BASE_URL}/users", {"$top": 999}, {}, send)
+            memo.fetch(MEMBERS, {"$top": 999}, {}, send)
+            memo.fetch(f"{MEMBERS}?$skiptoken=abc", {}, {}, send)
+            memo.fetch(f"{BASE_URL}/users/delta", {"$top": "1"}, {}, send)
+        assert send.call_count == 8
+
+    def test_key_includes_params_and_headers(self):
+        memo = make_memo()
+        send = MagicMock(return_value=5)
+        memo.fetch(f"{BASE_URL}/users/$count", {}, {"ConsistencyLevel": "eventual"}, send)
+        memo.fetch(f"{BASE_URL}/users/$count", {}, {"ConsistencyLevel": "eventual", "Authorization": "x"}, send)
+        memo.fetch(f"{BASE_URL}/users/$count", {}, {}, send)
+        memo.fetch(COUNT, {"$filter": "a"}, {}, send)
+        memo.fetch(COUNT, {"$filter": "b"}, {}, send)
+        assert send.call_count == 4
+
+    def test_least_recently_used_entries_are_evicted(self):
+        memo = make_memo(size=2)
+        send = MagicMock(side_effect=lambda: {"value": []})
+        urls = [f"{BASE_URL}/groups/{group}/members/$count" for group in ("g1", "g2", "g3")]
+        memo.fetch(urls[0], {}, {}, send)
+        memo.fetch(urls[1], {}, {}, send)
+        memo.fetch(urls[0], {}, {}, send)
+        memo.fetch(urls[2], {}, {}, send)
+
+        memo.fetch(urls[0], {}, {}, send)
+        assert send.call_count == 3
+        memo.fetch(urls[1], {}, {}, send)
+        assert send.call_count == 4
+
+    def test_entries_expire(self):
+        memo = make_memo(ttl=60)
+        send = MagicMock(return_value={"value": []})
+        memo.fetch(COUNT, {}, {}, send)
+        with patch("tap_ms_graph.request_memo.time.monotonic", return_value=10 ** 9):
+            memo.fetch(COUNT, {}, {}, send)
+        assert send.call_count == 2
+
+    def test_identical_requests_in_flight_are_coalesced(self):
+        memo = make_memo(size=0)
+        release = threading.Event()
+        send = MagicMock(side_effect=lambda: release.wait() and {"value": [{"id": "u1"}]})
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(memo.fetch(f"{BASE_URL}/users", {}, {}, send)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while memo.coalesced < 3:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert send.call_count == 1
+        assert results == [{"value": [{"id": "u1"}]}] * 4
+        assert len({id(result) for result in results}) == 4
+
+    def test_errors_are_not_kept(self):
+        memo = make_memo()
+        send = MagicMock(side_effect=[MsGraphError("boom"), {"value": []}])
+        with pytest.raises(MsGraphError):
+            memo.fetch(COUNT, {}, {}, send)
+        assert memo.fetch(COUNT, {}, {}, send) == {"value": []}
@@ -0,0 +1,114 @@
+"""Unit tests for tap_ms_graph/response_cache.py and conditional pages"""
+import json
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from tap_ms_graph.client import Client
+from tap_ms_graph.exceptions import MsGraphError
+from tap_ms_graph.response_cache import ResponseCache, open_response_cache
+from tap_ms_graph.streams.directory_role_templates import DirectoryRoleTemplates
+from helpers import make_catalog_entry
+
+URL = "https://graph.microsoft.com/v1.0/directoryRoleTemplates"
+
+
+def make_response(status_code, body=None, etag=None):
+    content = json.dumps(body).encode() if body is not None else b""
+    response = MagicMock(status_code=status_code, content=content, headers={"ETag": etag} if etag else {})
+    response.json.return_value = body
+    return response
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "responses.db"))
+
+
+class TestResponseCache:
+    def test_pages_are_only_saved_on_commit(self, cache):
+        assert not cache.put(URL, b'{"value": []}', None)
+        assert not cache.put(URL, b'{"value": []}', None)
+        cache.commit()
+        assert cache.put(URL, b'{"value": []}', None)
+        assert not cache.put(URL, b'{"value": [1]}', None)
+
+    def test_bodies_are_only_stored_with_an_etag(self, cache):
+        cache.put(URL, b"a", None)
+        cache.put(f"{URL}?$top=1", b"b", '"v1"')
+        cache.commit()
+        assert cache.get(URL)[2] is None
+        etag, _, body = cache.get(f"{URL}?$top=1")
+        assert (etag, body) == ('"v1"', b"b")
+
+    def test_least_recently_used_pages_are_evicted(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / "responses.db"), max_bytes=250)
+        for now, page in enumerate(("a", "b", "c")):
+            cache.put(f"{URL}/{page}", b"x", None)
+            with patch("tap_ms_graph.response_cache.time.time", return_value=now):
+                cache.commit()
+        assert cache.get(f"{URL}/a") is None
+        assert cache.get(f"{URL}/c") is not None
+
+    def test_open_response_cache_is_opt_in(self, tmp_path):
+        assert open_response_cache({}) is None
+        cache = open_response_cache({"response_cache": str(tmp_path / "r.db"), "response_cache_max_bytes": 10})
+        assert cache.max_bytes == 10
+
+
+class TestConditionalRequests:
+    @pytest.fixture
+    def config(self, tmp_path):
+        return {"client_id": "id", "client_secret": "secret", "tenant_id": "tenant", "scope": "scope",
+                "response_cache": str(tmp_path / "responses.db")}
+
+    @patch("requests.Session.request")
+    def test_etag_is_sent_back_and_304_served_from_cache(self, mock_request, config):
+        token = make_response(200, {"access_token": "token", "expires_in": 3600})
+        page = {"value": [{"id": "r1"}]}
+        mock_request.side_effect = [token, make_response(200, page, etag='"v1"'), make_response(304)]
+
+        with Client(config) as client:
+            assert client.get_conditional(URL, {}, {}) == (page, False)
+            client.response_cache.commit()
+            assert client.get_conditional(URL, {}, {}) == (page, True)
+
+        assert mock_request.call_args.kwargs["headers"]["If-None-Match"] == '"v1"'
+
+    @patch("requests.Session.request")
+    def test_unchanged_body_without_etag(self, mock_request, config):
+        token = make_response(200, {"access_token": "token", "expires_in": 3600})
+        page = {"value": [{"id": "r1"}]}
+        mock_request.side_effect = [token, make_response(200, page), make_response(200, page)]
+
+        with Client(config) as client:
+            client.get_conditional(URL, {}, {})
+            client.response_cache.commit()
+            assert client.get_conditional(URL, {}, {}) == (page, True)
+
+        assert "If-None-Match" not in mock_request.call_args.kwargs["headers"]
+
+
+    @patch("requests.Session.request")
+    def test_304_is_an_error_outside_conditional_requests(self, mock_request, config):
+        token = make_response(200, {"access_token": "token", "expires_in": 3600})
+        mock_request.side_effect = [token, make_response(304, {})]
+
+        with Client(config) as client:
+            with pytest.raises(MsGraphError):
+                client.get(URL, {}, {})
+
+
+class TestStreamConditionalPages:
+    @pytest.mark.parametrize("unchanged, written", [(True, 0), (False, 1)])
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_unchanged_pages_are_not_emitted(self, mock_write_record, unchanged, written):
+        client = MagicMock()
+        client.base_url = "https://graph.microsoft.com/v1.0"
+        client.config = {"response_cache": "responses.db"}
+        client.get_conditional.return_value = ({"value": [{"id": "r1"}]}, unchanged)
+        stream = DirectoryRoleTemplates(client, make_catalog_entry())
+        stream.is_selected = MagicMock(return_value=True)
+
+        assert stream.sync(state={}, transformer=MagicMock(transform=lambda r, *a: r)) == written
+        client.get.assert_not_called()
@@ -0,0 +1,81 @@
+"""Unit tests for tap_ms_graph/sharding.py"""
+import json
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from tap_ms_graph import parse_args
+from tap_ms_graph.sharding import merge_state_main, merge_states, parse_shard, read_state, shard_of
+from tap_ms_graph.streams.users import Users
+from helpers import make_catalog_entry
+
+
+class TestParseShard:
+    def test_parses_index_and_count(self):
+        assert parse_shard("1/4") == (1, 4)
+        assert parse_shard(None) is None
+
+    @pytest.mark.parametrize("value", ["4/4", "-1/2", "1", "a/b", "0/0"])
+    def test_rejects_invalid_shards(self, value):
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+    def test_cli_option_is_carried_into_config(self, tmp_path):
+        config_path = tmp_path / "config.json"
+        config_path.write_text(json.dumps({
+            "tenant_id": "t", "client_id": "c", "client_secret": "s",
+            "scope": "x", "start_date": "2024-01-01T00:00:00Z",
+        }))
+        argv = ["tap-ms-graph", "--config", str(config_path), "--shard", "2/3", "--discover"]
+
+        with patch("sys.argv", argv):
+            parsed_args = parse_args()
+
+        assert parsed_args.config["shard"] == "2/3"
+
+
+class TestShardedSync:
+    def test_shards_partition_parents_and_their_children(self):
+        ids = [f"user-{i}" for i in range(50)]
+        synced = []
+        for index in range(3):
+            client = MagicMock()
+            client.config = {"shard": f"{index}/3"}
+            client.get.return_value = {"value": [{"id": i} for i in ids]}
+            stream = Users(client, make_catalog_entry())
+            stream.is_selected = MagicMock(return_value=False)
+            child = MagicMock()
+            stream.child_to_sync = [child]
+
+            stream.sync(state={}, transformer=MagicMock())
+
+            parents = [c.kwargs["parent_obj"]["id"] for c in child.sync.call_args_list]
+            assert all(shard_of(parent, 3) == index for parent in parents)
+            synced.extend(parents)
+        assert sorted(synced) == sorted(ids)
+
+
+class TestMergeStates:
+    def test_keeps_earliest_bookmark_and_resumes_interrupted_shard(self):
+        merged = merge_states([
+            {"bookmarks": {"users": {"updated": "2024-02-01"}, "groups": {"updated": "2024-01-05"}}},
+            {"bookmarks": {"users": {"updated": "2024-01-01"}}, "currently_syncing": "users"},
+        ])
+        assert merged == {
+            "bookmarks": {"users": {"updated": "2024-01-01"}, "groups": {"updated": "2024-01-05"}},
+            "currently_syncing": "users",
+        }
+
+    def test_merge_command_reads_state_files_and_tap_output(self, tmp_path, capsys):
+        state_file = tmp_path / "shard-0.json"
+        state_file.write_text(json.dumps({"bookmarks": {"users": {"updated": "2024-02-01"}}}))
+        output_file = tmp_path / "shard-1.json"
+        output_file.write_text("\n".join([
+            json.dumps({"type": "RECORD", "stream": "users", "record": {"id": "1"}}),
+            json.dumps({"type": "STATE", "value": {"bookmarks": {"users": {"updated": "2024-01-01"}}}}),
+        ]))
+        assert read_state(str(output_file)) == {"bookmarks": {"users": {"updated": "2024-01-01"}}}
+
+        merge_state_main([str(state_file), str(output_file)])
+
+        assert json.loads(capsys.readouterr().out) == {"bookmarks": {"users": {"updated": "2024-01-01"}}}
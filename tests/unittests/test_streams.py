@@ -249,6 +249,43 @@ class TestGetRecords:
         client.get.assert_called_once()  # no retry after 404
 
 
+    def test_stream_pages_uses_streaming_parser(self):
+        """With stream_pages enabled, records and nextLink come from the
+        incremental page parser instead of client.get."""
+        next_link = "https://graph.microsoft.com/v1.0/users?$skiptoken=xyz"
+        client = make_client()
+        client.config["stream_pages"] = True
+        first, second = MagicMock(), MagicMock()
+        first.__iter__.return_value = iter([{"id": "1"}])
+        first.properties = {"@odata.nextLink": next_link}
+        second.__iter__.return_value = iter([{"id": "2"}])
+        second.properties = {}
+        client.get_page_stream.side_effect = [first, second]
+
+        stream = Users(client, make_catalog_entry())
+        stream.update_params()
+        records = list(stream.get_records())
+
+        assert [r["id"] for r in records] == ["1", "2"]
+        client.get.assert_not_called()
+        assert client.get_page_stream.call_args_list[1][0][0] == next_link
+        assert client.get_page_stream.call_args_list[1][0][1] == {}
+
+    def test_stream_pages_reads_parent_pages_fully(self):
+        """Pages of a stream with children to sync are not streamed, so the
+        response is not held open while the children are synced."""
+        client = make_client()
+        client.config["stream_pages"] = True
+        client.get.return_value = {"value": [{"id": "1"}]}
+
+        stream = Users(client, make_catalog_entry())
+        stream.child_to_sync = [MagicMock()]
+        stream.update_params()
+
+        assert list(stream.get_records()) == [{"id": "1"}]
+        client.get_page_stream.assert_not_called()
+
+
 # ---------------------------------------------------------------------------
 # Tests: BaseStream.update_params
 # ---------------------------------------------------------------------------
@@ -536,3 +573,208 @@ class TestChildStreamUrlEndpoint:
         record = {"id": "member-1"}
         modified = stream.modify_object(record, parent_record={"id": "grp-99"})
         assert modified["group_id"] == "grp-99"
+
+
+class TestTransitiveGroupMembers:
+    def make_stream(self, **config):
+        client = make_client()
+        client.config.update(group_member_mode="transitive", **config)
+        stream = GroupMember(client, make_catalog_entry(key_properties=["id", "group_id"]))
+        stream.is_selected = MagicMock(return_value=True)
+        return stream
+
+    def test_transitive_members_select_ids(self):
+        stream = self.make_stream()
+        stream.client.get.return_value = {"value": [{"id": "u1"}]}
+
+        stream.sync(state={}, transformer=MagicMock(transform=lambda r, *a: r), parent_obj={"id": "g1"})
+
+        url, params = stream.client.get.call_args.args[:2]
+        assert url.endswith("/groups/g1/transitiveMembers")
+        assert params["$select"] == "id"
+
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_depth_uses_memoized_direct_members(self, mock_write_record):
+        group = "#microsoft.graph.group"
+        members = {
+            "g1": [{"id": "u1"}, {"id": "shared", "@odata.type": group}],
+            "g2": [{"id": "shared", "@odata.type": group}, {"id": "u1"}],
+            "shared": [{"id": "u2"}, {"id": "g1", "@odata.type": group}],
+        }
+        stream = self.make_stream(group_member_depth=True)
+
+        def respond(url, *args, **kwargs):
+            if url.endswith("/members/microsoft.graph.group"):
+                group_id = url.split("/")[-3]
+                return {"value": [m for m in members[group_id] if m.get("@odata.type") == group][:1]}
+            return {"value": members[url.split("/")[-2]]}
+
+        stream.client.get.side_effect = respond
+        transformer = MagicMock(transform=lambda r, *a: r)
+
+        stream.sync(state={}, transformer=transformer, parent_obj={"id": "g1"})
+        stream.sync(state={}, transformer=transformer, parent_obj={"id": "g2"})
+
+        written = [(c.args[1]["group_id"], c.args[1]["id"], c.args[1]["membership_depth"])
+                   for c in mock_write_record.call_args_list]
+        assert written == [
+            ("g1", "u1", 1), ("g1", "shared", 1), ("g1", "u2", 2),
+            ("g2", "shared", 1), ("g2", "u1", 1), ("g2", "u2", 2), ("g2", "g1", 2),
+        ]
+        # g1 and g2 are each checked for subgroups; shared and g1 are listed once.
+        assert stream.client.get.call_count == 5
+
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_depth_of_groups_without_subgroups_is_read_from_transitive_members(self, mock_write_record):
+        stream = self.make_stream(group_member_depth=True)
+        stream.client.get.side_effect = [{"value": []}, {"value": [{"id": "u1"}, {"id": "u2"}]}]
+
+        stream.sync(state={}, transformer=MagicMock(transform=lambda r, *a: r), parent_obj={"id": "g1"})
+
+        urls = [c.args[0] for c in stream.client.get.call_args_list]
+        assert urls[0].endswith("/groups/g1/members/microsoft.graph.group")
+        assert urls[1].endswith("/groups/g1/transitiveMembers")
+        assert [(c.args[1]["id"], c.args[1]["membership_depth"]) for c in mock_write_record.call_args_list] == [
+            ("u1", 1), ("u2", 1)]
+
+    def test_direct_members_memo_is_bounded(self):
+        stream = self.make_stream(group_member_depth=True, group_member_memo_size=2)
+        stream.client.get.return_value = {"value": [{"id": "u1"}]}
+
+        for group_id in ("g1", "g2", "g1", "g3"):
+            stream.get_direct_members(group_id)
+
+        assert list(stream._direct_members) == ["g1", "g3"]
+        assert stream.client.get.call_count == 3
+
+
+# ---------------------------------------------------------------------------
+# Tests: passthrough mode
+# ---------------------------------------------------------------------------
+
+DATED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": ["null", "string"]},
+        "createdDateTime": {"type": ["null", "string"], "format": "date-time"},
+    },
+}
+
+
+class TestPassthrough:
+    def make_stream(self, passthrough_streams=("applications",), entry=None):
+        from tap_ms_graph.streams.applications import Applications
+        client = make_client()
+        client.config["passthrough_streams"] = list(passthrough_streams)
+        client.config["passthrough_sample_interval"] = 2
+        return Applications(client, entry or make_catalog_entry(DATED_SCHEMA))
+
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_records_are_written_as_returned_and_sampled(self, mock_write_record):
+        stream = self.make_stream()
+        stream.client.get.return_value = {"value": [
+            {"id": str(i), "createdDateTime": "2024-01-01T00:00:00Z", "@odata.type": "#microsoft.graph.application"}
+            for i in range(3)
+        ]}
+        transformer = MagicMock()
+
+        assert stream.sync(state={}, transformer=transformer) == 3
+
+        assert mock_write_record.call_args_list[0].args == (
+            "applications", {"id": "0", "createdDateTime": "2024-01-01T00:00:00Z"})
+        assert transformer.transform.call_count == 2
+
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_sampled_records_are_validated(self, mock_write_record):
+        from singer import Transformer
+        from singer.transform import SchemaMismatch
+        stream = self.make_stream()
+        stream.client.get.return_value = {"value": [{"id": "1", "createdDateTime": "not a date"}]}
+
+        with pytest.raises(SchemaMismatch):
+            with Transformer() as transformer:
+                stream.sync(state={}, transformer=transformer)
+
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    @patch("tap_ms_graph.streams.abstracts.write_record_json")
+    def test_streamed_records_are_written_as_received(self, mock_write_record_json, mock_write_record):
+        from tap_ms_graph.json_stream import StreamingPage
+        stream = self.make_stream()
+        stream.client.config["stream_pages"] = True
+        body = ('{"value":[{"id":"0","createdDateTime":"2024-01-01T00:00:00Z"},'
+                '{"id":"1","@odata.type":"#microsoft.graph.application"}]}')
+        stream.client.get_page_stream.return_value = StreamingPage([body.encode()], "value")
+
+        assert stream.sync(state={}, transformer=MagicMock()) == 2
+
+        mock_write_record_json.assert_called_once_with(
+            "applications", '{"id":"0","createdDateTime":"2024-01-01T00:00:00Z"}')
+        mock_write_record.assert_called_once_with("applications", {"id": "1"})
+
+    def test_requires_opt_in_and_support(self):
+        assert not self.make_stream(passthrough_streams=()).use_passthrough()
+        assert self.make_stream().use_passthrough()
+        users = Users(make_client(), make_catalog_entry())
+        users.client.config["passthrough_streams"] = ["users"]
+        assert not users.use_passthrough()
+
+    def test_deselected_fields_disable_passthrough(self):
+        entry = make_catalog_entry(DATED_SCHEMA)
+        mdata = singer_metadata.to_map(entry.metadata)
+        mdata = singer_metadata.write(mdata, ("properties", "createdDateTime"), "selected", False)
+        entry.metadata = singer_metadata.to_list(mdata)
+        assert not self.make_stream(entry=entry).use_passthrough()
+
+
+# ---------------------------------------------------------------------------
+# Tests: parent_filters
+# ---------------------------------------------------------------------------
+
+class TestParentFilter:
+    FILTER = "accountEnabled eq true"
+
+    def make_users(self, selected):
+        client = make_client()
+        client.config["parent_filters"] = {"users": self.FILTER}
+        stream = Users(client, make_catalog_entry(selected=selected))
+        stream.child_to_sync = [MagicMock()]
+        return stream
+
+    def test_filter_is_applied_to_listing_when_only_children_are_synced(self):
+        stream = self.make_users(selected=False)
+        stream.apply_parent_filter()
+        stream.client.get.return_value = {"value": [{"id": "u1"}]}
+
+        from singer import Transformer
+        with Transformer() as transformer:
+            stream.sync(state={}, transformer=transformer)
+
+        args = stream.client.get.call_args.args
+        assert args[1]["$filter"] == self.FILTER
+        assert args[2]["ConsistencyLevel"] == "eventual"
+        assert stream.child_to_sync[0].sync.call_count == 1
+
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_selected_parent_stays_unfiltered(self, mock_write_record):
+        stream = self.make_users(selected=True)
+        stream.client.get.side_effect = [
+            {"value": [{"id": "u1"}]},
+            {"value": [{"id": "u1"}, {"id": "guest"}]},
+        ]
+        stream.apply_parent_filter()
+
+        from singer import Transformer
+        with Transformer() as transformer:
+            stream.sync(state={}, transformer=transformer)
+
+        id_listing, listing = stream.client.get.call_args_list
+        assert id_listing.args[1]["$select"] == "id"
+        assert "$filter" not in listing.args[1]
+        assert mock_write_record.call_count == 2
+        assert [c.kwargs["parent_obj"]["id"] for c in stream.child_to_sync[0].sync.call_args_list] == ["u1"]
+        assert stream.get_count() == 1
+
+    def test_no_filter_without_children(self):
+        stream = self.make_users(selected=True)
+        stream.child_to_sync = []
+        assert stream.get_parent_filter() is None
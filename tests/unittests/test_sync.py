@@ -32,10 +32,10 @@ def make_mock_catalog(stream_names):
     return catalog
 
 
-def _run_sync(streams_map, selected_streams, state=None):
+def _run_sync(streams_map, selected_streams, state=None, config=None, client=None, write_state=None):
     """Helper: call sync() with patched STREAMS and singer.Transformer."""
-    client = MagicMock()
-    config = {"start_date": "2024-01-01T00:00:00Z"}
+    client = client or MagicMock()
+    config = {"start_date": "2024-01-01T00:00:00Z", **(config or {})}
     catalog = make_mock_catalog(selected_streams)
     state = state or {}
 
@@ -43,7 +43,7 @@ def _run_sync(streams_map, selected_streams, state=None):
          patch("tap_ms_graph.sync.write_schema"), \
          patch("singer.get_currently_syncing", return_value=None), \
          patch("singer.set_currently_syncing"), \
-         patch("singer.write_state"):
+         patch("tap_ms_graph.sync.write_state", write_state or MagicMock()):
         mock_tx = MagicMock()
         with patch("singer.Transformer") as mock_cls:
             mock_cls.return_value.__enter__ = MagicMock(return_value=mock_tx)
@@ -58,7 +58,7 @@ def _run_sync(streams_map, selected_streams, state=None):
 # ---------------------------------------------------------------------------
 
 class TestUpdateCurrentlySyncing:
-    @patch("singer.write_state")
+    @patch("tap_ms_graph.sync.write_state")
     @patch("singer.set_currently_syncing")
     @patch("singer.get_currently_syncing", return_value=None)
     def test_sets_current_stream(self, mock_get, mock_set, mock_write):
@@ -67,7 +67,7 @@ class TestUpdateCurrentlySyncing:
         mock_set.assert_called_once_with(state, "users")
         mock_write.assert_called_once_with(state)
 
-    @patch("singer.write_state")
+    @patch("tap_ms_graph.sync.write_state")
     @patch("singer.set_currently_syncing")
     @patch("singer.get_currently_syncing", return_value="users")
     def test_clears_currently_syncing_when_none(self, mock_get, mock_set, mock_write):
@@ -76,7 +76,7 @@ class TestUpdateCurrentlySyncing:
         assert "currently_syncing" not in state
         mock_write.assert_called_once_with(state)
 
-    @patch("singer.write_state")
+    @patch("tap_ms_graph.sync.write_state")
     @patch("singer.set_currently_syncing")
     @patch("singer.get_currently_syncing", return_value=None)
     def test_no_error_when_not_currently_syncing(self, mock_get, mock_set, mock_write):
@@ -207,7 +207,7 @@ class TestSync:
             _run_sync(streams_map, ["users", "groups"])
         mock_users.sync.assert_called_once()
 
-    @patch("singer.write_state")
+    @patch("tap_ms_graph.sync.write_state")
     @patch("singer.set_currently_syncing")
     @patch("singer.get_currently_syncing", return_value=None)
     def test_updates_currently_syncing_before_and_after(
@@ -265,3 +265,25 @@ class TestSync:
         with pytest.raises(MsGraphBackoffError):
             _run_sync(streams_map, ["s1", "s2", "s3"])
         mock_s1.sync.assert_called_once()
+
+    def test_response_cache_is_committed_after_the_state(self, tmp_path):
+        """Pages are only remembered once the stream's records and STATE are out."""
+        events = []
+        client = MagicMock()
+        client.response_cache.commit.side_effect = lambda: events.append("commit")
+        streams_map = {"applications": MagicMock(return_value=make_mock_stream())}
+
+        _run_sync(streams_map, ["applications"], config={"response_cache": str(tmp_path / "r.db")},
+                  client=client, write_state=MagicMock(side_effect=lambda state: events.append("state")))
+
+        assert events == ["state", "state", "commit"]
+
+    @pytest.mark.parametrize("interval, expected", [(None, 60.0), (0, 0.0), ("30", 30.0)])
+    def test_progress_interval_defaults_when_null(self, interval, expected):
+        """A null `progress_interval` uses the default; 0 still disables progress lines."""
+        stream = make_mock_stream()
+        with patch("tap_ms_graph.sync.ProgressReporter") as mock_reporter:
+            _run_sync({"users": MagicMock(return_value=stream)}, ["users"],
+                      config={"progress_interval": interval})
+
+        assert mock_reporter.call_args.args == ("users", expected)
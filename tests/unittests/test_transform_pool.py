@@ -0,0 +1,89 @@
+"""Unit tests for tap_ms_graph/transform_pool.py"""
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from singer import Transformer
+from singer import metadata as singer_metadata
+from singer.messages import RecordMessage
+
+from tap_ms_graph import output
+from tap_ms_graph.codec import JsonCodec
+from tap_ms_graph.pipeline import PipelineStats
+from tap_ms_graph.streams.group_member import GroupMember
+from tap_ms_graph.transform_pool import TransformPool, start_transform_pool
+from helpers import make_catalog_entry
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": ["null", "string"]},
+        "group_id": {"type": ["null", "string"]},
+        "createdDateTime": {"type": ["null", "string"], "format": "date-time"},
+    },
+}
+
+
+@pytest.fixture
+def pool():
+    pool = TransformPool(1, JsonCodec.name, chunk_size=2, max_pending=1)
+    output.set_transform_pool(pool)
+    yield pool
+    output.set_transform_pool(None)
+    pool.close()
+
+
+def read_messages(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+class TestTransformPool:
+    def test_records_are_transformed_in_order_before_state(self, capsys, pool):
+        mdata = singer_metadata.to_map(make_catalog_entry(SCHEMA).metadata)
+        for i in range(5):
+            pool.submit("users", {"id": str(i), "createdDateTime": "2024-01-01T00:00:00Z"}, SCHEMA, mdata)
+        output.write_state({"bookmarks": {}})
+
+        messages = read_messages(capsys)
+        assert [m["record"]["id"] for m in messages[:-1]] == ["0", "1", "2", "3", "4"]
+        assert messages[0]["record"]["createdDateTime"] == "2024-01-01T00:00:00.000000Z"
+        assert messages[-1]["type"] == "STATE"
+
+    def test_output_matches_inline_transform(self, capsys, pool):
+        record = {"id": "1", "createdDateTime": "2024-01-01T00:00:00Z"}
+        mdata = singer_metadata.to_map(make_catalog_entry(SCHEMA).metadata)
+        pool.submit("users", dict(record), SCHEMA, mdata)
+        pool.drain()
+        pooled = capsys.readouterr().out
+
+        with Transformer() as transformer:
+            output.write_message(RecordMessage("users", transformer.transform(record, SCHEMA, mdata)))
+        assert pooled == capsys.readouterr().out
+
+    def test_start_transform_pool_is_opt_in(self):
+        assert start_transform_pool({}, JsonCodec()) is None
+        pool = start_transform_pool({"transform_processes": 1, "transform_chunk_size": 10}, JsonCodec())
+        try:
+            assert pool.chunk_size == 10
+        finally:
+            pool.close()
+
+
+class TestStreamTransformPool:
+    def test_full_table_sync_submits_modified_records(self, capsys, pool):
+        client = MagicMock()
+        client.config = {}
+        client.base_url = "https://graph.microsoft.com/v1.0"
+        client.pipeline_stats = PipelineStats()
+        client.get.return_value = {"value": [{"id": "1"}, {"id": "2"}, {"id": "3"}]}
+        stream = GroupMember(client, make_catalog_entry(SCHEMA))
+        stream.is_selected = MagicMock(return_value=True)
+        transformer = MagicMock()
+
+        count = stream.sync(state={}, transformer=transformer, parent_obj={"id": "g1"})
+        pool.drain()
+
+        assert count == 3
+        transformer.transform.assert_not_called()
+        records = [m["record"] for m in read_messages(capsys)]
+        assert records == [{"id": str(i), "group_id": "g1"} for i in (1, 2, 3)]
@@ -0,0 +1,150 @@
+"""Unit tests for tap_ms_graph/windows.py and date-window splitting in the streams"""
+import json
+from datetime import datetime, timezone
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from tap_ms_graph.codec import JsonCodec
+from tap_ms_graph.exceptions import MsGraphError
+from tap_ms_graph.streams.mail_messages import MailMessages
+from tap_ms_graph.windows import merge_windows, split_windows, window_filter
+from helpers import make_catalog_entry
+
+
+def make_stream(**config):
+    client = MagicMock()
+    client.config = {"start_date": "2024-01-01T00:00:00Z", **config}
+    client.base_url = "https://graph.microsoft.com/v1.0"
+    client.codec = JsonCodec()
+    stream = MailMessages(client, make_catalog_entry())
+    stream.is_selected = MagicMock(return_value=True)
+    return stream
+
+
+class TestSplitWindows:
+    def test_windows_cover_all_time(self):
+        windows = split_windows("2024-01-01T00:00:00Z", 4, end=datetime(2024, 1, 5, tzinfo=timezone.utc))
+        assert windows == [
+            (None, "2024-01-02T00:00:00.000000Z"),
+            ("2024-01-02T00:00:00.000000Z", "2024-01-03T00:00:00.000000Z"),
+            ("2024-01-03T00:00:00.000000Z", "2024-01-04T00:00:00.000000Z"),
+            ("2024-01-04T00:00:00.000000Z", None),
+        ]
+
+    def test_single_window_when_not_split(self):
+        assert split_windows("2024-01-01T00:00:00Z", 1) == [(None, None)]
+        assert split_windows("2030-01-01T00:00:00Z", 4, end=datetime(2024, 1, 1, tzinfo=timezone.utc)) == [(None, None)]
+
+    def test_window_filter(self):
+        assert window_filter("receivedDateTime", ("a", "b")) == "receivedDateTime ge a and receivedDateTime lt b"
+        assert window_filter("receivedDateTime", (None, "b")) == "receivedDateTime lt b"
+        assert window_filter("receivedDateTime", (None, None)) == ""
+
+
+class TestMergeWindows:
+    def test_yields_records_of_all_windows(self):
+        windows = {("a", "b"): iter(range(0, 50)), ("b", "c"): iter(range(50, 100)), ("c", None): iter([])}
+        assert sorted(merge_windows(windows, concurrency=2, size=5)) == list(range(100))
+
+    def test_errors_are_reraised(self):
+        def failing():
+            yield 1
+            raise MsGraphError("boom")
+
+        with pytest.raises(MsGraphError):
+            list(merge_windows({("a", None): failing()}))
+
+
+class TestStreamWindows:
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_large_mailbox_is_split(self, mock_write_record):
+        stream = make_stream(split_threshold=10, split_max_windows=3)
+
+        def respond(url, params, headers, path=None, tag=None):
+            if url.endswith("/$count"):
+                return 25
+            return {"value": [{"id": params["$filter"]}]}
+        stream.client.get.side_effect = respond
+
+        count = stream.sync({}, MagicMock(transform=lambda r, *a: r), {"id": "u1"})
+
+        assert count == 3
+        filters = sorted(call.args[1]["id"] for call in mock_write_record.call_args_list)
+        assert filters[0].startswith("receivedDateTime ge ")
+        assert " and receivedDateTime lt " in filters[0]
+        assert filters[2].startswith("receivedDateTime lt ")
+
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_small_mailbox_is_not_split(self, mock_write_record):
+        stream = make_stream(split_threshold=10)
+        stream.client.get.side_effect = lambda url, params, *args, **kwargs: (
+            5 if url.endswith("/$count") else {"value": [{"id": "m1"}]})
+
+        assert stream.sync({}, MagicMock(transform=lambda r, *a: r), {"id": "u1"}) == 1
+        assert "$filter" not in stream.client.get.call_args.args[1]
+
+    def test_precheck_total_replaces_count_request(self):
+        stream = make_stream(split_threshold=10)
+        stream._mailbox_totals["u1"] = 100
+        assert len(stream.plan_windows({"id": "u1"})) == 10
+        stream.client.get.assert_not_called()
+
+    def test_disabled_without_threshold(self):
+        stream = make_stream()
+        assert stream.plan_windows({"id": "u1"}) is None
+        stream.client.get.assert_not_called()
+
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_windows_are_paged_by_get_records(self, mock_write_record):
+        stream = make_stream(split_threshold=10, split_max_windows=2)
+        stream._mailbox_totals["u1"] = 25
+
+        def respond(url, params, headers, path=None, tag=None):
+            if params:
+                return {"value": [{"id": "first"}], "@odata.nextLink": f"{url}?page=2&{params['$filter']}"}
+            return {"value": [{"id": "second"}]}
+        stream.client.get.side_effect = respond
+
+        assert stream.sync({}, MagicMock(transform=lambda r, *a: r), {"id": "u1"}) == 4
+        assert stream.progress.pages == 4
+        # The stream itself keeps the parent's endpoint and params.
+        assert stream.url_endpoint.endswith("/users/u1/messages")
+        assert "$filter" not in stream.params
+
+    def test_mailbox_sizes_come_from_batched_requests(self):
+        stream = make_stream(split_threshold=10)
+        stream.client.post.return_value = {"responses": [
+            # Most messages of u1 are in subfolders, which the folder counts leave out.
+            {"id": "0-folders", "status": 200, "body": {"value": [{"totalItemCount": 5}]}},
+            {"id": "0-oldest", "status": 200, "body": {
+                "@odata.count": 30, "value": [{"receivedDateTime": "2015-03-01T00:00:00Z"}]}},
+            {"id": "1-folders", "status": 200, "body": {"value": [{"totalItemCount": 2}]}},
+            {"id": "1-oldest", "status": 200, "body": {"value": [{"receivedDateTime": "2023-01-01T00:00:00Z"}]}},
+        ]}
+
+        stream.prepare_parents([{"id": "u1"}, {"id": "u2"}], {})
+
+        assert stream.client.post.call_count == 1
+        assert "$count=true" in json.loads(stream.client.post.call_args.args[3])["requests"][1]["url"]
+        assert stream.plan_windows({"id": "u2"}) is None
+        windows = stream.plan_windows({"id": "u1"})
+        assert len(windows) == 3
+        # Split from the oldest message, not `start_date`.
+        assert windows[0][1] < "2024-01-01"
+        stream.client.get.assert_not_called()
+        assert not (stream._mailbox_totals or stream._mailbox_oldest or stream._pending_fingerprints)
+
+    def test_folder_counts_near_the_threshold_are_counted(self):
+        stream = make_stream(split_threshold=10)
+        stream.client.post.return_value = {"responses": [
+            {"id": "0-folders", "status": 200, "body": {"value": [{"totalItemCount": 8}]}},
+            {"id": "0-oldest", "status": 200, "body": {"value": []}},
+        ]}
+        stream.client.get.return_value = 25
+
+        stream.prepare_parents([{"id": "u1"}], {})
+        stream.url_endpoint = stream.get_url_endpoint({"id": "u1"})
+
+        assert len(stream.plan_windows({"id": "u1"})) == 3
+        assert stream.client.get.call_args.args[0].endswith("/users/u1/messages/$count")
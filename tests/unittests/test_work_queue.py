@@ -0,0 +1,130 @@
+"""Unit tests for tap_ms_graph/work_queue.py"""
+import itertools
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from tap_ms_graph.streams.users import Users
+from tap_ms_graph.work_queue import WorkQueue, WorkQueueTimeout, open_work_queue, sync_from_queue
+from helpers import make_catalog_entry
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / "queue.db")
+
+
+class TestWorkQueue:
+    def test_parents_are_claimed_once(self, queue_path):
+        coordinator = WorkQueue(queue_path)
+        coordinator.add("users", [{"id": "1"}, {"id": "2"}, {"id": "1"}])
+        first, second = WorkQueue(queue_path), WorkQueue(queue_path)
+
+        claimed = first.claim("users", "w1") + second.claim("users", "w2") + second.claim("users", "w2")
+
+        assert sorted(parent["id"] for parent in claimed) == ["1", "2"]
+        assert coordinator.counts("users") == {"leased": 2}
+
+    def test_expired_leases_are_claimed_again(self, queue_path):
+        work_queue = WorkQueue(queue_path, lease_seconds=-1)
+        work_queue.add("users", [{"id": "1"}])
+
+        assert work_queue.claim("users", "crashed") == [{"id": "1"}]
+        assert work_queue.claim("users", "w2") == [{"id": "1"}]
+        assert not work_queue.renew("users", "1", "crashed")
+        work_queue.complete("users", "1", "w2")
+        assert work_queue.counts("users") == {"done": 1}
+
+    def test_each_run_starts_from_an_empty_queue(self, queue_path):
+        work_queue = WorkQueue(queue_path)
+        work_queue.start_run()
+        work_queue.add("users", [{"id": "1"}])
+        work_queue.claim("users", "w1")
+        work_queue.complete("users", "1", "w1")
+        work_queue.mark_listed("users")
+        work_queue.finish_run()
+
+        work_queue.start_run()
+        work_queue.add("users", [{"id": "1"}, {"id": "2"}])
+
+        assert not work_queue.is_listed("users")
+        assert [parent["id"] for parent in work_queue.claim("users", "w1", limit=5)] == ["1", "2"]
+
+    @patch("tap_ms_graph.work_queue.time.sleep")
+    def test_workers_wait_for_a_new_run(self, mock_sleep, queue_path):
+        work_queue = WorkQueue(queue_path)
+        previous = work_queue.start_run()
+        work_queue.finish_run()
+        mock_sleep.side_effect = lambda _: work_queue.start_run()
+
+        assert work_queue.join_run(timeout=60, poll_interval=1) == previous + 1
+
+    def test_join_run_times_out(self, queue_path):
+        with pytest.raises(WorkQueueTimeout):
+            WorkQueue(queue_path).join_run(timeout=0)
+
+    def test_open_work_queue_requires_a_role(self, queue_path):
+        assert open_work_queue({}) is None
+        with pytest.raises(ValueError):
+            open_work_queue({"work_queue": queue_path})
+        assert open_work_queue({"work_queue": queue_path, "work_queue_role": "worker"}).path == queue_path
+
+
+class TestDistributedSync:
+    def make_stream(self, work_queue=None):
+        client = MagicMock()
+        client.config = {}
+        client.get.return_value = {"value": [{"id": "u1"}, {"id": "u2"}]}
+        stream = Users(client, make_catalog_entry())
+        stream.is_selected = MagicMock(return_value=True)
+        stream.child_to_sync = [MagicMock()]
+        stream.work_queue = work_queue
+        return stream
+
+    @patch("tap_ms_graph.streams.abstracts.write_record")
+    def test_coordinator_queues_parents_and_workers_sync_children(self, mock_write_record, queue_path):
+        coordinator = self.make_stream(WorkQueue(queue_path))
+        coordinator.sync(state={}, transformer=MagicMock(transform=lambda record, *args: record))
+        coordinator.work_queue.mark_listed("users")
+
+        assert mock_write_record.call_count == 2
+        coordinator.child_to_sync[0].sync.assert_not_called()
+
+        worker = self.make_stream()
+        work_queue = WorkQueue(queue_path)
+        assert sync_from_queue(worker, work_queue, {}, MagicMock(), {}) == 2
+        parents = [c.kwargs["parent_obj"] for c in worker.child_to_sync[0].sync.call_args_list]
+        assert parents == [{"id": "u1"}, {"id": "u2"}]
+        assert work_queue.counts("users") == {"done": 2}
+
+    @patch("tap_ms_graph.work_queue.time.sleep")
+    def test_worker_waits_for_the_coordinator(self, mock_sleep, queue_path):
+        work_queue = WorkQueue(queue_path)
+        mock_sleep.side_effect = lambda _: (work_queue.add("users", [{"id": "u1"}]), work_queue.mark_listed("users"))
+        worker = self.make_stream()
+
+        assert sync_from_queue(worker, work_queue, {}, MagicMock(), {"work_queue_poll_interval": 1}) == 1
+        mock_sleep.assert_called_once_with(1.0)
+
+    @patch("tap_ms_graph.work_queue.time.sleep")
+    def test_worker_gives_up_when_the_coordinator_died(self, mock_sleep, queue_path):
+        work_queue = WorkQueue(queue_path)
+        config = {"work_queue_wait_timeout": 10, "work_queue_poll_interval": 1}
+        with patch("tap_ms_graph.work_queue.time.monotonic", side_effect=itertools.count(0, 6)):
+            with pytest.raises(WorkQueueTimeout):
+                sync_from_queue(self.make_stream(), work_queue, {}, MagicMock(), config)
+
+    @patch("tap_ms_graph.work_queue.time.sleep")
+    def test_parent_with_a_lost_lease_is_not_synced(self, mock_sleep, queue_path):
+        work_queue = WorkQueue(queue_path)
+        work_queue.add("users", [{"id": "u1"}])
+        work_queue.mark_listed("users")
+        worker = self.make_stream()
+        worker.child_to_sync = [MagicMock(), MagicMock()]
+        # Another worker takes over the parent while the first child syncs.
+        worker.child_to_sync[0].sync.side_effect = lambda **kwargs: work_queue._connection.execute(
+            "UPDATE parents SET worker = 'other'")
+
+        assert sync_from_queue(worker, work_queue, {}, MagicMock(), {"work_queue_wait_timeout": 0.01}) == 0
+        worker.child_to_sync[1].sync.assert_not_called()
+        assert work_queue.counts("users") == {"leased": 1}